@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark: reading browser bookmark files with import_browser_bookmarks.
+
+Writes the same --bookmarks synthetic bookmarks, in nested folders, as a
+Netscape bookmarks.html, a Firefox places.sqlite and a Chrome Bookmarks file,
+then times reading each one through its importer (without the merge), and
+reads it again under tracemalloc for the peak memory the read allocated.
+"""
+
+import argparse
+import html
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookmarktool.urlnorm import canonical_url  # noqa: E402
+from import_browser_bookmarks import READERS  # noqa: E402
+
+HOSTS = ['github.com', 'en.wikipedia.org', 'news.ycombinator.com', 'arxiv.org', 'youtube.com', 'blog.example.org']
+WORDS = ('python rust linux kernel database compiler parser async thread memory cache network '
+         'protocol server design pattern testing deploy cloud security notes talk paper').split()
+
+
+def synthetic_tree(count, rng, per_folder=200):
+    """
+    Return the bookmarks as (folder path, url, title) and the folder paths,
+    outermost first, in the order a browser lists them.
+    """
+    folders = [()]
+    bookmarks = []
+    for i in range(count):
+        if i % per_folder == 0 and i:
+            parent = rng.choice(folders[-20:]) if len(folders[-1]) < 4 else ()
+            folders.append(parent + (f'{rng.choice(WORDS).capitalize()} {len(folders)}',))
+        words = rng.sample(WORDS, 3)
+        bookmarks.append((folders[-1], f'https://{rng.choice(HOSTS)}/{words[0]}/{i}', f'{words[1]} {words[2]} {i}'))
+    return bookmarks, folders
+
+
+def nested(bookmarks, folders):
+    """Group the bookmarks into {'children': {name: subtree}, 'links': [...]}."""
+    root = {'children': {}, 'links': []}
+    for path in folders:
+        node = root
+        for name in path:
+            node = node['children'].setdefault(name, {'children': {}, 'links': []})
+    for path, url, title in bookmarks:
+        node = root
+        for name in path:
+            node = node['children'][name]
+        node['links'].append((url, title))
+    return root
+
+
+def write_html(path, tree):
+    def write(f, node, depth):
+        pad = '    ' * depth
+        for url, title in node['links']:
+            f.write(f'{pad}<DT><A HREF="{html.escape(url)}" ADD_DATE="1700000000">{html.escape(title)}</A>\n')
+        for name, child in node['children'].items():
+            f.write(f'{pad}<DT><H3>{html.escape(name)}</H3>\n{pad}<DL><p>\n')
+            write(f, child, depth + 1)
+            f.write(f'{pad}</DL><p>\n')
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n')
+        f.write('    <DT><H3 PERSONAL_TOOLBAR_FOLDER="true">Bookmarks bar</H3>\n    <DL><p>\n')
+        write(f, tree, 2)
+        f.write('    </DL><p>\n</DL><p>\n')
+
+
+def write_places(path, tree):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE moz_places (id INTEGER PRIMARY KEY, url TEXT, title TEXT);
+        CREATE TABLE moz_bookmarks (id INTEGER PRIMARY KEY, type INTEGER, fk INTEGER, parent INTEGER,
+                                    position INTEGER, title TEXT, guid TEXT);
+        CREATE INDEX moz_bookmarks_itemindex ON moz_bookmarks (fk, type);
+        CREATE INDEX moz_bookmarks_parentindex ON moz_bookmarks (parent, position);
+        INSERT INTO moz_bookmarks VALUES (1, 2, NULL, 0, 0, '', 'root________');
+        INSERT INTO moz_bookmarks VALUES (2, 2, NULL, 1, 0, 'toolbar', 'toolbar_____');
+        INSERT INTO moz_bookmarks VALUES (3, 2, NULL, 1, 1, 'tags', 'tags________');
+    ''')
+    ids = [3]
+
+    def write(node, parent):
+        for position, (url, title) in enumerate(node['links']):
+            ids[0] += 1
+            conn.execute('INSERT INTO moz_places VALUES (?, ?, ?)', (ids[0], url, title))
+            conn.execute('INSERT INTO moz_bookmarks VALUES (NULL, 1, ?, ?, ?, ?, NULL)', (ids[0], parent, position, title))
+        for name, child in node['children'].items():
+            folder = conn.execute('INSERT INTO moz_bookmarks VALUES (NULL, 2, NULL, ?, 0, ?, NULL)', (parent, name)).lastrowid
+            write(child, folder)
+
+    write(tree, 2)
+    conn.commit()
+    conn.close()
+
+
+def write_chrome(path, tree):
+    def node(name, subtree):
+        children = [{'type': 'url', 'name': title, 'url': url, 'date_added': '13300000000000000', 'guid': '0' * 36}
+                    for url, title in subtree['links']]
+        children += [node(n, c) for n, c in subtree['children'].items()]
+        return {'children': children, 'name': name, 'type': 'folder', 'date_added': '13300000000000000'}
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'checksum': '', 'roots': {'bookmark_bar': node('Bookmarks bar', tree)}, 'version': 1}, f, indent=3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the browser bookmark importers')
+    parser.add_argument('--bookmarks', type=int, default=200000, help='Bookmarks in each file (default: 200000)')
+    args = parser.parse_args()
+
+    bookmarks, folders = synthetic_tree(args.bookmarks, random.Random(1))
+    tree = nested(bookmarks, folders)
+    del bookmarks
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {'html': os.path.join(tmp, 'bookmarks.html'), 'firefox': os.path.join(tmp, 'places.sqlite'),
+                 'chrome': os.path.join(tmp, 'Bookmarks')}
+        write_html(files['html'], tree)
+        write_places(files['firefox'], tree)
+        write_chrome(files['chrome'], tree)
+        print(f"{args.bookmarks} bookmarks in {len(folders) - 1} folders\n")
+
+        print(f"{'':<10}{'MB':>7}{'seconds':>9}{'per second':>12}{'peak MB':>9}{'links':>9}")
+        for fmt, path in files.items():
+            canonical_url.cache_clear()
+            start = time.perf_counter()
+            links = sum(1 for _ in READERS[fmt](path))
+            seconds = time.perf_counter() - start
+            canonical_url.cache_clear()  # its (bounded) cache counts towards the peak
+            tracemalloc.start()
+            sum(1 for _ in READERS[fmt](path))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            size = os.path.getsize(path) / 1e6
+            print(f"{fmt:<10}{size:>7.0f}{seconds:>9.2f}{links / seconds:>12,.0f}{peak / 1e6:>9.1f}{links:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: near-duplicate lookups with bookmarktool.dupes (MinHash + LSH).
+
+Indexes --count synthetic links, then looks up --queries variants of stored
+links (scheme/www/trailing slash/utm changes, a renamed label or an edited
+path) and --queries unrelated links. Reports the LSH lookup latency, how many
+candidates it had to verify, and its recall against a linear similarity() scan
+over a sample of the queries.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookmarktool.dupes import DupIndex, similarity  # noqa: E402
+
+HOSTS = ['github.com', 'en.wikipedia.org', 'medium.com', 'youtube.com', 'arxiv.org', 'news.ycombinator.com']
+WORDS = ('python rust linux kernel database compiler parser async thread memory cache network '
+         'protocol server design pattern testing deploy cloud security crypto math physics neural '
+         'model graphics shader audio music video game engine editor terminal shell history').split()
+
+
+def synthetic_links(count, rng):
+    """Yield `count` link dicts; half are on a few big hosts, like a real bookmark collection."""
+    for i in range(count):
+        words = rng.sample(WORDS, 6)
+        host = rng.choice(HOSTS) if i % 2 else f'{words[0]}{i % 9973}.example.org'
+        yield {
+            'url': f'https://{host}/{words[1]}-{words[2]}/{i}',
+            'label': ' '.join(words[3:]).capitalize() + f' {i}',
+        }
+
+
+def variant(link, rng):
+    """Return a copy of link written differently, as it might be re-added."""
+    url, label = link['url'], link['label']
+    kind = rng.randrange(4)
+    if kind == 0:
+        url = url.replace('https://', 'http://www.') + '/'
+    elif kind == 1:
+        url += '?utm_source=feed&utm_medium=rss#top'
+    elif kind == 2:
+        label = label.lower() + ' - blog'
+    else:
+        url = url[:-1] + 'x'
+    return {'url': url, 'label': label}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark near-duplicate detection')
+    parser.add_argument('--count', type=int, default=200000, help='Number of indexed links (default: 200000)')
+    parser.add_argument('--queries', type=int, default=1000, help='Lookups of each kind (default: 1000)')
+    parser.add_argument('--scan-sample', type=int, default=20, help='Queries also checked by a linear scan (default: 20)')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    links = list(synthetic_links(args.count, rng))
+    index = DupIndex()
+    start = time.perf_counter()
+    for link in links:
+        index.add(link)
+    print(f"Indexed {len(index)} links in {time.perf_counter() - start:.1f}s\n")
+
+    originals = rng.sample(links, args.queries)
+    dupes = [variant(link, rng) for link in originals]
+    unrelated = list(synthetic_links(args.queries, random.Random(2)))
+    for link in unrelated:
+        link['url'] = link['url'].replace('/', '/new-', 3)
+
+    print(f"{'lookups':<12}{'found':>8}{'median ms':>12}{'max ms':>10}")
+    for name, queries in (('variants', dupes), ('unrelated', unrelated)):
+        times, found = [], 0
+        for query in queries:
+            start = time.perf_counter()
+            matches = index.matches(query)
+            times.append((time.perf_counter() - start) * 1000)
+            found += bool(matches)
+        print(f"{name:<12}{found:>8}{statistics.median(times):>12.2f}{max(times):>10.2f}")
+
+    # linear scan over every stored link, as a baseline and to measure recall
+    sample = dupes[:args.scan_sample]
+    hits = missed = 0
+    start = time.perf_counter()
+    for query in sample:
+        best = {link['url'] for link in links if similarity(query, link) >= index.threshold}
+        lsh = {link['url'] for _, link in index.matches(query, limit=len(links))}
+        hits += len(best & lsh)
+        missed += len(best - lsh)
+    scan_ms = (time.perf_counter() - start) * 1000 / len(sample)
+    print(f"\nlinear scan: {scan_ms:.0f} ms per lookup, LSH recall {hits / max(hits + missed, 1):.1%}")
+
+
+if __name__ == '__main__':
+    main()
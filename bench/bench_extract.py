@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for enrich_links metadata extraction over saved HTML fixtures.
+
+Compares the original per-field soup.find extraction with the single-pass
+extract_metadata (html.parser and lxml) and the head-first extract_from_html,
+and checks that every path returns the same label and description.
+"""
+
+import argparse
+import os
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+import enrich_links  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def legacy_extract(html, url):
+    """The original extract_label + extract_description, one soup.find per candidate."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    label = None
+    title_tag = soup.find('title')
+    if title_tag and title_tag.string and title_tag.string.strip():
+        label = title_tag.string.strip()
+    for tag in (soup.find('meta', property='og:title'), soup.find('meta', attrs={'name': 'twitter:title'})):
+        if not label and tag and tag.get('content') and tag['content'].strip():
+            label = tag['content'].strip()
+    h1 = soup.find('h1')
+    if not label and h1 and h1.get_text().strip():
+        label = h1.get_text().strip()
+    label = label or urlparse(url).netloc
+
+    desc = None
+    for tag in (soup.find('meta', attrs={'name': 'description'}), soup.find('meta', property='og:description'),
+                soup.find('meta', attrs={'name': 'twitter:description'})):
+        if not desc and tag and tag.get('content') and tag['content'].strip():
+            desc = tag['content'].strip()
+    if not desc:
+        for container in ['main', 'article', 'content', 'post-content', 'entry-content']:
+            content_div = soup.find(['div', 'main', 'article'], class_=lambda c: c and container in c.lower())
+            if content_div:
+                p = content_div.find('p')
+                if p and p.get_text().strip():
+                    desc = p.get_text().strip()[:500]
+                    break
+    if not desc:
+        p = soup.find('p')
+        if p and p.get_text().strip():
+            desc = p.get_text().strip()[:500]
+    return label, desc or ""
+
+
+def timed(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark metadata extraction over HTML fixtures')
+    parser.add_argument('--fixtures', default=FIXTURES, help='Directory of .html files (default: bench/fixtures)')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per fixture, best time is reported (default: 20)')
+    args = parser.parse_args()
+
+    paths = {
+        'legacy': lambda html, url: legacy_extract(html, url),
+        'single-pass': lambda html, url: enrich_links.extract_metadata(BeautifulSoup(html, 'html.parser'), url),
+        'head-first': lambda html, url: enrich_links.extract_from_html(html, url, True, True),
+    }
+    try:
+        import lxml  # noqa: F401
+        paths['single-pass lxml'] = lambda html, url: enrich_links.extract_metadata(BeautifulSoup(html, 'lxml'), url)
+    except ImportError:
+        print("lxml not installed; skipping the lxml parser\n")
+
+    names = sorted(n for n in os.listdir(args.fixtures) if n.endswith('.html'))
+    print(f"{'fixture':<22}{'KB':>7}" + ''.join(f'{name + " ms":>20}' for name in paths))
+    totals = dict.fromkeys(paths, 0.0)
+    mismatches = 0
+    for name in names:
+        with open(os.path.join(args.fixtures, name), encoding='utf-8') as f:
+            html = f.read()
+        url = f'https://example.org/{name}'
+        expected = None
+        row = f'{name[:21]:<22}{len(html) / 1024:>7.0f}'
+        for path, func in paths.items():
+            result, elapsed = timed(lambda: func(html, url), args.repeat)
+            totals[path] += elapsed
+            row += f'{elapsed * 1000:>20.2f}'
+            if expected is None:
+                expected = result
+            elif result != expected:
+                mismatches += 1
+                print(f"  mismatch in {name} ({path}): {result!r} != {expected!r}")
+        print(row)
+    print(f"{'total':<29}" + ''.join(f'{totals[p] * 1000:>20.2f}' for p in paths))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
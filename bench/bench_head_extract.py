@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming head-only metadata extraction vs. full download + BeautifulSoup.
+
+Serves synthetic pages (or the .html files in --pages) from a local HTTP server
+and reports bytes read and wall time per page for both enrich_links paths.
+"""
+
+import argparse
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+import enrich_links  # noqa: E402
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # the head-only path resets connections on purpose
+
+
+def make_pages(directory, sizes_kb):
+    """Write synthetic pages with a normal head and a body of the given sizes."""
+    names = []
+    for kb in sizes_kb:
+        paragraphs = '<p>lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>\n' * (kb * 1024 // 64)
+        html = (
+            '<!DOCTYPE html><html><head><meta charset="utf-8">'
+            f'<title>Synthetic page {kb} KB</title>'
+            '<meta name="description" content="a synthetic page for benchmarking">'
+            '<meta property="og:title" content="Synthetic">'
+            '<link rel="stylesheet" href="style.css"></head>'
+            f'<body><main class="content"><h1>Heading</h1>{paragraphs}</main></body></html>'
+        )
+        name = f'page_{kb}kb.html'
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write(html)
+        names.append(name)
+    return names
+
+
+def full_path(url):
+    start = time.perf_counter()
+    response = enrich_links.get_session().get(url, timeout=10)
+    html = response.text
+    soup = BeautifulSoup(html, 'html.parser')
+    enrich_links.extract_label(soup, url)
+    enrich_links.extract_description(soup)
+    return len(response.content), time.perf_counter() - start
+
+
+def head_path(url):
+    start = time.perf_counter()
+    meta = enrich_links.fetch_page_meta(url)
+    return meta['bytes_read'], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare head-only and full-page metadata extraction')
+    parser.add_argument('--pages', help='Directory of .html files to serve instead of synthetic pages')
+    parser.add_argument('--sizes', default='16,128,1024,4096', help='Synthetic body sizes in KB (default: 16,128,1024,4096)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per page, best time is reported (default: 5)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.pages:
+            directory = args.pages
+            names = sorted(n for n in os.listdir(directory) if n.endswith('.html'))
+        else:
+            directory = tmp
+            names = make_pages(tmp, [int(s) for s in args.sizes.split(',')])
+
+        server = QuietServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=directory))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_address[1]}/'
+
+        print(f"{'page':<28}{'full bytes':>12}{'full ms':>10}{'head bytes':>12}{'head ms':>10}{'speedup':>9}")
+        for name in names:
+            url = base + name
+            full = min((full_path(url) for _ in range(args.repeat)), key=lambda r: r[1])
+            head = min((head_path(url) for _ in range(args.repeat)), key=lambda r: r[1])
+            print(f"{name[:27]:<28}{full[0]:>12}{full[1] * 1000:>10.1f}{head[0]:>12}{head[1] * 1000:>10.1f}"
+                  f"{full[1] / head[1]:>8.1f}x")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark: parsing a large links.txt with parse_links_txt.parse_links.
+
+Writes a synthetic --lines line text dump to a temp file: bare URLs,
+"label: URL :tag, :tag" lines, lines with several URLs, prose and blank
+lines. Then times a plain read of the file (the I/O floor), the parser in
+quiet mode, parse_files (line ranges in a pool of --workers processes, as
+the script runs it), and the previous per-line parser (three uncompiled regex calls,
+replace and sub, first URL only) on the first --legacy-lines lines.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookmarktool.urlnorm import canonical_url, strip_trailing_punct  # noqa: E402
+from parse_links_txt import gc_paused, parse_files, parse_links  # noqa: E402
+
+HOSTS = ['github.com', 'en.wikipedia.org', 'news.ycombinator.com', 'arxiv.org', 'youtube.com', 'blog.example.org']
+WORDS = ('python rust linux kernel database compiler parser async thread memory cache network '
+         'protocol server design pattern testing deploy cloud security notes talk paper').split()
+
+
+def synthetic_lines(count, rng):
+    """Yield `count` lines in the formats links.txt is written in."""
+    for i in range(count):
+        kind = rng.randrange(10)
+        words = rng.sample(WORDS, 4)
+        url = f'https://{rng.choice(HOSTS)}/{words[0]}/{i}'
+        if kind < 4:
+            yield url
+        elif kind < 6:
+            yield f'{words[1].capitalize()} {words[2]}: {url} :{words[3]}, :{words[0]}'
+        elif kind < 7:
+            yield f'{words[1]}: {url} :{words[3]} {words[2]}: https://{rng.choice(HOSTS)}/{words[2]}/{i}'
+        elif kind < 9:
+            yield ' '.join(rng.choice(WORDS) for _ in range(8))
+        else:
+            yield '' if i % 2 else f'## {words[0]}'
+
+
+def legacy_parse_line(line):
+    """The parser before the single-pass tokenizer, for comparison."""
+    line = line.strip()
+    if not line or not 'http' in line:
+        return None
+    matches = re.findall(r'https?://[^\s]+', line)
+    url = strip_trailing_punct(matches[0]) if matches else None
+    if not url:
+        return None
+    remaining = line.replace(url, '', 1).strip()
+    url = canonical_url(url)
+    tags = re.findall(r':(\w+)', remaining)
+    if tags:
+        remaining = re.sub(r':[\w,\s]+$', '', remaining).strip()
+    label = remaining.rstrip(':').strip() or url
+    return {'url': url, 'label': label, 'tags': tags, 'description': ''}
+
+
+def timed(fn):
+    canonical_url.cache_clear()
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the links.txt parser')
+    parser.add_argument('--lines', type=int, default=5000000, help='Lines in the synthetic file (default: 5000000)')
+    parser.add_argument('--legacy-lines', type=int, default=500000,
+                        help='Lines parsed with the previous parser (default: 500000)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Processes for parse_files (default: number of CPUs)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'links.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            for line in synthetic_lines(args.lines, random.Random(1)):
+                f.write(line + '\n')
+        size = os.path.getsize(path) / 1e6
+        print(f"{args.lines} lines, {size:.0f} MB\n")
+
+        def read():
+            with open(path, 'r', encoding='utf-8') as f:
+                return sum(1 for _ in f)
+
+        def parse():
+            with open(path, 'r', encoding='utf-8') as f:
+                return sum(1 for _ in parse_links(f, quiet=True))
+
+        def parse_pool():
+            with gc_paused():
+                return sum(len(found) for _, _, found in parse_files([path], args.workers))
+
+        def parse_sample():
+            with open(path, 'r', encoding='utf-8') as f:
+                return sum(1 for _ in parse_links(islice(f, args.legacy_lines), quiet=True))
+
+        def legacy_sample():
+            with open(path, 'r', encoding='utf-8') as f:
+                return sum(1 for line in islice(f, args.legacy_lines) if legacy_parse_line(line))
+
+        print(f"{'':<28}{'seconds':>9}{'MB/s':>8}{'links':>10}")
+        seconds, lines = timed(read)
+        print(f"{'read lines':<28}{seconds:>9.2f}{size / seconds:>8.0f}{'':>10}")
+        seconds, links = timed(parse)
+        print(f"{'parse_links (quiet)':<28}{seconds:>9.2f}{size / seconds:>8.0f}{links:>10}")
+        seconds, links = timed(parse_pool)
+        label = f'parse_files, {args.workers} worker(s)'
+        print(f"{label:<28}{seconds:>9.2f}{size / seconds:>8.0f}{links:>10}")
+
+        share = args.legacy_lines / args.lines
+        print(f"\nfirst {args.legacy_lines} lines:")
+        seconds, links = timed(legacy_sample)
+        print(f"{'previous parser':<28}{seconds:>9.2f}{size * share / seconds:>8.0f}{links:>10}")
+        seconds, links = timed(parse_sample)
+        print(f"{'parse_links (quiet)':<28}{seconds:>9.2f}{size * share / seconds:>8.0f}{links:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark and round-trip check for the PostgreSQL import paths.
+
+Runs against a local PostgreSQL server configured with the same DB_* env
+vars as import_links_to_db.py, but defaults to a scratch database
+(DB_NAME=links_bench) because the links table is dropped first.
+
+Compares execute_values (insert_links) with COPY + staging merge (copy_links)
+and checks that awkward values (quotes, commas, newlines, backslashes, empty
+strings, duplicate urls) come back unchanged.
+
+Before that, and without a database (--stream-only), it drains a
+LinkCopyStream the way copy_expert does and checks that the rows held over
+between reads stay under one read plus one row.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_links_to_db import LinkCopyStream, PostgreSQLHandler  # noqa: E402
+from linkio import iter_json_array  # noqa: E402
+from bench_sqlite_import import synthetic_links  # noqa: E402
+
+AWKWARD = [
+    {'url': 'https://example.org/a,b', 'label': 'He said "hi",\nthen left', 'tags': ['a"b', 'c\\d', 'x,y'],
+     'description': ''},
+    {'url': 'https://example.org/dup', 'label': 'first', 'tags': [], 'description': 'old'},
+    {'url': 'https://example.org/dup', 'label': 'second', 'tags': ['t'], 'description': 'new'},
+]
+
+
+def handler():
+    h = PostgreSQLHandler({
+        'dbname': os.getenv('DB_NAME', 'links_bench'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', 'postgres'),
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': os.getenv('DB_PORT', '5432'),
+    })
+    h.connect()
+    h.cursor.execute("DROP TABLE IF EXISTS links;")
+    h.create_table()
+    h.commit()
+    return h
+
+
+def run(name, load, count):
+    h = handler()
+    tracemalloc.start()
+    start = time.perf_counter()
+    load(h)
+    h.commit()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name:<22}{elapsed:>9.2f}s{count / elapsed:>12.0f} rows/sec{peak / 2**20:>10.1f} MB peak")
+    return h
+
+
+def check_stream(path, count, size=8192):
+    """Read a LinkCopyStream in copy_expert's 8 KB reads; fail if its leftover grows."""
+    stream = LinkCopyStream(iter_json_array(path))
+    start = time.perf_counter()
+    longest_row = peak_pending = total = 0
+    row = ''  # the row the last read ended in
+    while True:
+        data = stream.read(size)
+        if not data:
+            break
+        total += len(data)
+        peak_pending = max(peak_pending, len(stream._pending))
+        *rows, row = (row + data).split('\n')
+        longest_row = max([longest_row, len(row)] + [len(r) + 1 for r in rows])
+    elapsed = time.perf_counter() - start
+    print(f"{'LinkCopyStream':<22}{elapsed:>9.2f}s{count / elapsed:>12.0f} rows/sec"
+          f"{total / 2**20:>10.1f} MB, at most {peak_pending} bytes held over")
+    assert stream.count == count, f"streamed {stream.count} of {count} rows"
+    assert peak_pending <= size + longest_row, f"{peak_pending} bytes held over between reads"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark PostgreSQL link imports')
+    parser.add_argument('--count', type=int, default=200000, help='Number of synthetic links (default: 200000)')
+    parser.add_argument('--stream-only', action='store_true', help='Only check the COPY stream; no database needed')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'links.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(list(synthetic_links(args.count)) + AWKWARD, f)
+        count = args.count + len(AWKWARD)
+
+        check_stream(path, count)
+        if args.stream_only:
+            return
+
+        h = run('execute_values', lambda h: h.insert_links(iter_json_array(path)), count)
+        h.cursor.execute("SELECT label FROM links WHERE url = %s;", (AWKWARD[2]['url'],))
+        print("repeated url:", "ok" if h.cursor.fetchall() == [(AWKWARD[2]['label'],)] else "MISMATCH")
+        h.close()
+        h = run('COPY + merge', lambda h: h.copy_links(iter_json_array(path)), count)
+
+        h.cursor.execute("SELECT url, label, tags, description FROM links WHERE url LIKE 'https://example.org/%' "
+                         "ORDER BY url;")
+        rows = h.cursor.fetchall()
+        expected = sorted([(l['url'], l['label'], l['tags'], l['description']) for l in (AWKWARD[0], AWKWARD[2])])
+        print("round trip:", "ok" if rows == expected else f"MISMATCH {rows!r} != {expected!r}")
+        h.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bookmarktool search index (SQLite FTS5) on synthetic links.
+
+Builds an index of --count links whose labels and descriptions are drawn
+from a Zipf-distributed vocabulary of --vocab words (the familiar words in
+WORDS are placed at ranks 10, 20, 30, ..., so 'python' is in about one link
+in ten), then reports the median latency of word,
+prefix, phrase, exclusion and tag-filtered queries.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookmarktool.search import SearchIndex  # noqa: E402
+
+WORDS = ('python rust golang javascript typescript haskell linux kernel database postgres sqlite '
+         'compiler parser async await thread memory cache network protocol http server client '
+         'design pattern testing deploy docker kubernetes cloud security crypto math algebra '
+         'physics learning neural model training data visual graphics shader audio music video '
+         'game engine editor terminal shell history science paper research tutorial guide notes '
+         'blog podcast talk book library framework performance benchmark profiling optimization').split()
+TAGS = ['dev', 'edu', 'engr', 'math', 'music', 'sci', 'tools', 'read-later', 'video', 'ref']
+
+
+SYLLABLES = 'ka lo mi ne ru ta vo zi pe shu bra cle dro fen gri hol'.split()
+
+
+def vocabulary(size, seed=1):
+    """Return `size` words ordered by rank: made-up words, with WORDS spread over the first ranks."""
+    rng = random.Random(seed)
+    words = []
+    seen = set(WORDS)
+    while len(words) < size - len(WORDS):
+        word = ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    for n, word in enumerate(WORDS):
+        words.insert(10 * (n + 1), word)
+    return words
+
+
+def synthetic_links(count, vocab_size=20000, seed=1):
+    """Yield `count` link dicts with Zipf-distributed words and 1-3 tags each."""
+    rng = random.Random(seed)
+    vocab = vocabulary(vocab_size, seed)
+    cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(vocab))))
+    for i in range(count):
+        words = rng.choices(vocab, cum_weights=cum_weights, k=12)
+        yield {
+            'url': f'https://{words[0]}-{i % 7919}.example.org/{words[1]}/{i}',
+            'label': ' '.join(words[2:6]).capitalize() + f' {i}',
+            'tags': rng.sample(TAGS, rng.randint(1, 3)),
+            'description': ' '.join(words[4:]),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the bookmark search index')
+    parser.add_argument('--count', type=int, default=500000, help='Number of synthetic links (default: 500000)')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per query, median is reported (default: 20)')
+    parser.add_argument('--vocab', type=int, default=20000, help='Vocabulary size (default: 20000)')
+    parser.add_argument('--limit', type=int, default=20, help='Results per query (default: 20)')
+    args = parser.parse_args()
+
+    queries = [
+        'haskell',
+        'optimiz',
+        'python linux',
+        '"python rust"',
+        'kernel -linux',
+        'podcast #music',
+        'pars #dev #ref',
+        'python',
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(os.path.join(tmp, 'search.db'))
+        start = time.perf_counter()
+        index.sync(synthetic_links(args.count, args.vocab), signature='bench')
+        print(f"Indexed {index.count()} links in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'query':<20}{'results':>9}{'median ms':>12}{'max ms':>10}")
+        for query in queries:
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = index.search(query, limit=args.limit)
+                times.append((time.perf_counter() - start) * 1000)
+            print(f"{query:<20}{len(results):>9}{statistics.median(times):>12.2f}{max(times):>10.2f}")
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bookmark store snapshots (bookmarktool/snapshot.py).
+
+Takes a snapshot of a store of --count bookmarks, then --rounds more after
+adding one bookmark each time, and reports the time and the bytes added to
+the snapshot directory per round, next to what a full stor.bak*.json copy
+would cost. Also times the check done at startup when nothing changed.
+
+The rounds run twice: on a dict (the JSON backend, serialized whole every
+time) and on a SQLite store (stor.SQLiteBackend), where only the appended
+bookmarks and the chunk before them are read.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bookmarktool'))
+
+import snapshot  # noqa: E402
+from stor import SQLiteBackend  # noqa: E402
+
+
+def bookmark(i):
+    return {'url': f'https://example.org/page/{i}', 'label': f'Example page {i}',
+            'tags': ['dev', 'ref'], 'description': f'notes about page {i} ' * 3}
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark store snapshots')
+    parser.add_argument('--count', type=int, default=100000, help='Bookmarks in the store (default: 100000)')
+    parser.add_argument('--rounds', type=int, default=5, help='Snapshots after one change each (default: 5)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot.snapdir = tmp
+        data = {'bookmarks': [bookmark(i) for i in range(args.count)], 'prefs': {'editor': 'vi'}}
+        full = len(json.dumps(data))
+
+        start = time.perf_counter()
+        snapshot.take(data, signature='rev0', min_interval=0)
+        print(f"first snapshot: {time.perf_counter() - start:.2f}s, {dir_size(tmp) / 1e6:.1f} MB "
+              f"(full copy {full / 1e6:.1f} MB)")
+
+        start = time.perf_counter()
+        snapshot.take(data, signature='rev0', min_interval=0)
+        print(f"unchanged store: {(time.perf_counter() - start) * 1000:.2f} ms\n")
+
+        print(f"{'json round':<12}{'seconds':>9}{'bytes added':>14}{'full copy':>12}")
+        for r in range(1, args.rounds + 1):
+            data['bookmarks'].append(bookmark(args.count + r))
+            before = dir_size(tmp)
+            start = time.perf_counter()
+            snapshot.take(data, signature=f'rev{r}', min_interval=0)
+            print(f"{r:<12}{time.perf_counter() - start:>9.2f}{dir_size(tmp) - before:>14}{full:>12}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot.snapdir = os.path.join(tmp, 'snapshots')
+        os.makedirs(snapshot.snapdir)
+        db = SQLiteBackend(os.path.join(tmp, 'stor.db'))
+        db.open()
+        db.write({'bookmarks': [bookmark(i) for i in range(args.count)], 'prefs': {'editor': 'vi'}})
+        start = time.perf_counter()
+        snapshot.take(db.items, db.signature(), min_interval=0, store=db)
+        print(f"\nsqlite first snapshot: {time.perf_counter() - start:.2f}s\n")
+
+        print(f"{'sqlite round':<12}{'seconds':>9}{'bytes added':>14}{'full copy':>12}")
+        for r in range(1, args.rounds + 1):
+            db.append('bookmarks', bookmark(args.count + r))
+            before = dir_size(snapshot.snapdir)
+            start = time.perf_counter()
+            name = snapshot.take(db.items, db.signature(), min_interval=0, store=db)
+            print(f"{r:<12}{time.perf_counter() - start:>9.3f}{dir_size(snapshot.snapdir) - before:>14}{full:>12}")
+        assert snapshot.restore(name) == dict(db.items()), "incremental snapshot differs from the store"
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
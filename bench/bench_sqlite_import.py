@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SQLite import of synthetic links.
+
+Compares the original one-execute-per-link loop (default PRAGMAs, one big
+transaction) with SQLiteHandler's chunked executemany + bulk PRAGMAs.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_links_to_db import SQLiteHandler  # noqa: E402
+
+
+def synthetic_links(count):
+    """Yield `count` link dicts that look like the ones in links.json."""
+    for i in range(count):
+        yield {
+            'url': f'https://example{i % 5000}.org/articles/{i}',
+            'label': f'Synthetic article number {i}',
+            'tags': ['synthetic', f'tag{i % 50}'],
+            'description': f'Description for synthetic link {i}, long enough to look like a real one.',
+        }
+
+
+def legacy_import(db_path, links):
+    """The original SQLiteHandler.insert_links loop."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS links (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL UNIQUE,
+            label TEXT NOT NULL,
+            tags TEXT,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    for link in links:
+        cursor.execute("""
+            INSERT INTO links (url, label, tags, description)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                label = excluded.label,
+                tags = excluded.tags,
+                description = excluded.description;
+        """, (link['url'], link['label'], json.dumps(link['tags']), link['description']))
+    conn.commit()
+    conn.close()
+
+
+def bulk_import(db_path, links, batch_size):
+    handler = SQLiteHandler(db_path, batch_size=batch_size)
+    handler.connect()
+    handler.create_table()
+    handler.insert_links(links)
+    handler.commit()
+    handler.close()
+
+
+def run(name, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32}{elapsed:>10.2f}s{count / elapsed:>14.0f} rows/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SQLite link imports')
+    parser.add_argument('--count', type=int, default=1000000, help='Number of synthetic links (default: 1000000)')
+    parser.add_argument('--batch-size', type=int, default=50000, help='Batch size for the bulk path (default: 50000)')
+    parser.add_argument('--skip-legacy', action='store_true', help='Only run the bulk path')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not args.skip_legacy:
+            run('legacy (execute per row)', lambda: legacy_import(os.path.join(tmp, 'legacy.db'),
+                                                                  synthetic_links(args.count)), args.count)
+        run(f'bulk (executemany x{args.batch_size})',
+            lambda: bulk_import(os.path.join(tmp, 'bulk.db'), synthetic_links(args.count), args.batch_size),
+            args.count)
+        # Re-import into the same database: every row is an upsert conflict
+        run('bulk re-import (all updates)',
+            lambda: bulk_import(os.path.join(tmp, 'bulk.db'), synthetic_links(args.count), args.batch_size),
+            args.count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: startup time of the bookmark CLI (bookmarktool/cli.py).
+
+Runs `cli.py add <url>` --runs times against a throwaway store (HOME is
+pointed at a temp dir, and the store is pre-filled with --count bookmarks),
+and reports the median wall time next to a bare `python -c pass`. Then runs
+one `add` under `python -X importtime` and lists the slowest imports.
+With --daemon, also starts `cli.py daemon` and reports the same `add` run
+through it, and the time the daemon takes to answer a search request.
+
+Exits with status 1 if the median `add` takes longer than --budget-ms, or if
+it imports any of HEAVY (network, postgres, html parsing, subprocess), so it
+can be used as a check.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY = ('requests', 'bs4', 'psycopg2', 'feedparser', 'subprocess', 'shutil', 'asyncio')
+CLI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bookmarktool')
+
+
+def timed_run(argv, env):
+    start = time.perf_counter()
+    subprocess.run(argv, cwd=CLI_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_daemon(args, env, home):
+    """Time `cli.py add` forwarded to a running daemon, and the daemon's own answer time for a search."""
+    env = {**env, 'BOOKMARKTOOL_DAEMON': '1'}
+    server = subprocess.Popen([sys.executable, 'cli.py', 'daemon'], cwd=CLI_DIR, env=env, stdout=subprocess.PIPE, text=True)
+    try:
+        server.stdout.readline()  # "listening on ..." once the store and index are loaded
+        add = statistics.median(timed_run([sys.executable, 'cli.py', 'add', f'https://example.org/daemon/{n}'], env)
+                                for n in range(args.runs))
+        os.environ['HOME'] = home  # util reads the data dir from HOME on import
+        sys.path.insert(0, CLI_DIR)
+        import daemon
+        times = []
+        for n in range(args.runs * 10):
+            start = time.perf_counter()
+            daemon.request({'argv': ['search', f'seed {n}'], 'cwd': CLI_DIR})
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"cli.py add, daemon running   {add:8.1f} ms")
+        print(f"daemon search request        {statistics.median(times):8.2f} ms\n")
+        daemon.request({'stop': True})
+        server.wait(timeout=10)
+    finally:
+        if server.poll() is None:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CLI startup')
+    parser.add_argument('--runs', type=int, default=15, help='Runs per command (default: 15)')
+    parser.add_argument('--count', type=int, default=10000, help='Bookmarks in the store (default: 10000)')
+    parser.add_argument('--budget-ms', type=float, default=50, help='Max median ms for `add` (default: 50)')
+    parser.add_argument('--top', type=int, default=12, help='Slowest imports to list (default: 12)')
+    parser.add_argument('--daemon', action='store_true', help='Also time commands sent to `cli.py daemon`')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        env = {**os.environ, 'HOME': home, 'BOOKMARKTOOL_DAEMON': '0'}
+        fill = ("import stor\nstor.init()\nwith stor.batch():\n"
+                f"    for i in range({args.count}):\n"
+                "        u = f'https://example.org/seed/{i}'\n"
+                "        stor.append('bookmarks', {'url': u, 'label': u, 'tags': [], 'description': ''})\n")
+        subprocess.run([sys.executable, '-c', fill], cwd=CLI_DIR, env=env, check=True)
+        subprocess.run([sys.executable, 'cli.py', 'search', 'seed'], cwd=CLI_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL)  # build the search index once
+
+        bare = statistics.median(timed_run([sys.executable, '-c', 'pass'], env) for _ in range(args.runs))
+        add = statistics.median(timed_run([sys.executable, 'cli.py', 'add', f'https://example.org/new/{n}'], env)
+                                for n in range(args.runs))
+        print(f"python -c pass   {bare:8.1f} ms")
+        print(f"cli.py add       {add:8.1f} ms   (budget {args.budget_ms:.0f} ms)\n")
+        if args.daemon:
+            bench_daemon(args, env, home)
+
+        proc = subprocess.run([sys.executable, '-X', 'importtime', 'cli.py', 'add', 'https://example.org/x'],
+                              cwd=CLI_DIR, env=env, check=True, capture_output=True, text=True)
+        rows = []
+        heavy = set()
+        for line in proc.stderr.splitlines():
+            if line.startswith('import time:') and 'self [us]' not in line:
+                self_us, cumulative, name = [part.strip() for part in line[len('import time:'):].split('|')]
+                rows.append((int(cumulative), int(self_us), name))
+                if name.split('.')[0] in HEAVY:
+                    heavy.add(name.split('.')[0])
+        print(f"{'module':<36}{'self ms':>9}{'cumulative ms':>15}")
+        for cumulative, self_us, name in sorted(rows, reverse=True)[:args.top]:
+            print(f"{name:<36}{self_us / 1000:>9.1f}{cumulative / 1000:>15.1f}")
+
+    failed = False
+    if heavy:
+        print(f"\n`add` imports {', '.join(sorted(heavy))}")
+        failed = True
+    if add > args.budget_ms:
+        print(f"\nover budget: {add:.1f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
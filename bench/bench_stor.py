@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bookmarktool storage backends (bookmarktool/stor.py).
+
+Fills each backend with --count bookmarks, then times appending one more
+bookmark, putting a small unrelated key, and appending 100 bookmarks in one
+batch(). The JSON backend rewrites the whole file on every write (once per
+batch); the SQLite backend writes one row (one transaction per batch).
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bookmarktool'))
+
+from stor import JSONBackend, SQLiteBackend  # noqa: E402
+
+
+def bookmark(i):
+    return {'url': f'https://example.org/page/{i}', 'label': f'Example page {i}',
+            'tags': ['dev', 'ref'], 'description': 'a page used to fill the store ' * 3}
+
+
+def add_batch(store, start):
+    with store.batch():
+        for i in range(start, start + 100):
+            store.append('bookmarks', bookmark(i))
+
+
+def timed(fn, repeat):
+    times = []
+    for n in range(repeat):
+        start = time.perf_counter()
+        fn(n)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the bookmark store backends')
+    parser.add_argument('--count', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Store sizes to test (default: 1000 10000 100000)')
+    parser.add_argument('--repeat', type=int, default=20, help='Writes per measurement (default: 20)')
+    args = parser.parse_args()
+
+    print(f"{'backend':<10}{'bookmarks':>11}{'append ms':>12}{'put ms':>10}{'batch of 100 ms':>18}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.count:
+            for name, cls, filename in (('json', JSONBackend, 'stor.json'), ('sqlite', SQLiteBackend, 'stor.db')):
+                path = os.path.join(tmp, f'{count}-{filename}')
+                store = cls(path)
+                store.open()
+                store.put('bookmarks', [bookmark(i) for i in range(count)])
+                append_ms = timed(lambda n: store.append('bookmarks', bookmark(count + n)), args.repeat)
+                put_ms = timed(lambda n: store.put('last_search', {'query': f'q{n}'}), args.repeat)
+                batch_ms = timed(lambda n: add_batch(store, count + args.repeat + 100 * n), max(args.repeat // 4, 1))
+                print(f"{name:<10}{count:>11}{append_ms:>12.2f}{put_ms:>10.2f}{batch_ms:>18.2f}")
+                store.close()
+
+
+if __name__ == '__main__':
+    main()
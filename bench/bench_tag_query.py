@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tag-filter latency on a SQLite database of synthetic links.
+
+Builds the database with SQLiteHandler (which fills the tags/link_tags tables)
+and compares filtering on the JSON tags column against the link_tags pivot.
+Each link has a common tag (2% of rows) and a rare one (0.02% of rows).
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_links_to_db import SQLiteHandler  # noqa: E402
+
+
+def synthetic_links(count):
+    """Yield `count` link dicts with one common and one rare tag each."""
+    for i in range(count):
+        yield {
+            'url': f'https://example{i % 5000}.org/articles/{i}',
+            'label': f'Synthetic article number {i}',
+            'tags': ['synthetic', f'tag{i % 50}', f'rare{i % 5000}'],
+            'description': f'Description for synthetic link {i}, long enough to look like a real one.',
+        }
+
+
+def decode_scan(conn, labels):
+    """Read every row and filter in Python, as a client of the JSON column has to."""
+    wanted = set(labels)
+    return [(id_, url) for id_, url, tags in conn.execute("SELECT id, url, tags FROM links;")
+            if wanted.issubset(json.loads(tags or '[]'))]
+
+
+def json_each_scan(conn, labels):
+    """Filter on the JSON column inside SQLite (still a full scan)."""
+    query = "SELECT id, url FROM links l WHERE " + " AND ".join(
+        "EXISTS (SELECT 1 FROM json_each(l.tags) WHERE value = ?)" for _ in labels)
+    return conn.execute(query, labels).fetchall()
+
+
+def pivot_query(conn, labels):
+    """Filter through the tags / link_tags tables."""
+    marks = ', '.join('?' * len(labels))
+    return conn.execute(f"""
+        SELECT l.id, l.url FROM links l
+        JOIN link_tags lt ON lt.link_id = l.id
+        JOIN tags t ON t.id = lt.tag_id
+        WHERE t.label IN ({marks})
+        GROUP BY l.id
+        HAVING COUNT(*) = ?;
+    """, (*labels, len(labels))).fetchall()
+
+
+def timed(func, conn, labels, repeat):
+    """Return (median ms, result size) over `repeat` runs."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = func(conn, labels)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tag-filter queries')
+    parser.add_argument('--count', type=int, default=1000000, help='Number of synthetic links (default: 1000000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per query, median is reported (default: 5)')
+    parser.add_argument('--skip-decode', action='store_true', help='Skip the slow Python decode scan')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'tags.db')
+        handler = SQLiteHandler(db_path)
+        handler.connect()
+        handler.create_table()
+        start = time.perf_counter()
+        handler.insert_links(synthetic_links(args.count))
+        handler.update_tag_refs()
+        handler.commit()
+        print(f"Built {args.count} links in {time.perf_counter() - start:.1f}s\n")
+        handler.close()
+
+        conn = sqlite3.connect(db_path)
+        methods = [('json_each scan', json_each_scan), ('link_tags pivot', pivot_query)]
+        if not args.skip_decode:
+            methods.insert(0, ('python decode scan', decode_scan))
+        cases = [('common tag', ['tag7']), ('rare tag', ['rare42']), ('two tags', ['tag7', 'rare7'])]
+
+        print(f"{'query':<14}{'method':<22}{'rows':>8}{'median ms':>12}")
+        for case, labels in cases:
+            for name, func in methods:
+                ms, rows = timed(func, conn, labels, args.repeat)
+                print(f"{case:<14}{name:<22}{rows:>8}{ms:>12.2f}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: URL canonicalization (bookmarktool/urlnorm.py).
+
+Normalizes --count synthetic URLs (mixed case hosts, default ports,
+trailing slashes, fragments, utm_* params, a few IDNs) and reports the
+throughput with a cold cache (every URL distinct) and a warm one (URLs
+repeating, as in link files that are merged again and again).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookmarktool.urlnorm import canonical_url, url_key  # noqa: E402
+
+HOSTS = ['github.com', 'WWW.Example.ORG', 'en.wikipedia.org', 'news.ycombinator.com',
+         'blog.Rust-Lang.org', 'bücher.de', 'localhost:8080', 'arxiv.org:443']
+SUFFIXES = ['', '/', '#section-2', '?utm_source=rss&utm_medium=feed', '?page=2&utm_campaign=x',
+            '?q=sqlite+fts5', '#/app/route', '/?ref_src=twsrc']
+
+
+def synthetic_urls(count, seed=1):
+    """Return `count` distinct URLs in the shapes found in data/links.txt."""
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(['http', 'https', 'HTTPS'])}://{rng.choice(HOSTS)}/{rng.choice(['docs', 'wiki', 'p', 'a'])}/"
+        f"{i}{rng.choice(SUFFIXES)}"
+        for i in range(count)
+    ]
+
+
+def run(urls, fn):
+    """Return URLs per minute for fn over urls."""
+    start = time.perf_counter()
+    for url in urls:
+        fn(url)
+    return len(urls) / (time.perf_counter() - start) * 60
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark URL canonicalization')
+    parser.add_argument('--count', type=int, default=1000000, help='Number of URLs (default: 1000000)')
+    args = parser.parse_args()
+
+    urls = synthetic_urls(args.count)
+    repeated = urls[:args.count // 20] * 20
+
+    print(f"{'run':<28}{'URLs/minute':>16}")
+    for name, fn, data in (
+        ('canonical_url, cold', canonical_url, urls),
+        ('url_key, cold', url_key, synthetic_urls(args.count, seed=2)),
+        ('canonical_url, repeated', canonical_url, repeated),
+        ('canonical_url, uncached', canonical_url.__wrapped__, urls),
+    ):
+        canonical_url.cache_clear()
+        url_key.cache_clear()
+        print(f"{name:<28}{run(data, fn):>16,.0f}")
+
+
+if __name__ == '__main__':
+    main()
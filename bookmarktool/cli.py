@@ -1,7 +1,15 @@
 #!/usr/bin/python3
 
-import argparse
+import os
 import sys
+import time
+from util import datadir
+# argparse, stor, search (sqlite, FTS and the duplicate index) and urlnorm are imported by the code that uses them,
+# so commands that don't touch the index, and commands sent to the daemon, start faster
+
+keep_open = False  # set in the repl and the daemon: keep the search index open between commands
+serving = False    # set in the daemon
+_index = None      # the index kept open
 
 #this is the CLI tool for managing the links database
 """
@@ -34,13 +42,34 @@ operations:
 
 """
 
-def parseArgs():
-    parser = argparse.ArgumentParser(description='the program does a thing')
+def help_formatter(prog):
+    '''
+    argparse's default help formatter, with the width worked out here: argparse imports shutil
+    (and with it bz2, lzma, fnmatch) just to get the terminal size, on every parser it creates
+    '''
+    import argparse
+    try:
+        width = int(os.environ['COLUMNS'])
+    except (KeyError, ValueError):
+        try:
+            width = os.get_terminal_size(sys.stdout.fileno()).columns
+        except (AttributeError, ValueError, OSError):
+            width = 80
+    return argparse.HelpFormatter(prog, width=width - 2)
+
+def parseArgs(argv=None):
+    import argparse
+    import functools
+    parser = argparse.ArgumentParser(description='the program does a thing', formatter_class=help_formatter)
     parser.add_argument('-v', '--verbose', action='store_true', help='verbose')
-    cmds = parser.add_subparsers(dest='command', help='the operation to perform' )
+    cmds = parser.add_subparsers(dest='command', help='the operation to perform',
+                                 parser_class=functools.partial(argparse.ArgumentParser, formatter_class=help_formatter))
 
     parser_add = cmds.add_parser('add', help='add a link to the database', aliases='a')
-    parser_add.add_argument('url', help='the url')
+    parser_add.add_argument('url', nargs='+', help='the url(s)')
+    parser_add.add_argument('--label', '-l', default='', help='label (title) of the link, if adding one')
+    parser_add.add_argument('--force', action='store_true', help='add even if the link already exists')
+    parser_add.set_defaults(command='add')
     #parser_add.add_argument('--tag', '-t', help='tags to associate with the url')
     #parser_add.add_argument('--description', '--desc', '-d', help='description of the link')
 
@@ -54,31 +83,95 @@ def parseArgs():
     parser_analyze = cmds.add_parser('analyze', aliases=['an'], help='analyze state of link databases')
 
     parser_search = cmds.add_parser('search', aliases=['s', 'se', 'srch', 'sch', 'sr'], help='search for a link')
-    parser_search.add_argument('query', help='the search query')
+    parser_search.add_argument('query', nargs='+', help='the search query: words (matched as prefixes), "phrases", -exclude (after --), #tag')
+    parser_search.add_argument('--limit', '-n', type=int, default=20, help='max number of results')
+    parser_search.add_argument('--exact', action='store_true', help='match whole words only, no prefix matching')
+    parser_search.add_argument('--file', '-f', help='search a links.json / .jsonl file instead of the bookmark store')
+    parser_search.set_defaults(command='search')
 
     parser_repl = cmds.add_parser('repl', aliases=['r','REPL', 'R'], help='use REPL mode') 
+    parser_repl.set_defaults(command='repl')
+
+    parser_daemon = cmds.add_parser('daemon', help='keep the store and search index loaded in a background process, which add and search then use')
+    parser_daemon.add_argument('action', nargs='?', choices=['start', 'stop', 'status'], default='start')
 
     parser.add_argument('--tag', '-t',action='append', help='tags to associate with the url')
     parser.add_argument('--description', '--desc', '-d', help='description of the link')
     parser.add_argument('--id', '-i', help='select by id')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     return args
 
-def main():
-    args = parseArgs()
+def main(argv=None):
+    global keep_open, serving
+    argv = sys.argv[1:] if argv is None else argv
+    if not keep_open and os.getenv('BOOKMARKTOOL_DAEMON', '1') != '0':
+        # the daemon parses the arguments too, so a running daemon saves loading argparse here
+        import daemon
+        status = daemon.forward(argv)
+        if status is not None:
+            return status
+    args = parseArgs(argv)
     cmd = args.command
-    load_data()
+    if cmd in ('repl', 'daemon') and keep_open:
+        if serving:
+            import daemon
+            raise daemon.RunInClient()  # e.g. `links daemon stop`, or the repl, which needs the terminal
+        print(f'{cmd}: not available from the repl')
+        return 1
+    if cmd == 'search':
+        search(' '.join(args.query), args.tag, args.limit, not args.exact, args.file, args.verbose)
+        return
     if cmd == 'add':
-        add(args.url, args.title, args.tag, args.description)
-    elif cmd == 'delete':
+        add(args.url, args.label, args.tag, args.description, args.force, args.verbose)
+        return
+    if cmd == 'repl':
+        return start_repl()
+    if cmd == 'daemon':
+        import daemon
+        if args.action == 'start':
+            keep_open = serving = True
+        status = daemon.main(args.action, run, warm)
+        if _index is not None:
+            _index.close()
+        return status
+    load_data()
+    if cmd == 'delete':
         print('delete')
     print(args)
 
-def add(url, title, tags, description):
-    link = dict()
+def add(urls, label, tags, description, force=False, verbose=False):
+    '''
+    add one or more links. all of them are stored in a single write
+    '''
+    import stor
+    from urlnorm import canonical_url, url_key
     #validate data
     #check if already exists (use fuzzy compare. notify user of inexact matches)
+    stor.init()
+    index = open_index(verbose=verbose)
+    added = 0
+    with stor.batch():
+        for url in urls:
+            url = canonical_url(url)
+            link = {'url': url, 'label': (label if len(urls) == 1 else '') or url,
+                    'tags': tags or [], 'description': description or ''}
+            matches = index.near_duplicates(link)
+            # an exact duplicate is the same url_key, not just a similarity of 1.0 (www., query order)
+            same = next((match for _, match in matches if url_key(match['url']) == url_key(url)), None)
+            if same and not force:
+                print(f"already saved as {same['url']} (use --force to add anyway)")
+                continue
+            for sim, match in matches:
+                print(f"similar ({sim:.0%}): {match['label'] or match['url']}\n    {match['url']}")
+            stor.append('bookmarks', link)
+            index.add(link)
+            added += 1
+            print(f'added {url}')
+    if added:
+        index.mark_current(stor.signature())
+    close_index(index)
+    return added
     #write to local db
     #write to local json file
     #update log
@@ -91,12 +184,137 @@ def deleteByID(id):
 def deleteByURL(url):
     return
         
+def search(query, tags=None, limit=20, prefix=True, file=None, verbose=False):
+    '''
+    search the bookmarks (or a links file) and print the results, best first.
+    the search index is only rebuilt when its source has changed since the last search.
+    '''
+    if file and not os.path.isfile(file):
+        print(f'nothing to search: {file} does not exist')
+        return
+    index = open_index(file, verbose)
+    t = time.perf_counter()
+    results = index.search(query, tags=tags, limit=limit, prefix=prefix)
+    elapsed = (time.perf_counter() - t) * 1000
+    close_index(index)
+
+    if not results:
+        print('no results')
+    for i, r in enumerate(results, 1):
+        print(f"{i:>3}. {r['label'] or r['url']}")
+        print(f"     {r['url']}")
+        if r['tags']:
+            print(f"     tags: {', '.join(r['tags'])}")
+    if verbose:
+        print(f'{len(results)} results in {elapsed:.2f} ms')
+
+def store_signature(path):
+    ''' return: a signature of a file that changes whenever the file is written '''
+    st = os.stat(path)
+    return f'{path}:{st.st_mtime_ns}:{st.st_size}'
+
+def open_index(file=None, verbose=False):
+    '''
+    open the search index and sync it with the bookmark store (or a links file) if that has changed since
+    return: SearchIndex
+    '''
+    global _index
+    import stor
+    from search import SearchIndex
+    index = _index
+    if index is None:
+        os.makedirs(datadir, exist_ok=True)
+        index = SearchIndex(f'{datadir}/search.db')
+        if keep_open:
+            _index = index
+    if file:
+        source = os.path.abspath(file)
+        signature = store_signature(source)
+    else:
+        stor.init()
+        signature = stor.signature()
+    if not index.is_current(signature):
+        t = time.perf_counter()
+        links = load_links_file(source) if file else load_data()
+        indexed, removed = index.sync(links, signature)
+        if verbose:
+            print(f'indexed {indexed}, removed {removed} links in {time.perf_counter() - t:.2f}s')
+    return index
+
+def close_index(index):
+    ''' close the index, unless the repl or the daemon keeps it open '''
+    if index is not _index:
+        index.close()
+
+def warm():
+    ''' load the store and bring the search index up to date, before the first command of the repl or the daemon '''
+    import stor
+    stor.init()
+    close_index(open_index())
+
+def run(argv):
+    '''
+    run one command line in this process, for the repl and the daemon
+    return: exit status
+    '''
+    import stor
+    stor.refresh()
+    try:
+        return main(argv) or 0
+    except SystemExit as e:  # argparse errors, --help
+        return e.code if isinstance(e.code, int) else int(e.code is not None)
+
 def start_repl():
-    print('TODO')
+    '''
+    read commands, the same as on the command line (e.g. `search rust -n 5`, `add URL -l label`),
+    until quit or end of input. the store and the search index stay loaded between them
+    '''
+    global keep_open
+    import shlex
+    import traceback
+    try:
+        import readline  # line editing and history, where available
+    except ImportError:
+        pass
+    keep_open = True
+    warm()
+    while True:
+        try:
+            line = input('links> ').strip()
+        except EOFError:
+            print()
+            break
+        except KeyboardInterrupt:
+            print()
+            continue
+        if line in ('q', 'quit', 'exit'):
+            break
+        if not line:
+            continue
+        try:
+            run(shlex.split(line))
+        except KeyboardInterrupt:
+            print()
+        except Exception:
+            traceback.print_exc()
+    if _index is not None:
+        _index.close()
+    return 0
+
+def load_links_file(path):
+    ''' read links from a .json array or a .jsonl file '''
+    import json
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
 
 def load_data(): 
     ''' get the links from localdb or whatever config '''
-    #TODO
+    import stor
+    os.makedirs(datadir, exist_ok=True)
+    stor.init()
+    return stor.get('bookmarks') or []
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+import json
+import os
+import sys
+from util import datadir, log
+
+'''
+a background process that keeps the store and the search / duplicate index open, so `links add`
+and `links search` don't load them again on every call.
+
+the daemon listens on a unix socket (sockpath). when the socket exists, cli.py sends it its command
+line before even parsing it, and runs the command itself when nothing answers, or when the daemon
+answers that it can't run it (`daemon stop`, `repl`).
+a request is one json line, {"argv": [...], "cwd": "..."}; the answer is {"status": 0, "out": "...", "err": "..."},
+or {"client": true}. requests are handled one at a time, in the order they come.
+
+    python cli.py daemon           # run it (in the foreground: `... &`, or from a systemd user unit)
+    python cli.py daemon status
+    python cli.py daemon stop
+'''
+
+sockpath = f'{datadir}/daemon.sock'
+CONNECT_TIMEOUT = 0.5  # seconds; a daemon that doesn't accept by then is taken as not running
+
+
+class RunInClient(Exception):
+    ''' raised by a command that the daemon can't run for the client, such as one that needs its terminal '''
+
+
+def _connect():
+    import socket
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(CONNECT_TIMEOUT)
+    try:
+        s.connect(sockpath)
+    except OSError:
+        s.close()
+        return None
+    s.settimeout(None)  # a command can take a while, e.g. re-indexing after a big import
+    return s
+
+
+def request(msg):
+    '''
+    send a request to the daemon
+    params:
+        msg (dict) : {"argv": [...], "cwd": ...}, {"ping": true} or {"stop": true}
+    return: the answer (dict), or None if no daemon is running
+    '''
+    if not os.path.exists(sockpath):
+        return None
+    s = _connect()
+    if s is None:
+        return None
+    with s, s.makefile('rwb') as f:
+        f.write(json.dumps(msg).encode('utf-8') + b'\n')
+        f.flush()
+        line = f.readline()
+    if not line:
+        # it got the command and may have run it, so don't run it again here
+        return {'status': 1, 'err': 'the daemon closed the connection without answering\n'}
+    return json.loads(line)
+
+
+def forward(argv):
+    '''
+    run a cli command line in the daemon, and print its output
+    return: the command's exit status, or None if it should run here: no daemon is running, or it
+        can't run the command
+    '''
+    answer = request({'argv': argv, 'cwd': os.getcwd()})
+    if answer is None or answer.get('client'):
+        return None
+    sys.stdout.write(answer.get('out', ''))
+    sys.stderr.write(answer.get('err', ''))
+    return answer.get('status', 1)
+
+
+def _answer(msg, handler):
+    '''
+    return: (answer, whether to stop)
+    '''
+    import contextlib
+    import io
+    import traceback
+    if not isinstance(msg, dict):
+        return {'status': 2, 'err': 'bad request\n'}, False
+    if msg.get('ping'):
+        return {'status': 0, 'pid': os.getpid()}, False
+    if msg.get('stop'):
+        return {'status': 0, 'out': 'stopped\n'}, True
+    out, err = io.StringIO(), io.StringIO()
+    cwd = os.getcwd()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            os.chdir(msg.get('cwd') or cwd)  # relative paths in the command are the client's
+            status = handler(msg.get('argv') or [])
+        except RunInClient:
+            return {'client': True}, False
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        finally:
+            os.chdir(cwd)
+    return {'status': status, 'out': out.getvalue(), 'err': err.getvalue()}, False
+
+
+def serve(handler, warmup=None):
+    '''
+    answer requests until a stop request (or ctrl-c)
+    params:
+        handler : function(argv) -> exit status, runs one command line and prints its output
+        warmup : function called once before listening, to load what the commands use
+    return: exit status
+    '''
+    import socket
+    if request({'ping': True}) is not None:
+        print(f'a daemon is already running on {sockpath}')
+        return 1
+    os.makedirs(datadir, exist_ok=True)
+    if os.path.exists(sockpath):
+        os.remove(sockpath)  # left by a daemon that didn't stop cleanly
+    if warmup:
+        warmup()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)  # the socket is only for this user
+    try:
+        server.bind(sockpath)
+    finally:
+        os.umask(umask)
+    server.listen()
+    log(f'daemon {os.getpid()} listening on {sockpath}', label='daemon')
+    print(f'listening on {sockpath}', flush=True)
+    stopping = False
+    try:
+        while not stopping:
+            conn, _ = server.accept()
+            with conn, conn.makefile('rwb') as f:
+                try:
+                    msg = json.loads(f.readline() or 'null')
+                except ValueError:
+                    msg = None
+                answer, stopping = _answer(msg, handler)
+                try:
+                    f.write(json.dumps(answer).encode('utf-8') + b'\n')
+                    f.flush()
+                except OSError:
+                    pass  # the client went away
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(sockpath):
+            os.remove(sockpath)
+        log(f'daemon {os.getpid()} stopped', label='daemon')
+    return 0
+
+
+def main(action='start', handler=None, warmup=None):
+    '''
+    params:
+        action (str) : start | stop | status
+    '''
+    if action == 'start':
+        return serve(handler, warmup)
+    answer = request({'stop': True} if action == 'stop' else {'ping': True})
+    if answer is None:
+        print('no daemon running')
+        return 1
+    print(answer.get('out') or f"daemon {answer['pid']} running on {sockpath}", end='' if action == 'stop' else '\n')
+    return 0
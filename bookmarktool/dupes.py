@@ -0,0 +1,200 @@
+import hashlib
+
+try:
+    from urlnorm import url_key
+except ImportError:
+    from bookmarktool.urlnorm import url_key
+
+'''
+near-duplicate detection for links.
+
+every link gets a dedup key (a loosely normalized url) for exact matches, and a
+MinHash signature over character trigrams of that key and of its label for near matches.
+signatures are split into bands (LSH), so finding candidates is a few dict lookups
+instead of a comparison against every stored link. candidates are then scored by
+similarity(): links on different hosts never match, and on the same host the path is
+compared by its segments as well as its trigrams, so sibling pages (github.com/foo/bar
+and github.com/foo/baz) stay apart while an edited copy of the same page matches.
+
+    index = DupIndex()
+    for link in links:
+        index.add(link)
+    index.matches({'url': 'http://www.example.com/page/', 'label': 'Example page'})
+'''
+
+NUM_BINS = 48   # minhash values per signature
+ROWS = 6        # values per band, so NUM_BINS // ROWS bands
+THRESHOLD = 0.75 # min similarity() to report a near match
+
+
+def dedup_key(url):
+    '''
+    a looser key than urlnorm.url_key, used to spot the same link written differently:
+    also drops www. and sorts the query params.
+    return: the key (str)
+    '''
+    key = url_key(url).lstrip('/')
+    if key.startswith('www.'):
+        key = key[4:]
+    path, sep, query = key.partition('?')
+    if sep:
+        key = path + '?' + '&'.join(sorted(query.split('&')))
+    return key.rstrip('/')
+
+
+def shingles(link):
+    '''
+    return: set of shingles of a link: its host, and character trigrams of the rest of its
+        dedup key and of its label
+    '''
+    key = dedup_key(link.get('url', ''))
+    label = ' '.join((link.get('label') or '').lower().split())
+    if label == key or label == link.get('url', '').lower():
+        label = ''  # links without a label use the url as label; don't count it twice
+    host, _, rest = key.partition('/')
+    # the host is one shingle: trigrams of it would make every link on a big site look alike
+    grams = {'h' + host}
+    grams.update('u' + rest[i:i + 3] for i in range(max(len(rest) - 2, 1)))
+    if label:
+        grams.update('l' + label[i:i + 3] for i in range(max(len(label) - 2, 1)))
+    return grams
+
+
+def minhash(grams):
+    '''
+    one-permutation minhash: each trigram is hashed once and the hash picks a bin,
+    keeping the minimum per bin. empty bins borrow from the next non-empty one.
+    return: tuple of NUM_BINS ints
+    '''
+    bins = [None] * NUM_BINS
+    for g in grams:
+        h = int.from_bytes(hashlib.blake2b(g.encode('utf-8'), digest_size=8).digest(), 'little')
+        b, v = h % NUM_BINS, h // NUM_BINS
+        if bins[b] is None or v < bins[b]:
+            bins[b] = v
+    filled = [i for i, v in enumerate(bins) if v is not None]
+    if not filled:
+        return tuple([0] * NUM_BINS)
+    for i in range(NUM_BINS):
+        if bins[i] is None:
+            j = next((f for f in filled if f > i), filled[0])
+            bins[i] = bins[j] + (j - i) % NUM_BINS  # offset so borrowed bins don't all collide
+    return tuple(bins)
+
+
+def bands(signature):
+    '''
+    return: list of band keys for a minhash signature, as signed 64 bit ints so they fit in sqlite
+    '''
+    keys = []
+    for n in range(NUM_BINS // ROWS):
+        band = f'{n}:' + ','.join(map(str, signature[n * ROWS:(n + 1) * ROWS]))
+        keys.append(int.from_bytes(hashlib.blake2b(band.encode(), digest_size=8).digest(), 'little', signed=True))
+    return keys
+
+
+def link_bands(link):
+    '''
+    return: the LSH band keys of a link
+    '''
+    return bands(minhash(shingles(link)))
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def features(link):
+    '''
+    return: (host, set of features) of a link for similarity(): whole path segments, and
+        character trigrams of the path and of the label
+    '''
+    key = dedup_key(link.get('url', ''))
+    label = ' '.join((link.get('label') or '').lower().split())
+    if label == key or label == link.get('url', '').lower():
+        label = ''
+    host, _, rest = key.partition('/')
+    # a differing segment costs a whole feature on top of its trigrams, so one changed
+    # name in a short path (a sibling repo or article) is not a near match
+    feats = {'s' + seg for seg in rest.split('/') if seg}
+    feats.update('u' + rest[i:i + 3] for i in range(max(len(rest) - 2, 1)))
+    if label:
+        feats.update('l' + label[i:i + 3] for i in range(max(len(label) - 2, 1)))
+    return host, feats
+
+
+def similarity(link, other):
+    '''
+    return: 1.0 for the same dedup key, 0.0 for different hosts, otherwise the jaccard
+        similarity of their features()
+    '''
+    if dedup_key(link.get('url', '')) == dedup_key(other.get('url', '')):
+        return 1.0
+    host, feats = features(link)
+    other_host, other_feats = features(other)
+    return jaccard(feats, other_feats) if host == other_host else 0.0
+
+
+def rank_matches(link, candidates, threshold=THRESHOLD, limit=5):
+    '''
+    check candidate links against a link
+    params:
+        link (dict) : the link to compare
+        candidates (iterable) : links that share a dedup key or an LSH band with it
+    return: list of (similarity, candidate), most similar first. a candidate with
+        the same dedup key always matches, with similarity 1.0
+    '''
+    found = []
+    for cand in candidates:
+        sim = similarity(link, cand)
+        if sim >= threshold:
+            found.append((sim, cand))
+    found.sort(key=lambda item: -item[0])
+    return found[:limit]
+
+
+class DupIndex:
+    '''
+    an in-memory index of links for exact (dedup key) and near-duplicate lookups
+    '''
+
+    def __init__(self, threshold=THRESHOLD):
+        self.threshold = threshold
+        self.links = []
+        self.keys = {}      # dedup key -> position in links
+        self.buckets = {}   # band key -> [positions in links]
+
+    def add(self, link):
+        '''
+        add a link to the index
+        return: its position in the index
+        '''
+        pos = len(self.links)
+        self.links.append({'url': link.get('url', ''), 'label': link.get('label', '')})
+        self.keys.setdefault(dedup_key(link.get('url', '')), pos)
+        for band in link_bands(link):
+            self.buckets.setdefault(band, []).append(pos)
+        return pos
+
+    def exact(self, link):
+        '''
+        return: the stored link with the same dedup key, or None
+        '''
+        pos = self.keys.get(dedup_key(link.get('url', '')))
+        return self.links[pos] if pos is not None else None
+
+    def matches(self, link, limit=5):
+        '''
+        find stored links that are likely the same as this one
+        return: list of (similarity, link), most similar first; similarity is 1.0 for dedup key matches
+        '''
+        candidates = set()
+        pos = self.keys.get(dedup_key(link.get('url', '')))
+        if pos is not None:
+            candidates.add(pos)
+        for band in link_bands(link):
+            candidates.update(self.buckets.get(band, ()))
+        return rank_matches(link, (self.links[pos] for pos in sorted(candidates)), self.threshold, limit)
+
+    def __len__(self):
+        return len(self.links)
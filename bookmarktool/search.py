@@ -0,0 +1,314 @@
+import hashlib
+import json
+import re
+import sqlite3
+
+try:
+    from dupes import dedup_key, link_bands, rank_matches
+except ImportError:
+    from bookmarktool.dupes import dedup_key, link_bands, rank_matches
+
+'''
+full-text search over bookmarks, backed by an sqlite FTS5 index.
+
+the index is a separate sqlite file built from the bookmark store (json or otherwise).
+it covers url, label, description and tags, ranks results with bm25 and
+keeps a tag table so tag filters don't need a scan.
+it also stores the dedup key and LSH bands of each link (see dupes.py), so
+near_duplicates() can find likely copies of a link without a scan.
+
+query syntax:
+    python async        both words, each matched as a prefix (pyth -> python)
+    "exact phrase"      phrase match, no prefix
+    -java               exclude a word
+    #rust  tag:rust     only links with this tag
+'''
+
+# bm25 column weights: url, label, description, tags
+WEIGHTS = (2.0, 10.0, 4.0, 6.0)
+
+TERM_RE = re.compile(r'(-?)("[^"]*"|\S+)')
+
+
+def link_hash(link):
+    '''
+    return: hash of the fields of a link that are indexed
+    '''
+    key = json.dumps([link.get('url', ''), link.get('label', ''), link.get('tags', []),
+                      link.get('description', '')], ensure_ascii=False)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def parse_query(query, prefix=True):
+    '''
+    split a user query into an FTS5 MATCH expression and a list of tags
+    params:
+        query (str) : the search query, see the module docstring for the syntax
+        prefix (bool) : match unquoted words as prefixes
+    return: (match expression or None, [tags])
+    '''
+    include, exclude, tags = [], [], []
+    for neg, term in TERM_RE.findall(query):
+        if term.startswith('#') or term.lower().startswith('tag:'):
+            tag = term[1:] if term.startswith('#') else term[4:]
+            if tag:
+                tags.append(tag.lower())
+            continue
+        quoted = term.startswith('"') and term.endswith('"') and len(term) > 1
+        text = term[1:-1] if quoted else term
+        if not text.strip():
+            continue
+        # every term is passed as an FTS5 string, so punctuation in urls can't break the syntax
+        expr = '"' + text.replace('"', '""') + '"'
+        if prefix and not quoted:
+            expr += '*'
+        (exclude if neg else include).append(expr)
+    if not include:
+        return None, tags  # FTS5 can't match on NOT alone; exclusions need at least one word
+    match = ' AND '.join(include)
+    for expr in exclude:
+        match += ' NOT ' + expr
+    return match, tags
+
+
+class SearchIndex:
+    '''
+    an FTS5 search index of bookmarks, stored in its own sqlite file
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL;')
+        self.conn.execute('PRAGMA synchronous=NORMAL;')
+        has_bands = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'doc_bands';").fetchone() is not None
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                label TEXT,
+                description TEXT,
+                tags TEXT,
+                hash TEXT
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+                url, label, description, tags,
+                content='docs', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            );
+            CREATE TABLE IF NOT EXISTS doc_tags (
+                tag TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                PRIMARY KEY (tag, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS doc_tags_doc ON doc_tags (doc_id);
+            CREATE TABLE IF NOT EXISTS doc_bands (
+                band INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL,
+                PRIMARY KEY (band, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS doc_bands_doc ON doc_bands (doc_id);
+            CREATE TABLE IF NOT EXISTS doc_keys (
+                dkey TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                PRIMARY KEY (dkey, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS doc_keys_doc ON doc_keys (doc_id);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+
+            -- keep the external-content FTS table in step with docs
+            CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+                INSERT INTO docs_fts (rowid, url, label, description, tags)
+                VALUES (new.id, new.url, new.label, new.description, new.tags);
+            END;
+            CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+                INSERT INTO docs_fts (docs_fts, rowid, url, label, description, tags)
+                VALUES ('delete', old.id, old.url, old.label, old.description, old.tags);
+                DELETE FROM doc_tags WHERE doc_id = old.id;
+                DELETE FROM doc_bands WHERE doc_id = old.id;
+                DELETE FROM doc_keys WHERE doc_id = old.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE ON docs BEGIN
+                INSERT INTO docs_fts (docs_fts, rowid, url, label, description, tags)
+                VALUES ('delete', old.id, old.url, old.label, old.description, old.tags);
+                INSERT INTO docs_fts (rowid, url, label, description, tags)
+                VALUES (new.id, new.url, new.label, new.description, new.tags);
+            END;
+        ''')
+        if not has_bands:
+            # index built before the duplicate tables existed: forget the hashes so the next sync fills them
+            with self.conn:
+                self.conn.execute('UPDATE docs SET hash = NULL;')
+                self.conn.execute("DELETE FROM meta WHERE key = 'signature';")
+
+    def signature(self):
+        '''
+        return: the signature of the source the index was last synced from, or None
+        '''
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'signature';").fetchone()
+        return row[0] if row else None
+
+    def is_current(self, signature):
+        '''
+        check if the index was built from a source with this signature (e.g. a file's mtime and size)
+        '''
+        return signature is not None and self.signature() == str(signature)
+
+    def mark_current(self, signature):
+        '''
+        record that the index matches the source with this signature, after the
+        changes written to the source were also applied with add() / remove()
+        '''
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('signature', ?);",
+                              (str(signature),))
+
+    def _upsert(self, link, h):
+        tags = [str(t) for t in link.get('tags') or []]
+        cur = self.conn.execute('''
+            INSERT INTO docs (url, label, description, tags, hash) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                label = excluded.label,
+                description = excluded.description,
+                tags = excluded.tags,
+                hash = excluded.hash
+            RETURNING id;
+        ''', (link.get('url', ''), link.get('label', ''), link.get('description', ''),
+              json.dumps(tags, ensure_ascii=False), h))
+        doc_id = cur.fetchone()[0]
+        self.conn.execute('DELETE FROM doc_tags WHERE doc_id = ?;', (doc_id,))
+        self.conn.executemany('INSERT OR IGNORE INTO doc_tags (tag, doc_id) VALUES (?, ?);',
+                              [(t.lower(), doc_id) for t in tags])
+        self.conn.execute('DELETE FROM doc_bands WHERE doc_id = ?;', (doc_id,))
+        self.conn.executemany('INSERT OR IGNORE INTO doc_bands (band, doc_id) VALUES (?, ?);',
+                              [(band, doc_id) for band in link_bands(link)])
+        self.conn.execute('DELETE FROM doc_keys WHERE doc_id = ?;', (doc_id,))
+        self.conn.execute('INSERT INTO doc_keys (dkey, doc_id) VALUES (?, ?);',
+                          (dedup_key(link.get('url', '')), doc_id))
+
+    def add(self, link, signature=None):
+        '''
+        add or update one link in the index
+        params:
+            signature : if the link was also written to the source, its new signature
+        '''
+        with self.conn:
+            self._upsert(link, link_hash(link))
+        if signature is not None:
+            self.mark_current(signature)
+
+    def remove(self, url):
+        '''
+        remove a link from the index by url
+        '''
+        with self.conn:
+            self.conn.execute('DELETE FROM docs WHERE url = ?;', (url,))
+
+    def sync(self, links, signature=None):
+        '''
+        bring the index in line with a list of links: only new and changed links are
+        (re)indexed and links that are gone are removed
+        params:
+            links (iterable) : link dicts with url, label, description, tags
+            signature : recorded so is_current() can skip the next sync
+        return: (indexed, removed)
+        '''
+        known = dict(self.conn.execute('SELECT url, hash FROM docs;'))
+        indexed = 0
+        with self.conn:
+            for link in links:
+                url = link.get('url', '')
+                h = link_hash(link)
+                if known.pop(url, None) != h:
+                    self._upsert(link, h)
+                    indexed += 1
+            self.conn.executemany('DELETE FROM docs WHERE url = ?;', [(url,) for url in known])
+            if signature is not None:
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('signature', ?);",
+                                  (str(signature),))
+        if indexed or known:
+            with self.conn:  # merge the FTS segments written by the sync, so queries read fewer b-trees
+                self.conn.execute("INSERT INTO docs_fts (docs_fts) VALUES ('optimize');")
+        return indexed, len(known)
+
+    def search(self, query, tags=None, limit=20, prefix=True):
+        '''
+        search the index
+        params:
+            query (str) : words, phrases, -exclusions and #tags (see module docstring)
+            tags (list) : extra tags that results must have
+            limit (int) : max number of results
+            prefix (bool) : match unquoted words as prefixes
+        return: list of link dicts, best match first, each with a 'score' (lower is better)
+        '''
+        match, query_tags = parse_query(query, prefix)
+        tags = query_tags + [t.lower() for t in tags or []]
+        tag_filter = ''.join(' AND d.id IN (SELECT doc_id FROM doc_tags WHERE tag = ?)' for _ in tags)
+        bm25 = f"bm25(docs_fts, {', '.join(map(str, WEIGHTS))})"
+        if match and not tags:
+            # score and sort inside the FTS table, then join only the top rows back to docs
+            sql = f'''
+                SELECT d.url, d.label, d.description, d.tags, top.score
+                FROM (
+                    SELECT rowid, {bm25} AS score FROM docs_fts
+                    WHERE docs_fts MATCH ?
+                    ORDER BY score
+                    LIMIT ?
+                ) top JOIN docs d ON d.id = top.rowid
+                ORDER BY top.score;
+            '''
+            params = [match, limit]
+        elif match:
+            sql = f'''
+                SELECT d.url, d.label, d.description, d.tags, {bm25} AS score
+                FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid
+                WHERE docs_fts MATCH ?{tag_filter}
+                ORDER BY score
+                LIMIT ?;
+            '''
+            params = [match, *tags, limit]
+        elif tags:
+            # tag-only query: newest links first
+            sql = f'''
+                SELECT d.url, d.label, d.description, d.tags, 0.0 AS score
+                FROM docs d WHERE 1{tag_filter}
+                ORDER BY d.id DESC
+                LIMIT ?;
+            '''
+            params = [*tags, limit]
+        else:
+            return []
+        return [
+            {'url': url, 'label': label, 'description': desc, 'tags': json.loads(tagstr) if tagstr else [], 'score': score}
+            for url, label, desc, tagstr, score in self.conn.execute(sql, params)
+        ]
+
+    def near_duplicates(self, link, limit=5):
+        '''
+        find indexed links that are likely the same as this one: same dedup key
+        (e.g. http vs https, a trailing slash or utm_ params) or a similar url and label
+        return: list of (similarity, link dict), most similar first
+        '''
+        bands = link_bands(link)
+        rows = self.conn.execute(f'''
+            SELECT url, label FROM docs WHERE id IN (
+                SELECT doc_id FROM doc_keys WHERE dkey = ?
+                UNION
+                SELECT doc_id FROM doc_bands WHERE band IN ({', '.join('?' * len(bands))})
+            );
+        ''', [dedup_key(link.get('url', '')), *bands])
+        return rank_matches(link, ({'url': url, 'label': label} for url, label in rows), limit=limit)
+
+    def count(self):
+        '''
+        return: number of indexed links
+        '''
+        return self.conn.execute('SELECT COUNT(*) FROM docs;').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
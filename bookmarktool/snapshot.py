@@ -0,0 +1,348 @@
+#!/usr/bin/python3
+import itertools
+import json
+import os
+import sys
+import zlib
+from datetime import datetime
+from util import datadir, log, tnow
+
+'''
+snapshots of the bookmark store, replacing the full stor.bak*.json copy made on every start.
+
+a snapshot is a manifest (snapshots/<time>-<seq>.json) listing content-addressed chunks
+(snapshots/chunks/ab/abcdef....zz, zlib compressed). each key of the store is serialized as
+json lines (one line for the key, and one per item of a list) and cut into chunks where a
+line's hash hits a pattern, so adding or editing a bookmark only changes the chunk around it and
+every other chunk is shared with the previous snapshots. with the sqlite backend the manifest
+also records each key's version, and the next snapshot only reads the keys written since,
+and of a list that was only appended to, its last chunk and the new items.
+
+no snapshot is taken when the store's signature (or, failing that, its list of chunks)
+is the same as in the last snapshot (and, if BOOKMARKTOOL_SNAPSHOT_INTERVAL is set, when the last
+one is less than that many seconds old: off by default, as a changed store then goes without a
+snapshot). snapshots/latest holds what that check needs, so it doesn't read any manifest.
+a process that finds snapshots/lock held by another one skips the snapshot.
+old snapshots are pruned: the newest KEEP_LAST, plus the newest of each of the last
+KEEP_DAILY days and KEEP_WEEKLY weeks are kept.
+'''
+
+USAGE = '''usage:
+    python snapshot.py list
+    python snapshot.py restore NAME [OUT.json]   # write the snapshot's data as a json file'''
+
+snapdir = f'{datadir}/snapshots'
+KEEP_LAST = 10
+KEEP_DAILY = 7
+KEEP_WEEKLY = 8
+MIN_INTERVAL = float(os.getenv('BOOKMARKTOOL_SNAPSHOT_INTERVAL', '0'))  # seconds; 0: snapshot every change
+
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 1024 * 1024
+BOUNDARY_MASK = 0x3f  # a line ends a chunk when crc32(line) & mask == 0 (about 1 line in 64)
+
+
+def records(data):
+    '''
+    serialize a storage dict as json lines: {"k": key, "v": value} per key, or
+    {"k": key, "list": true} followed by one {"i": item} line per item for list values
+    params:
+        data : a dict, or an iterable of (key, value) pairs
+    '''
+    for k, v in (data.items() if isinstance(data, dict) else data):
+        if isinstance(v, list):
+            yield json.dumps({'k': k, 'list': True}, sort_keys=True)
+            for item in v:
+                yield json.dumps({'i': item}, sort_keys=True)
+        else:
+            yield json.dumps({'k': k, 'v': v}, sort_keys=True)
+
+
+def chunks(lines):
+    '''
+    group lines into content-defined chunks
+    return: generator of bytes
+    '''
+    buf, size = [], 0
+    for line in lines:
+        b = line.encode('utf-8') + b'\n'
+        buf.append(b)
+        size += len(b)
+        if size >= MAX_CHUNK or (size >= MIN_CHUNK and not zlib.crc32(b) & BOUNDARY_MASK):
+            yield b''.join(buf)
+            buf, size = [], 0
+    if buf:
+        yield b''.join(buf)
+
+
+def chunk_path(h):
+    return f'{snapdir}/chunks/{h[:2]}/{h}.zz'
+
+
+def manifests():
+    '''
+    return: list of snapshot manifests, newest first
+    '''
+    if not os.path.isdir(snapdir):
+        return []
+    out = []
+    for name in os.listdir(snapdir):
+        if name.endswith('.json'):
+            with open(f'{snapdir}/{name}', 'r') as f:
+                m = json.load(f)
+            m['name'] = name[:-5]
+            out.append(m)
+    out.sort(key=lambda m: m.get('seq', 0), reverse=True)
+    return out
+
+
+def _write_manifest(name, m):
+    tmp = f'{snapdir}/{name}.json.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({k: v for k, v in m.items() if k != 'name'}, f)
+    os.replace(tmp, f'{snapdir}/{name}.json')
+    _write_latest({k: v for k, v in m.items() if k not in ('chunks', 'keys')} | {'name': name})
+
+
+def _write_latest(info):
+    with open(f'{snapdir}/latest.tmp', 'w') as f:
+        json.dump(info, f)
+    os.replace(f'{snapdir}/latest.tmp', f'{snapdir}/latest')
+
+
+def latest():
+    '''
+    return: name, seq, time, signature and hash of the newest snapshot, or None
+    '''
+    try:
+        with open(f'{snapdir}/latest', 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        ms = manifests()
+        return {k: v for k, v in ms[0].items() if k not in ('chunks', 'keys')} if ms else None
+
+
+def _lock():
+    '''
+    hold snapshots/lock while taking a snapshot and pruning, so two processes starting at once
+    don't both write the same snapshot or prune chunks the other is about to list
+    return: the open lock file, or None if another process holds it
+    '''
+    f = open(f'{snapdir}/lock', 'w')
+    try:
+        import fcntl
+    except ImportError:
+        return f  # no flock (windows)
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+def _store_chunks(lines):
+    '''
+    cut lines into chunks and write the ones not stored yet
+    return: chunk hashes, size in bytes, number of chunks written
+    '''
+    import hashlib
+    hashes = []
+    size = 0
+    written = 0
+    for chunk in chunks(lines):
+        h = hashlib.sha256(chunk).hexdigest()
+        hashes.append(h)
+        size += len(chunk)
+        path = chunk_path(h)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(zlib.compress(chunk, 6))
+            os.replace(path + '.tmp', path)
+            written += 1
+    return hashes, size, written
+
+
+def _key_chunks(m):
+    '''
+    return: {key: (version, chunk hashes, size)} of a manifest, empty for snapshots taken
+        before they recorded them
+    '''
+    out = {}
+    i = 0
+    for k, version, n, size in m.get('keys', []):
+        out[k] = (version, m['chunks'][i:i + n], size)
+        i += n
+    return out
+
+
+def _snapshot_key(store, k, version, old):
+    '''
+    chunk one key of a store that has versions(), reusing the last snapshot's chunks where it can:
+    all of them if the key is unchanged, all but the last if items were only appended to it
+    return: chunk hashes, size, number of chunks written
+    '''
+    if old and old[0] == version:
+        return old[1], old[2], 0
+    if old and old[0] and version[2] is not None and old[0][2] is not None and old[0][1] == version[1]:
+        # chunking again from the start of the key's last chunk cuts the same chunks as from the start
+        with open(chunk_path(old[1][-1]), 'rb') as f:
+            tail = zlib.decompress(f.read())
+        new = (json.dumps({'i': item}, sort_keys=True) for item in store.items_after(k, old[0][2]))
+        hashes, size, written = _store_chunks(itertools.chain(tail.decode('utf-8').splitlines(), new))
+        return old[1][:-1] + hashes, old[2] - len(tail) + size, written
+    return _store_chunks(records([(k, store.get(k))]))
+
+
+def take(data, signature=None, min_interval=None, store=None):
+    '''
+    snapshot the store, unless it hasn't changed since the last snapshot
+    params:
+        data : the storage dict or (key, value) pairs; a callable returning them is only called if needed
+        signature (str) : a cheap marker of the store's state (see stor.signature)
+        min_interval (float) : skip if the last snapshot is younger than this (seconds, default MIN_INTERVAL)
+        store : the storage backend; if it has versions() (sqlite), only the keys written since the
+            last snapshot are read, and of lists only the appended items, instead of data
+    return: the new snapshot's name, or None if it was skipped
+    '''
+    last = latest()
+    if last and signature is not None and last.get('signature') == signature:
+        return None
+    min_interval = MIN_INTERVAL if min_interval is None else min_interval
+    if last and min_interval > 0 and (datetime.now() - datetime.fromisoformat(last['time'])).total_seconds() < min_interval:
+        return None
+    os.makedirs(f'{snapdir}/chunks', exist_ok=True)
+    lock = _lock()
+    if lock is None:
+        return None  # another process is taking one
+    with lock:
+        last = latest()
+        if last and signature is not None and last.get('signature') == signature:
+            return None  # just taken by another process
+        return _take(data, signature, store, last)
+
+
+def _take(data, signature, store, last):
+    import hashlib  # only once a snapshot is due; the checks in take() run on every start
+    m = None
+    if last:
+        with open(f"{snapdir}/{last['name']}.json", 'r') as f:
+            m = json.load(f)
+    keys = []  # [key, version, number of chunks, size]
+    hashes = []
+    written = 0
+    if store is not None and hasattr(store, 'versions'):
+        prev = _key_chunks(m) if m else {}
+        with store.reading():
+            for k, version in sorted(store.versions().items()):
+                hs, size, n = _snapshot_key(store, k, version, prev.get(k))
+                keys.append([k, version, len(hs), size])
+                hashes += hs
+                written += n
+    else:
+        if callable(data):
+            data = data()
+        for k, v in (data.items() if isinstance(data, dict) else data):
+            hs, size, n = _store_chunks(records([(k, v)]))
+            keys.append([k, None, len(hs), size])
+            hashes += hs
+            written += n
+    digest = hashlib.sha256('\n'.join(hashes).encode()).hexdigest()
+    if m and m.get('hash') == digest:
+        # same content, e.g. the file was only touched: remember the signature so the next start skips
+        m['signature'] = signature
+        m['keys'] = keys
+        _write_manifest(last['name'], m)
+        return None
+    seq = last['seq'] + 1 if last else 1
+    name = f'{tnow()}-{seq}'
+    _write_manifest(name, {'seq': seq, 'time': datetime.now().isoformat(timespec='seconds'), 'signature': signature,
+                           'hash': digest, 'size': sum(key[3] for key in keys), 'keys': keys, 'chunks': hashes})
+    log(f'snapshot {name}: {len(hashes)} chunks, {written} new')
+    prune()
+    return name
+
+
+def to_keep(ms, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+    '''
+    params:
+        ms : manifests, newest first
+    return: set of the names of the snapshots to keep
+    '''
+    keep = {m['name'] for m in ms[:keep_last]}
+    days, weeks = [], []
+    for m in ms:
+        t = datetime.fromisoformat(m['time'])
+        day, week = t.date(), t.isocalendar()[:2]
+        if day not in days and len(days) < keep_daily:
+            days.append(day)
+            keep.add(m['name'])
+        if week not in weeks and len(weeks) < keep_weekly:
+            weeks.append(week)
+            keep.add(m['name'])
+    return keep
+
+
+def prune():
+    '''
+    delete the snapshots outside the retention policy, and the chunks no snapshot uses anymore.
+    take() runs it holding the lock
+    return: number of snapshots deleted
+    '''
+    ms = manifests()
+    keep = to_keep(ms)
+    gone = [m for m in ms if m['name'] not in keep]
+    if not gone:
+        return 0
+    for m in gone:
+        os.remove(f'{snapdir}/{m["name"]}.json')
+    used = {h for m in ms if m['name'] in keep for h in m['chunks']}
+    for h in {h for m in gone for h in m['chunks']} - used:
+        try:
+            os.remove(chunk_path(h))
+        except FileNotFoundError:
+            pass
+    return len(gone)
+
+
+def restore(name):
+    '''
+    return: the storage dict saved in a snapshot
+    '''
+    with open(f'{snapdir}/{name}.json', 'r') as f:
+        m = json.load(f)
+    data = {}
+    current = None
+    for h in m['chunks']:
+        with open(chunk_path(h), 'rb') as f:
+            chunk = zlib.decompress(f.read())
+        for line in chunk.decode('utf-8').splitlines():
+            rec = json.loads(line)
+            if 'i' in rec:
+                current.append(rec['i'])
+            elif rec.get('list'):
+                current = data[rec['k']] = []
+            else:
+                data[rec['k']] = rec['v']
+    return data
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('list', 'restore'):
+        print(USAGE)
+        return 1
+    if sys.argv[1] == 'list':
+        for m in manifests():
+            print(f"{m['name']}  {m['size']:>10} bytes  {len(m['chunks'])} chunks")
+        return 0
+    data = restore(sys.argv[2])
+    out = sys.argv[3] if len(sys.argv) > 3 else f'stor.{sys.argv[2]}.json'
+    with open(out, 'w') as f:
+        json.dump(data, f)
+    print(f'wrote {len(data)} keys to {out}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
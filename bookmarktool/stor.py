@@ -1,61 +1,465 @@
 import os
 import json
+import atexit
+import threading
+from contextlib import contextmanager
 from util import *
+# sqlite3 is imported when the sqlite backend is opened
 
 verbose=False
-storfile=datadir+"/stor.json"
+backend_name = os.getenv('BOOKMARKTOOL_STORAGE', 'sqlite') # sqlite | json
+jsonfile=datadir+"/stor.json"
+dbfile=datadir+"/stor.db"
+storfile = dbfile if backend_name == 'sqlite' else jsonfile
 storage_inited = False #has the storage been initialized?
+backend = None
+flush_every = int(os.getenv('BOOKMARKTOOL_FLUSH_EVERY', '1'))  # json backend: flush after this many puts
+flush_interval = float(os.getenv('BOOKMARKTOOL_FLUSH_INTERVAL', '2'))  # ...or this many seconds after the first unflushed put
+snapshots = os.getenv('BOOKMARKTOOL_SNAPSHOTS', '1') != '0'  # snapshot the store at startup when it has changed
 
-storage = {} #data that the program persists to disk, such as convo history and user preferences. 
+storage = {} #data that the program persists to disk, such as convo history and user preferences.
   #options: json file, sqlite database
-  # i think storing everything in a json file is fine for something small scale. but will have to update to use sqlite. 
+  # the json file is the original format. the sqlite backend writes one key at a time, and list values one item at a time.
 
 
-def init():
+def atomic_write(path, text):
+  '''
+  write text to path so that a crash leaves either the old or the new file: temp file, fsync, rename
+  '''
+  import tempfile
+  d = os.path.dirname(path) or '.'
+  fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path), suffix='.tmp', dir=d)
+  try:
+    try:
+      mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+      umask = os.umask(0)
+      os.umask(umask)
+      mode = 0o666 & ~umask
+    os.chmod(tmp, mode)  # mkstemp files are 0600
+    with os.fdopen(fd, 'w') as f:
+      f.write(text)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmp, path)
+  except BaseException:
+    if os.path.exists(tmp):
+      os.remove(tmp)
+    raise
+  try:
+    dfd = os.open(d, os.O_RDONLY)
+  except OSError:
+    return  # can't open directories (windows); the rename is still atomic
+  try:
+    os.fsync(dfd)
+  finally:
+    os.close(dfd)
+
+
+class JSONBackend:
+  '''
+  the whole storage dict in one json file.
+  writes are coalesced: a put marks the store dirty, and the file is rewritten once
+  flush_every puts have piled up or flush_interval seconds after the first one,
+  whichever comes first, and at exit. inside batch() nothing is written until the end.
+  '''
+  def __init__(self, path, flush_every=1, flush_interval=2.0):
+    self.path = path
+    self.data = {}
+    self.flush_every = flush_every
+    self.flush_interval = flush_interval
+    self.pending = 0    # puts since the last flush
+    self.batching = 0   # depth of nested batch() blocks
+    self.timer = None
+    self.lock = threading.RLock()
+    self.loaded = None  # signature of the file as this process last read or wrote it
+
+  def open(self):
+    if not os.path.isfile(self.path):
+      atomic_write(self.path, json.dumps(self.data))
+      self.loaded = self.signature()
+      return True
+    with open(self.path, 'r') as f:
+      storText = f.read()
+    self.data = json.loads(storText)
+    self.loaded = self.signature()
+    return True
+
+  def refresh(self):
+    ''' reread the file if another process wrote it since. changes not flushed yet win over it '''
+    with self.lock:
+      try:
+        current = self.signature()
+      except FileNotFoundError:
+        current = None  # deleted: open() writes it again from memory
+      if self.pending or current == self.loaded:
+        return False
+      self.open()
+      return True
+
+  def get(self, k):
+    return self.data.get(k)
+
+  def has(self, k):
+    return k in self.data
+
+  def put(self, k, v):
+    with self.lock:
+      self.data[k] = v
+      self._dirty()
+
+  def append(self, k, item):
+    with self.lock:
+      self.data.setdefault(k, []).append(item)
+      self._dirty()
+
+  def delete(self, k):
+    with self.lock:
+      self.data.pop(k, None)
+      self._dirty()
+
+  def keys(self):
+    return list(self.data)
+
+  def items(self):
+    return list(self.data.items())
+
+  def _dirty(self):
+    self.pending += 1
+    if self.batching:
+      return
+    if self.pending >= self.flush_every:
+      self.flush()
+    elif self.timer is None:
+      self.timer = threading.Timer(self.flush_interval, self.flush)
+      self.timer.daemon = True
+      self.timer.start()
+
+  def flush(self):
+    ''' write the pending changes, if any '''
+    with self.lock:
+      if self.timer is not None:
+        self.timer.cancel()
+        self.timer = None
+      if self.pending:
+        self.write()
+
+  @contextmanager
+  def batch(self):
+    with self.lock:
+      self.batching += 1
+    try:
+      yield self
+    finally:
+      with self.lock:
+        self.batching -= 1
+        if not self.batching:
+          self.flush()
+
+  def write(self, data=None):
+    with self.lock:
+      if data != None:
+        self.data = data
+      atomic_write(self.path, json.dumps(self.data))
+      self.loaded = self.signature()
+      self.pending = 0
+
+  def signature(self):
+    st = os.stat(self.path)
+    return f'{self.path}:{st.st_mtime_ns}:{st.st_size}'
+
+  def close(self):
+    self.flush()
+
+
+class SQLiteBackend:
+  '''
+  a key/value store in sqlite. each key is a row, so a put only writes that key.
+  list values are stored one item per row, so append() writes just the new item.
+  '''
+  def __init__(self, path):
+    self.path = path
+    self.conn = None
+    self.batching = 0
+
+  def open(self):
+    import sqlite3
+    try:
+      self.conn = sqlite3.connect(self.path)
+      self._schema()
+    except sqlite3.Error as e:
+      raise OSError(f'{self.path}: {e}') from e  # so callers don't need sqlite3 to catch it
+    return True
+
+  def _schema(self):
+    self.conn.execute('PRAGMA journal_mode=WAL;')
+    self.conn.execute('PRAGMA synchronous=NORMAL;')
+    self.conn.executescript('''
+      CREATE TABLE IF NOT EXISTS kv (
+        key TEXT PRIMARY KEY,
+        value TEXT,        -- json, NULL for list values
+        is_list INTEGER NOT NULL DEFAULT 0,
+        rev INTEGER NOT NULL DEFAULT 0,   -- meta rev of the last write to the key
+        base INTEGER NOT NULL DEFAULT 0   -- ...and of the last write that was not an append
+      );
+      CREATE TABLE IF NOT EXISTS items (
+        key TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (key, seq)
+      ) WITHOUT ROWID;
+      CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+      );
+    ''')
+    columns = [row[1] for row in self.conn.execute('PRAGMA table_info(kv);')]
+    if 'rev' not in columns:  # created before snapshots read the changed keys only
+      with self.conn:
+        self.conn.execute('ALTER TABLE kv ADD COLUMN rev INTEGER NOT NULL DEFAULT 0;')
+        self.conn.execute('ALTER TABLE kv ADD COLUMN base INTEGER NOT NULL DEFAULT 0;')
+
+  def get(self, k):
+    row = self.conn.execute('SELECT value, is_list FROM kv WHERE key = ?;', (k,)).fetchone()
+    if row is None:
+      return None
+    if row[1]:
+      return [json.loads(v) for (v,) in self.conn.execute('SELECT value FROM items WHERE key = ? ORDER BY seq;', (k,))]
+    return json.loads(row[0])
+
+  def has(self, k):
+    return self.conn.execute('SELECT 1 FROM kv WHERE key = ?;', (k,)).fetchone() is not None
+
+  def _put(self, k, v):
+    self.conn.execute('DELETE FROM items WHERE key = ?;', (k,))
+    if isinstance(v, list):
+      self.conn.execute('INSERT OR REPLACE INTO kv (key, value, is_list) VALUES (?, NULL, 1);', (k,))
+      self.conn.executemany('INSERT INTO items (key, seq, value) VALUES (?, ?, ?);',
+                            [(k, i, json.dumps(item)) for i, item in enumerate(v)])
+    else:
+      self.conn.execute('INSERT OR REPLACE INTO kv (key, value, is_list) VALUES (?, ?, 0);', (k, json.dumps(v)))
+    self._bump(k, replaced=True)
+
+  def _bump(self, k=None, replaced=False):
+    '''
+    count a write in meta rev, and stamp the written key with it: rev always, base unless
+    the write only appended items (see versions())
+    '''
+    self.conn.execute('''
+      INSERT INTO meta (key, value) VALUES ('rev', 1)
+      ON CONFLICT(key) DO UPDATE SET value = value + 1;
+    ''')
+    if k is not None:
+      rev = "(SELECT value FROM meta WHERE key = 'rev')"
+      self.conn.execute(f'UPDATE kv SET rev = {rev}' + (f', base = {rev}' if replaced else '') + ' WHERE key = ?;', (k,))
+
+  @contextmanager
+  def _tx(self):
+    if self.batching:
+      yield  # committed at the end of the batch
+    else:
+      with self.conn:
+        yield
+
+  @contextmanager
+  def batch(self):
+    ''' run several writes as one transaction '''
+    self.batching += 1
+    try:
+      yield self
+    except BaseException:
+      if self.batching == 1:
+        self.conn.rollback()
+      raise
+    else:
+      if self.batching == 1:
+        self.conn.commit()
+    finally:
+      self.batching -= 1
+
+  def flush(self):
+    pass  # every write is committed (or part of a batch)
+
+  def refresh(self):
+    return False  # reads go to the database, so they see other processes' writes
+
+  def put(self, k, v):
+    with self._tx():
+      self._put(k, v)
+
+  def append(self, k, item):
+    with self._tx():
+      row = self.conn.execute('SELECT is_list FROM kv WHERE key = ?;', (k,)).fetchone()
+      if row is None or not row[0]:
+        self._put(k, (self.get(k) if row else []) + [item])
+        return
+      self.conn.execute('''
+        INSERT INTO items (key, seq, value)
+        VALUES (?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM items WHERE key = ?), ?);
+      ''', (k, k, json.dumps(item)))
+      self._bump(k)
+
+  def delete(self, k):
+    with self._tx():
+      self.conn.execute('DELETE FROM kv WHERE key = ?;', (k,))
+      self.conn.execute('DELETE FROM items WHERE key = ?;', (k,))
+      self._bump()
+
+  def keys(self):
+    return [k for (k,) in self.conn.execute('SELECT key FROM kv;')]
+
+  def versions(self):
+    '''
+    return: {key: [rev, base, last item seq (None if not a list)]}. a key whose base is unchanged
+      has only had items appended since, after the last seq seen (see items_after)
+    '''
+    return {k: [rev, base, seq] for k, rev, base, seq in self.conn.execute('''
+      SELECT key, rev, base, CASE WHEN is_list THEN (SELECT COALESCE(MAX(seq), -1) FROM items WHERE items.key = kv.key) END
+      FROM kv;
+    ''')}
+
+  def items_after(self, k, seq):
+    ''' return: the items of list k after seq '''
+    return [json.loads(v) for (v,) in self.conn.execute('SELECT value FROM items WHERE key = ? AND seq > ? ORDER BY seq;', (k, seq))]
+
+  @contextmanager
+  def reading(self):
+    ''' read from one state of the database while other processes write (not inside batch()) '''
+    self.conn.execute('BEGIN;')
+    try:
+      yield self
+    finally:
+      self.conn.rollback()
+
+  def items(self):
+    for k in sorted(self.keys()):
+      yield k, self.get(k)
+
+  def write(self, data=None):
+    ''' replace the whole store with data, as the json backend does '''
+    if data == None:
+      return  # every put is already written
+    with self._tx():
+      for k in self.keys():
+        if k not in data:
+          self.conn.execute('DELETE FROM kv WHERE key = ?;', (k,))
+          self.conn.execute('DELETE FROM items WHERE key = ?;', (k,))
+      for k, v in data.items():
+        self._put(k, v)
+      self._bump()  # also when only deletes were made
+
+  def signature(self):
+    row = self.conn.execute("SELECT value FROM meta WHERE key = 'rev';").fetchone()
+    return f'{self.path}:rev{row[0] if row else 0}'
+
+  def close(self):
+    self.conn.close()
+
+
+def migrate_json(src, dst):
+  '''
+  copy the keys of a json store into a sqlite store. the json file is left as it is, so
+  BOOKMARKTOOL_STORAGE=json still finds the data (as of the migration)
+  '''
+  with open(src, 'r') as f:
+    data = json.loads(f.read() or '{}')
+  db = SQLiteBackend(dst)
+  db.open()
+  db.write(data)
+  db.close()
+  log(f'migrated {len(data)} keys from {src} to {dst}')
+
+
+def init(name=None):
   global storage
   global storage_inited
+  global backend
+  global storfile
   if storage_inited:
     log('storage already initialized')
     return True
-  gotStorageFile = False
-  if not os.path.isfile(f'{datadir}/stor.json'):
-    fStor = open(f'{datadir}/stor.json','w')
-    fStor.write(json.dumps(storage))
-    gotStorageFile = True
-    fStor.close()
-    storage = {}
+  name = name or backend_name
+  os.makedirs(datadir, exist_ok=True)
+  if name == 'sqlite':
+    if os.path.isfile(jsonfile) and not os.path.isfile(dbfile):
+      migrate_json(jsonfile, dbfile)
+    backend = SQLiteBackend(dbfile)
   else:
-    fStor = open(f'{datadir}/stor.json','r')
-    fStorBak = open(f'{datadir}/stor.bak{tnow()}.json','w')
-    storText = fStor.read()
-    fStorBak.write(storText)
-    storage = json.loads(storText)
-    gotStorageFile = True
-    fStor.close()
-    fStorBak.close()
-    
+    if not os.path.isfile(jsonfile) and os.path.isfile(jsonfile + '.migrated'):
+      os.replace(jsonfile + '.migrated', jsonfile)  # moved aside by an earlier migration
+    if os.path.isfile(dbfile) and os.path.isfile(jsonfile) and os.path.getmtime(dbfile) > os.path.getmtime(jsonfile):
+      log(f'warning: {dbfile} was written after {jsonfile}; the json backend does not see those changes')
+    backend = JSONBackend(jsonfile, flush_every, flush_interval)
+    atexit.register(backend.flush)
+  storfile = backend.path
+  try:
+    gotStorageFile = backend.open()
+  except (OSError, ValueError) as e:
+    log(f'error opening storage: {e}')
+    gotStorageFile = False
+  if name != 'sqlite':
+    storage = backend.data
+
   if gotStorageFile:
     storage_inited = True
     log('loaded storage')
+    if snapshots:
+      import snapshot
+      try:
+        snapshot.take(backend.items, backend.signature(), store=backend)
+      except (OSError, ValueError) as e:
+        log(f'error: snapshot failed: {e}')
     return True
   else:
     log('failed to load storage')
     return False
 
 def get(k):
-  if k in storage:
-    return storage[k]
+  if backend.has(k):
+    return backend.get(k)
   else:
     log(f'error: storage does not contain {k}')
 
 def put(k, v):
-  storage[k] = v
-  write()
+  backend.put(k, v)
+
+def append(k, item):
+  ''' add an item to the list stored under k. with the sqlite backend only the item is written '''
+  backend.append(k, item)
+
+def delete(k):
+  backend.delete(k)
+
+def keys():
+  return backend.keys()
 
 def write(data = None):
-  fStor = open(f'{datadir}/stor.json','w')
-  if fStor:
-    fStor.write(json.dumps(storage if data == None else data))
-  else:
-    log('error: could not open storage file')
-  
+  backend.write(data)
+
+def flush():
+  ''' write any changes the backend is holding back '''
+  if backend is not None:
+    backend.flush()
+
+def batch():
+  '''
+  group writes so they are stored together, in one file write (json) or one transaction (sqlite):
+    with stor.batch():
+      for link in links:
+        stor.append('bookmarks', link)
+  '''
+  return backend.batch()
+
+def refresh():
+  '''
+  pick up writes made by other processes since the store was loaded, for long running
+  processes (the repl and the daemon)
+  '''
+  global storage
+  if backend is not None and backend.refresh():
+    storage = backend.data
+
+def signature():
+  ''' return: a string that changes whenever the storage is written '''
+  return backend.signature()
+
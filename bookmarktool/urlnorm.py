@@ -0,0 +1,127 @@
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit
+
+'''
+canonical urls for links, so the same page is stored and deduplicated under one url.
+
+canonical_url() is what gets stored: a working url with
+    - lowercase scheme and host, the host IDNA (punycode) encoded
+    - no default port (:80 for http, :443 for https)
+    - '/' for an empty path and no trailing slash on other paths
+    - no fragment, except hash routes like #/page or #!/page
+    - no utm_* or other tracking params (the order of the others is kept)
+url_key() is the dedup key: the canonical url without its scheme, so
+http:// and https:// copies of a page share a key.
+
+results are cached, since link files repeat hosts and urls a lot. urls that are already
+canonical apart from a trailing slash (the usual case in link dumps) skip urlsplit.
+'''
+
+DEFAULT_PORTS = {'http': 80, 'https': 443, 'ftp': 21}
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|igshid|ref_src|_hsenc|_hsmi)$', re.I)
+TRACKING_HINT = re.compile(r'utm_|clid|mc_[ce]id|igshid|ref_src|_hs', re.I)  # cheap test before splitting a query
+# http(s) url with a lowercase ascii host, no port, user or fragment, and a non-empty query if any
+SIMPLE_URL = re.compile(r'(https?)://([a-z0-9-]+(?:\.[a-z0-9-]+)*)(/[^?#\s]*)?(\?[^#\s]+)?')
+TRAILING_PUNCT = '.,;:!?\'">]}*'
+
+CACHE_SIZE = 1 << 17
+
+
+def strip_trailing_punct(url):
+    '''
+    remove punctuation that ends a sentence or wraps a url in text, e.g. "see https://x.com/a)."
+    a closing paren is kept when the url has a matching opening one (wikipedia style urls)
+    '''
+    while url:
+        if url[-1] in TRAILING_PUNCT:
+            url = url[:-1]
+        elif url[-1] == ')' and url.count(')') > url.count('('):
+            url = url[:-1]
+        else:
+            break
+    return url
+
+
+def _host(hostname):
+    host = hostname.lower().rstrip('.')
+    if not host.isascii():
+        try:
+            host = host.encode('idna').decode('ascii')
+        except UnicodeError:
+            pass  # not a valid IDN, keep it as it is
+    return host
+
+
+def _query(query):
+    if not query or not TRACKING_HINT.search(query):
+        return query
+    return '&'.join(p for p in query.split('&') if p and not TRACKING_PARAMS.match(p.split('=', 1)[0]))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonical_url(url):
+    '''
+    params:
+        url (str) : an absolute url; one without a scheme is taken as http
+    return: the canonical form of the url (see module docstring), or the stripped
+        input if it can't be parsed as a url
+    '''
+    url = url.strip()
+    m = SIMPLE_URL.fullmatch(url)
+    if m and not (m[4] and TRACKING_HINT.search(m[4])):
+        path = m[3]
+        if not path:
+            path = '/'
+        elif len(path) > 1 and path[-1] == '/':
+            path = path.rstrip('/') or '/'
+        return f'{m[1]}://{m[2]}{path}{m[4] or ""}'
+    if '://' not in url:
+        if not url or url.startswith(('mailto:', 'javascript:', 'data:')):
+            return url
+        url = 'http://' + url.lstrip('/')
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if not parts.hostname:
+        return url
+    netloc = _host(parts.hostname)
+    if ':' in netloc:
+        netloc = f'[{netloc}]'  # ipv6
+    if parts.username or parts.password:
+        netloc = parts.netloc.rsplit('@', 1)[0] + '@' + netloc
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc += f':{port}'
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+    fragment = parts.fragment if parts.fragment.startswith(('/', '!')) else ''
+    return urlunsplit((scheme, netloc, path, _query(parts.query), fragment))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def url_key(url):
+    '''
+    return: the dedup key of a url: its canonical form without the scheme, e.g. //x.com/
+    '''
+    canon = canonical_url(url)
+    i = canon.find('://')
+    return canon[i + 1:] if i >= 0 else canon
+
+
+def canonicalize_links(links):
+    '''
+    canonicalize the urls of a stream of links. links whose urls share a key get the
+    url of the first one, so http and https copies collapse into one url
+    params:
+        links (iterable) : link dicts
+    return: generator of link dicts (copies when the url changed)
+    '''
+    first = {}
+    for link in links:
+        url = link.get('url', '')
+        canon = first.setdefault(url_key(url), canonical_url(url))
+        yield link if canon == url else {**link, 'url': canon}
@@ -1,7 +1,12 @@
 from datetime import datetime
-import subprocess
+from collections import deque
+import threading
+import time
+import atexit
 import os
 import json
+# subprocess, shlex, tempfile and signal are imported by the runcmd functions that use them,
+# so importing util (every cli start) doesn't pay for them
 
 verbose=False
 datadir=f'{os.getenv("HOME")}/.local/share/bookmarktool/'
@@ -13,17 +18,114 @@ storage = {} #data that the program persists to disk, such as convo history and
 
 #for now the logging is included in this util module. might break it out later.
 
-def log(msg, label='default'):
-    t = tnow()
-    d = getLogDir()
-    lfpath=f'{d}/{label}.log'
-    if not os.path.isdir(d):
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+log_format = os.getenv('BOOKMARKTOOL_LOG_FORMAT', 'text') # text | json (one json object per line)
+log_level = os.getenv('BOOKMARKTOOL_LOG_LEVEL', 'debug')
+
+
+class Logger:
+    '''
+    buffers log records in memory and writes them from a background thread.
+    the thread writes them every flush_interval seconds, or sooner once flush_at records are waiting.
+    the buffer is bounded: if it fills up anyway, the caller writes it out itself rather than drop records.
+    file handles are kept open per label and reopened when the day (and so the log dir) changes.
+    '''
+
+    def __init__(self, capacity=10000, flush_at=1000, flush_interval=0.5):
+        self.buffer = deque()
+        self.capacity = capacity
+        self.flush_at = flush_at
+        self.flush_interval = flush_interval
+        self.files = {} # label -> (date, file)
+        self.lock = threading.Lock()    # guards the buffer
+        self.io_lock = threading.Lock() # one flush at a time, so records stay in order
+        self.wake = threading.Event()
+        self.thread = None
+
+    def emit(self, record):
+        with self.lock:
+            self.buffer.append(record)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='log-flush', daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+            waiting = len(self.buffer)
+        if waiting >= self.capacity:
+            self.flush()
+        elif waiting >= self.flush_at:
+            self.wake.set()
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def _file(self, label, day):
+        cached = self.files.get(label)
+        if cached and cached[0] == day:
+            return cached[1]
+        if cached:
+            cached[1].close()
+        d = f'{datadir}/log/{day}/'
         os.makedirs(d, exist_ok=True)
-    with open(lfpath, 'a') as lf:
-        lf.write(f'{t}: {msg}\n')
-        lf.close()
+        f = open(f'{d}/{label}.log', 'a')
+        self.files[label] = (day, f)
+        return f
+
+    def flush(self):
+        '''
+        write out everything that is buffered
+        '''
+        with self.io_lock:
+            with self.lock:
+                records = list(self.buffer)
+                self.buffer.clear()
+            touched = set()
+            for r in records:
+                f = self._file(r['label'], r['time'].strftime('%Y%m%d'))
+                f.write(format_record(r) + '\n')
+                touched.add(f)
+            for f in touched:
+                f.flush()
+
+    def close(self):
+        self.flush()
+        with self.io_lock:
+            for _, f in self.files.values():
+                f.close()
+            self.files = {}
+
+
+def format_record(r):
+    if log_format == 'json':
+        rec = {**r, 'time': r['time'].isoformat(timespec='milliseconds')}
+        return json.dumps(rec, default=str)
+    return f"{r['time'].strftime('%Y%m%d-%H%M%S')}: {r['msg']}"
+
+
+logger = Logger()
+
+def log(msg, label='default', level='info', **fields):
+    '''
+    log a message to {datadir}/log/{date}/{label}.log, written in the background.
+    params:
+        msg (str) : the message
+        label (str) : which log file
+        level (str) : debug, info, warning or error; below BOOKMARKTOOL_LOG_LEVEL is ignored
+        fields : extra values, written as keys of the record in json format
+    '''
+    if LEVELS.get(level, 20) < LEVELS.get(log_level, 10):
+        return
+    logger.emit({'time': datetime.now(), 'level': level, 'label': label, 'msg': msg, **fields})
     if verbose: 
         print(f'LOG: {msg}' if label=='default' else f'LOG({label}): {msg}')
+
+def flushlog():
+    '''
+    write buffered log records now, e.g. before reading the log file
+    '''
+    logger.flush()
     
     
 def tnow():
@@ -41,24 +143,159 @@ def getLogDir():
   return logdir
 
 
+cmd_metrics = deque(maxlen=1000) # (cmdstr, seconds, returncode) of recent commands, newest last
+
+def parsecmd(cmdstr):
+    '''
+    split a command line into the argv of each stage of a pipeline, shell-style quoting
+    but no shell: 'grep "a b" f.txt | wc -l' -> [['grep', 'a b', 'f.txt'], ['wc', '-l']]
+    '''
+    import shlex
+    lex = shlex.shlex(cmdstr, posix=True, punctuation_chars='|')
+    lex.whitespace_split = True
+    stages = [[]]
+    for tok in lex:
+        if tok == '|':
+            stages.append([])
+        else:
+            stages[-1].append(tok)
+    if not all(stages):
+        raise ValueError(f'empty command in pipeline: {cmdstr}')
+    return stages
+
+def _record(cmdstr, start, returncode):
+    seconds = time.perf_counter() - start
+    cmd_metrics.append((cmdstr, seconds, returncode))
+    log(f'runcmd: {cmdstr} -> {returncode} in {seconds:.3f}s', level='info' if returncode == 0 else 'warning',
+        cmd=cmdstr, seconds=round(seconds, 6), returncode=returncode)
+
+def _pipeline_returncode(codes):
+    '''
+    the status of a pipeline: the last failing stage's, like bash's pipefail, except that
+    an earlier stage killed by SIGPIPE (its reader exited first, as in 'yes | head') is not a failure
+    '''
+    import signal
+    return next((c for c in reversed(codes) if c and c != -signal.SIGPIPE), 0)
+
+def _spawn(stages, capture_stderr=True):
+    '''
+    start the stages of a pipeline, each reading the previous one's stdout
+    return: list of Popen, the last one's stdout is a pipe. with capture_stderr, the stderr
+        of the earlier stages goes to temp files (p.stderr), so a chatty stage can't block
+    '''
+    import subprocess
+    import tempfile
+    stderr = subprocess.PIPE if capture_stderr else None
+    procs = []
+    stdin = None
+    try:
+        for i, argv in enumerate(stages):
+            err = stderr
+            if stderr == subprocess.PIPE and i < len(stages) - 1:
+                err = tempfile.TemporaryFile()
+            p = subprocess.Popen(argv, stdin=stdin, stdout=subprocess.PIPE, stderr=err)
+            if err is not stderr:
+                p.stderr = err
+            if stdin is not None:
+                stdin.close() # only the next stage reads it, so it sees EOF/SIGPIPE properly
+            stdin = p.stdout
+            procs.append(p)
+    except BaseException:
+        for p in procs:
+            p.kill()
+            p.wait()
+        raise
+    return procs
+
 def runcmd(cmdstr,v=False):
     '''
-    execute a command using the python subprocess module
+    execute a command (or a pipeline, 'a | b') without a shell
     params:
         cmdstr (str) : the command to run
-    return: stdout or stderr of command
-    '''
-    cmdarray = cmdstr.split(' ')
-    log(f'runcmd: {cmdstr}')
-    if '|' in cmdarray:
-        i = cmdarray.index('|')
-        proc0 = subprocess.check_output(cmdstr, shell=True)
-    proc = subprocess.run(cmdarray, stdout=subprocess.PIPE)
-    if proc.returncode == 0:
-        res = proc.stdout
+    return: stdout of the command, or its stderr if it fails (bytes)
+    '''
+    start = time.perf_counter()
+    procs = _spawn(parsecmd(cmdstr))
+    out, err = procs[-1].communicate()
+    errs = []
+    for p in procs[:-1]:
+        p.wait()
+        p.stderr.seek(0)
+        errs.append(p.stderr.read())
+        p.stderr.close()
+    returncode = _pipeline_returncode([p.returncode for p in procs])
+    _record(cmdstr, start, returncode)
+    if returncode == 0:
+        res = out
         if v:
             log(f'result: {res}')
     else:
-        log(f'returncode = {proc.returncode}')
-        res = proc.stderr #TODO should also include stdout here? 
+        res = b''.join(errs) + err
     return res
+
+def streamcmd(cmdstr):
+    '''
+    run a command (or pipeline) and yield its stdout line by line as it is produced,
+    without holding it all in memory. stderr goes to this process's stderr.
+    raises subprocess.CalledProcessError at the end if the command failed
+    '''
+    start = time.perf_counter()
+    import subprocess
+    procs = _spawn(parsecmd(cmdstr), capture_stderr=False)
+    try:
+        yield from procs[-1].stdout
+    finally:
+        procs[-1].stdout.close()
+        for p in procs:
+            p.wait()
+    returncode = _pipeline_returncode([p.returncode for p in procs])
+    _record(cmdstr, start, returncode)
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmdstr)
+
+async def runcmd_async(cmdstr):
+    '''
+    asyncio version of runcmd
+    return: (returncode, stdout, stderr)
+    '''
+    import asyncio
+    import subprocess
+    import tempfile
+    start = time.perf_counter()
+    stages = parsecmd(cmdstr)
+    procs = []
+    errfiles = []
+    stdin = None
+    for i, argv in enumerate(stages):
+        last = i == len(stages) - 1
+        r, w = (None, None) if last else os.pipe()
+        if not last:
+            errfiles.append(tempfile.TemporaryFile())
+        p = await asyncio.create_subprocess_exec(*argv, stdin=stdin,
+                                                 stdout=subprocess.PIPE if last else w,
+                                                 stderr=subprocess.PIPE if last else errfiles[-1])
+        if stdin is not None:
+            os.close(stdin)
+        if w is not None:
+            os.close(w)
+        stdin = r
+        procs.append(p)
+    out, err = await procs[-1].communicate()
+    errs = []
+    for p, f in zip(procs[:-1], errfiles):
+        await p.wait()
+        f.seek(0)
+        errs.append(f.read())
+        f.close()
+    returncode = _pipeline_returncode([p.returncode for p in procs])
+    _record(cmdstr, start, returncode)
+    return returncode, out, b''.join(errs) + err
+
+def runcmds(cmdstrs, workers=4):
+    '''
+    run many commands with at most `workers` running at once
+    return: list of runcmd results, in the order of cmdstrs
+    '''
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(runcmd, cmdstrs))
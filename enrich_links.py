@@ -3,11 +3,20 @@
 Script to enrich links.json by fetching missing labels and descriptions from URLs.
 """
 
+import argparse
+import codecs
 import json
+import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
 from urllib.parse import urlparse
 
+from httpcache import ResponseCache
+from linkio import iter_links, write_links
+
 try:
     import requests
     from bs4 import BeautifulSoup
@@ -18,41 +27,202 @@ except ImportError:
 
 
 def load_links(json_file):
-    """Load links from JSON file."""
-    try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
+    """Stream links from a JSON (.json array or .jsonl) file."""
+    if not os.path.isfile(json_file):
         print(f"Error: {json_file} not found.")
         sys.exit(1)
-    except json.JSONDecodeError as e:
-        print(f"Error reading {json_file}: {e}")
-        sys.exit(1)
+    return iter_links(json_file)
 
 
 def save_links(json_file, links):
-    """Save links to JSON file."""
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(links, f, indent=2, ensure_ascii=False)
-    print(f"\nSaved {len(links)} links to {json_file}")
+    """Save links (any iterable) to JSON file, through a temp file so a crash can't truncate it."""
+    count = write_links(json_file, links)
+    print(f"\nSaved {count} links to {json_file}")
+
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+_local = threading.local()
+
+
+def get_session():
+    """Return a requests session for the current thread (keeps connections alive)."""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        _local.session = session
+    return session
+
+
+class HostThrottle:
+    """
+    Per-host politeness for concurrent fetching.
+    Only one request per host is in flight at a time, and consecutive
+    requests to the same host are spaced at least `delay` seconds apart.
+    """
+
+    def __init__(self, delay=1.0):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._hosts = {}  # host -> [lock, time of last request]
+
+    def _slot(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = [threading.Lock(), 0.0]
+            return self._hosts[host]
+
+    def run(self, url, func, *args, **kwargs):
+        """Call func(*args, **kwargs) once the host of url may be contacted again."""
+        slot = self._slot(urlparse(url).netloc.lower())
+        with slot[0]:
+            wait = slot[1] + self.delay - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                slot[1] = time.monotonic()
+
 
+class FetchError(Exception):
+    """Raised when a page could not be fetched."""
 
-def fetch_html(url, timeout=10):
-    """Fetch HTML content from URL."""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
 
+def fetch_html(url, timeout=10, cache=None, throttle=None):
+    """
+    Fetch HTML content from URL. Raises FetchError on failure.
+    With a ResponseCache, fresh entries are returned without a request and
+    stale ones are revalidated with If-None-Match / If-Modified-Since.
+    With a HostThrottle, network requests go through its per-host limits.
+    """
+    entry = cache.get(url) if cache else None
+    if entry and not entry['complete']:
+        entry = None  # only the head was stored; the full page is needed here
+    if entry and cache.is_fresh(entry):
+        cache.record('fresh')
+        return entry['body']
+
+    headers = cache.conditional_headers(entry) if entry else {}
     try:
-        response = requests.get(url, headers=headers, timeout=timeout, allow_redirects=True)
+        if throttle:
+            response = throttle.run(url, get_session().get, url, headers=headers,
+                                    timeout=timeout, allow_redirects=True)
+        else:
+            response = get_session().get(url, headers=headers, timeout=timeout, allow_redirects=True)
+        if entry and response.status_code == 304:
+            cache.mark_revalidated(url)
+            cache.record('revalidated')
+            return entry['body']
         response.raise_for_status()
+        if cache:
+            cache.put(url, response.status_code, response.text,
+                      etag=response.headers.get('ETag'),
+                      last_modified=response.headers.get('Last-Modified'))
+            cache.record('fetched')
         return response.text
-    except requests.exceptions.Timeout:
-        print(f"  ⚠ Timeout fetching {url}")
-        return None
+    except requests.exceptions.Timeout as e:
+        raise FetchError(f"Timeout fetching {url}") from e
     except requests.exceptions.RequestException as e:
-        print(f"  ⚠ Error fetching {url}: {e}")
-        return None
+        raise FetchError(f"Error fetching {url}: {e}") from e
+
+
+LABEL_KEYS = ['title', 'og:title', 'twitter:title', 'h1']
+DESCRIPTION_KEYS = ['description', 'og:description', 'twitter:description']
+CONTENT_CONTAINERS = ['main', 'article', 'content', 'post-content', 'entry-content']
+
+
+def _candidate_text(key, tag):
+    """Text of a candidate tag, read the way the original extractors read it."""
+    if key == 'title':
+        return tag.string.strip() if tag.string else ''
+    if key in ('h1', 'p'):
+        return tag.get_text().strip()
+    return (tag.get('content') or '').strip()
+
+
+def _pick(found, keys, final):
+    """
+    Return (decided, value) for the first candidate in `keys` with a non-empty value.
+    Until the traversal is over (final=False) a missing candidate may still turn
+    up, so the answer is only decided once every higher-priority one has been seen.
+    """
+    for key in keys:
+        if key not in found:
+            if not final:
+                return False, None
+            continue
+        value = _candidate_text(key, found[key])
+        if value:
+            return True, value
+    return True, None
+
+
+def extract_metadata(soup, url, want_label=True, want_desc=True):
+    """
+    Extract (label, description) from a parsed page in a single traversal.
+    Uses the same priorities as extract_label and extract_description, but
+    collects every candidate in one walk over the tree and stops as soon as
+    the top-priority candidates are known. Fields not asked for are None.
+    """
+    found = {}        # candidate key -> first matching tag
+    containers = {}   # CONTENT_CONTAINERS keyword -> first matching div/main/article
+
+    for node in soup.descendants:
+        name = node.name
+        if name is None:
+            continue
+        key = None
+        if name == 'meta':
+            prop = node.get('property')
+            if prop in ('og:title', 'og:description') and prop not in found:
+                found[prop] = node
+                key = prop
+            meta_name = node.get('name')
+            if meta_name in ('twitter:title', 'description', 'twitter:description') and meta_name not in found:
+                found[meta_name] = node
+                key = meta_name
+        elif name in ('title', 'h1', 'p') and name not in found:
+            found[name] = node
+            key = name
+        if name in ('div', 'main', 'article') and len(containers) < len(CONTENT_CONTAINERS):
+            classes = node.get('class')
+            if classes:
+                joined = ' '.join(classes).lower()
+                for container in CONTENT_CONTAINERS:
+                    if container not in containers and container in joined:
+                        containers[container] = node
+
+        # Stop early once both fields are settled by their top-priority candidates
+        if key and key != 'p':
+            label_done = not want_label or _pick(found, LABEL_KEYS, False)[0]
+            desc_done = not want_desc or _pick(found, DESCRIPTION_KEYS, False)[1]
+            if label_done and desc_done:
+                break
+
+    label = None
+    if want_label:
+        label = _pick(found, LABEL_KEYS, True)[1] or urlparse(url).netloc
+
+    desc = None
+    if want_desc:
+        desc = _pick(found, DESCRIPTION_KEYS, True)[1]
+        if not desc:
+            # First paragraph in main/article/content div, then first p anywhere
+            for container in CONTENT_CONTAINERS:
+                if container in containers:
+                    p = containers[container].find('p')
+                    if p and p.get_text().strip():
+                        desc = p.get_text().strip()[:500]  # Limit to 500 chars
+                        break
+        if not desc and 'p' in found:
+            desc = _candidate_text('p', found['p'])[:500]
+        desc = desc or ""
+
+    return label, desc
 
 
 def extract_label(soup, url):
@@ -60,37 +230,7 @@ def extract_label(soup, url):
     Extract label from HTML.
     Priority: <title>, og:title meta tag, twitter:title, h1, domain name
     """
-    # Try <title> tag
-    title_tag = soup.find('title')
-    if title_tag and title_tag.string:
-        label = title_tag.string.strip()
-        if label:
-            return label
-
-    # Try Open Graph title
-    og_title = soup.find('meta', property='og:title')
-    if og_title and og_title.get('content'):
-        label = og_title['content'].strip()
-        if label:
-            return label
-
-    # Try Twitter title
-    twitter_title = soup.find('meta', attrs={'name': 'twitter:title'})
-    if twitter_title and twitter_title.get('content'):
-        label = twitter_title['content'].strip()
-        if label:
-            return label
-
-    # Try first h1
-    h1 = soup.find('h1')
-    if h1:
-        label = h1.get_text().strip()
-        if label:
-            return label
-
-    # Fallback to domain name
-    parsed = urlparse(url)
-    return parsed.netloc
+    return extract_metadata(soup, url, want_desc=False)[0]
 
 
 def extract_description(soup):
@@ -98,45 +238,163 @@ def extract_description(soup):
     Extract description from HTML.
     Priority: meta description, og:description, twitter:description, first p tag
     """
-    # Try meta description
-    meta_desc = soup.find('meta', attrs={'name': 'description'})
-    if meta_desc and meta_desc.get('content'):
-        desc = meta_desc['content'].strip()
-        if desc:
-            return desc
-
-    # Try Open Graph description
-    og_desc = soup.find('meta', property='og:description')
-    if og_desc and og_desc.get('content'):
-        desc = og_desc['content'].strip()
-        if desc:
-            return desc
-
-    # Try Twitter description
-    twitter_desc = soup.find('meta', attrs={'name': 'twitter:description'})
-    if twitter_desc and twitter_desc.get('content'):
-        desc = twitter_desc['content'].strip()
-        if desc:
-            return desc
-
-    # Try first paragraph in main/article/content div
-    for container in ['main', 'article', 'content', 'post-content', 'entry-content']:
-        content_div = soup.find(['div', 'main', 'article'], class_=lambda c: c and container in c.lower())
-        if content_div:
-            p = content_div.find('p')
-            if p:
-                desc = p.get_text().strip()
-                if desc:
-                    return desc[:500]  # Limit to 500 chars
-
-    # Try first p tag anywhere
-    p = soup.find('p')
-    if p:
-        desc = p.get_text().strip()
-        if desc:
-            return desc[:500]  # Limit to 500 chars
-
-    return ""
+    return extract_metadata(soup, '', want_label=False)[1]
+
+
+class HeadMetaParser(HTMLParser):
+    """
+    Incremental parser for the fields extract_label/extract_description read
+    from the document head: <title> and the og/twitter/description <meta> tags.
+    Feed it chunks of HTML; head_done is set once the head is over.
+    """
+
+    BODY_TAGS = {'body', 'h1', 'p', 'div', 'main', 'article', 'section'}
+    PROPERTY_KEYS = {'og:title', 'og:description'}
+    NAME_KEYS = {'twitter:title', 'description', 'twitter:description'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.meta = {}
+        self.head_done = False
+        self._title_parts = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'title' and self.title is None:
+            self._title_parts = []
+        elif tag == 'meta':
+            attrs = dict(attrs)
+            # Like soup.find, only the first matching tag counts, even if it is empty
+            for key in (attrs.get('property'), attrs.get('name')):
+                if key in self.PROPERTY_KEYS | self.NAME_KEYS and key not in self.meta:
+                    self.meta[key] = attrs.get('content') or ''
+        elif tag in self.BODY_TAGS:
+            self.head_done = True
+
+    def handle_endtag(self, tag):
+        if tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts)
+            self._title_parts = None
+        elif tag == 'head':
+            self.head_done = True
+
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+    def _first(self, values):
+        for value in values:
+            if value and value.strip():
+                return value.strip()
+        return None
+
+    def label(self):
+        """Label from the head (title, og:title, twitter:title), or None."""
+        return self._first([self.title, self.meta.get('og:title'), self.meta.get('twitter:title')])
+
+    def description(self):
+        """Description from the head meta tags, or None."""
+        return self._first([self.meta.get('description'), self.meta.get('og:description'),
+                            self.meta.get('twitter:description')])
+
+    def satisfies(self, want_label, want_desc):
+        """Check if the head alone answers everything that was asked for."""
+        return (not want_label or self.label()) and (not want_desc or self.description())
+
+
+def extract_from_html(html, url, want_label, want_desc, parser=None, html_parser='html.parser'):
+    """
+    Extract (label, description) from HTML, reading the head first and only
+    building the full BeautifulSoup tree when the body heuristics are needed.
+    Fields that were not asked for are returned as None.
+    """
+    if parser is None:
+        parser = HeadMetaParser()
+        for i in range(0, len(html), 16384):
+            parser.feed(html[i:i + 16384])
+            if parser.head_done:
+                break
+
+    label = parser.label() if want_label else None
+    desc = parser.description() if want_desc else None
+    if (want_label and not label) or (want_desc and not desc):
+        soup = BeautifulSoup(html, html_parser)
+        soup_label, soup_desc = extract_metadata(soup, url, want_label and not label, want_desc and not desc)
+        label = label or soup_label
+        desc = desc or soup_desc
+    return label, desc
+
+
+def fetch_page_meta(url, want_label=True, want_desc=True, timeout=10, cache=None, throttle=None,
+                    chunk_size=16384, html_parser='html.parser'):
+    """
+    Fetch url and extract (label, description) while streaming the response.
+    The body is read in chunks and the connection is closed as soon as the end
+    of <head> answers everything asked for; otherwise the rest of the page is
+    read and handed to the full-tree extractors.
+    Returns a dict with 'label', 'description' and 'bytes_read'; raises FetchError on failure.
+    """
+    entry = cache.get(url) if cache else None
+    if entry and not entry['complete']:
+        # A head-only entry is useless if this time we need the body heuristics
+        head = HeadMetaParser()
+        head.feed(entry['body'])
+        if not head.satisfies(want_label, want_desc):
+            entry = None
+    if entry and cache.is_fresh(entry):
+        cache.record('fresh')
+        label, desc = extract_from_html(entry['body'], url, want_label, want_desc, html_parser=html_parser)
+        return {'label': label, 'description': desc, 'bytes_read': 0}
+
+    headers = cache.conditional_headers(entry) if entry else {}
+    try:
+        if throttle:
+            response = throttle.run(url, get_session().get, url, headers=headers, timeout=timeout,
+                                    allow_redirects=True, stream=True)
+        else:
+            response = get_session().get(url, headers=headers, timeout=timeout,
+                                         allow_redirects=True, stream=True)
+        with response:
+            if entry and response.status_code == 304:
+                cache.mark_revalidated(url)
+                cache.record('revalidated')
+                label, desc = extract_from_html(entry['body'], url, want_label, want_desc, html_parser=html_parser)
+                return {'label': label, 'description': desc, 'bytes_read': 0}
+            response.raise_for_status()
+
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+            parser = HeadMetaParser()
+            parts = []
+            bytes_read = 0
+            complete = True
+            for chunk in response.iter_content(chunk_size):
+                bytes_read += len(chunk)
+                text = decoder.decode(chunk)
+                parts.append(text)
+                parser.feed(text)
+                if parser.head_done and parser.satisfies(want_label, want_desc):
+                    complete = False
+                    break
+            if complete:
+                tail = decoder.decode(b'', final=True)
+                parts.append(tail)
+                parser.feed(tail)
+                parser.close()
+    except requests.exceptions.Timeout as e:
+        raise FetchError(f"Timeout fetching {url}") from e
+    except requests.exceptions.RequestException as e:
+        raise FetchError(f"Error fetching {url}: {e}") from e
+
+    html = ''.join(parts)
+    if cache:
+        cache.put(url, response.status_code, html,
+                  etag=response.headers.get('ETag'),
+                  last_modified=response.headers.get('Last-Modified'),
+                  complete=complete)
+        cache.record('fetched')
+
+    label, desc = extract_from_html(html, url, want_label, want_desc, parser=parser, html_parser=html_parser)
+    return {'label': label, 'description': desc, 'bytes_read': bytes_read}
 
 
 def needs_enrichment(link):
@@ -152,8 +410,16 @@ def needs_enrichment(link):
     return label_needs_work or desc_needs_work
 
 
-def enrich_link(link, delay=1.0):
-    """Enrich a single link with label and description."""
+def enrich_link(link, delay=1.0, throttle=None, cache=None, head_only=True, html_parser='html.parser',
+                log=print):
+    """
+    Enrich a single link with label and description.
+    If a HostThrottle is given the fetch goes through it instead of sleeping `delay`.
+    With head_only the page is streamed and parsed only as far as needed;
+    otherwise it is downloaded in full and parsed with BeautifulSoup.
+    html_parser is the BeautifulSoup tree builder ('html.parser' or 'lxml').
+    Returns (link, updated, error) where error is the fetch failure reason or None.
+    """
     url = link.get('url', '')
     label = link.get('label', '')
     description = link.get('description', '')
@@ -162,96 +428,418 @@ def enrich_link(link, delay=1.0):
     desc_needs_work = not description
 
     if not label_needs_work and not desc_needs_work:
-        return link, False
+        return link, False, None
 
-    print(f"\nFetching: {url}")
-    print(f"  Label: {'[MISSING]' if label_needs_work else '[OK]'}")
-    print(f"  Description: {'[MISSING]' if desc_needs_work else '[OK]'}")
+    log(f"\nFetching: {url}")
+    log(f"  Label: {'[MISSING]' if label_needs_work else '[OK]'}")
+    log(f"  Description: {'[MISSING]' if desc_needs_work else '[OK]'}")
 
-    # Fetch HTML
-    html = fetch_html(url)
-    if not html:
-        return link, False
+    try:
+        if head_only:
+            meta = fetch_page_meta(url, label_needs_work, desc_needs_work, cache=cache, throttle=throttle,
+                                   html_parser=html_parser)
+            new_label, new_desc = meta['label'], meta['description']
+        else:
+            # Fetch HTML
+            html = fetch_html(url, cache=cache, throttle=throttle)
 
-    # Parse HTML
-    soup = BeautifulSoup(html, 'html.parser')
+            # Parse HTML
+            soup = BeautifulSoup(html, html_parser)
+            new_label, new_desc = extract_metadata(soup, url, label_needs_work, desc_needs_work)
+    except FetchError as e:
+        log(f"  ⚠ {e}")
+        return link, False, str(e)
 
     updated = False
 
     # Extract label if needed
     if label_needs_work:
-        new_label = extract_label(soup, url)
         if new_label and new_label != url:
             link['label'] = new_label
-            print(f"  ✓ Label: {new_label[:80]}")
+            log(f"  ✓ Label: {new_label[:80]}")
             updated = True
         else:
-            print(f"  ✗ Could not extract label")
+            log(f"  ✗ Could not extract label")
 
     # Extract description if needed
     if desc_needs_work:
-        new_desc = extract_description(soup)
         if new_desc:
             link['description'] = new_desc
-            print(f"  ✓ Description: {new_desc[:80]}...")
+            log(f"  ✓ Description: {new_desc[:80]}...")
             updated = True
         else:
-            print(f"  ✗ Could not extract description")
+            log(f"  ✗ Could not extract description")
 
     # Be nice to servers
-    if delay > 0:
+    if not throttle and delay > 0:
         time.sleep(delay)
 
-    return link, updated
+    return link, updated, None
 
 
-def main():
-    json_file = 'data/links.json'
+class EnrichJournal:
+    """
+    Append-only JSONL journal of per-URL enrichment outcomes.
+
+    Every attempt appends one line: url, status ('ok', 'empty' when the page
+    was fetched but gave neither label nor description, or 'failed'), the
+    extracted label/description or the failure reason, the attempt count and
+    fetched_at. A restarted run replays the journal, skips finished URLs and
+    retries empty and failed ones once their backoff has passed. compact()
+    folds the results into links.json and keeps only the retries in the journal.
+    """
 
-    print("Loading links...")
-    links = load_links(json_file)
-    print(f"Loaded {len(links)} links")
+    def __init__(self, path, retry_base=600, max_attempts=5):
+        self.path = path
+        self.retry_base = retry_base
+        self.max_attempts = max_attempts
+        self.entries = {}  # url -> latest entry
+        self._load()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        try:
+            f = open(self.path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from an interrupted write
+                self.entries[entry['url']] = entry
+
+    def record(self, url, status, **fields):
+        """Append an outcome for url."""
+        prev = self.entries.get(url)
+        attempts = prev['attempts'] + 1 if prev and prev['status'] != 'ok' else 1
+        entry = {'url': url, 'status': status, 'attempts': attempts, 'fetched_at': time.time(), **fields}
+        self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.file.flush()
+        self.entries[url] = entry
+
+    def backoff(self, attempts):
+        """Seconds to wait before retrying after `attempts` empty or failed tries (doubling, capped at a week)."""
+        return min(self.retry_base * 2 ** (attempts - 1), 7 * 24 * 3600)
+
+    def pending(self, url, retry_failed=False):
+        """Check if url still has to be fetched."""
+        entry = self.entries.get(url)
+        if entry is None:
+            return True
+        if entry['status'] == 'ok':
+            return False
+        if retry_failed:
+            return True
+        if entry['attempts'] >= self.max_attempts:
+            return False
+        return time.time() >= entry['fetched_at'] + self.backoff(entry['attempts'])
+
+    def apply(self, link):
+        """Copy a journaled result onto link. Returns True if the link changed."""
+        entry = self.entries.get(link.get('url'))
+        if not entry or entry['status'] != 'ok':
+            return False
+        changed = False
+        for field in ('label', 'description'):
+            if entry.get(field) and link.get(field) != entry[field]:
+                link[field] = entry[field]
+                changed = True
+        return changed
+
+    def failures(self):
+        """Entries whose latest attempt failed or found nothing, to be retried."""
+        return [e for e in self.entries.values() if e['status'] != 'ok']
+
+    def _applied(self, links):
+        for link in links:
+            self.apply(link)
+            yield link
+
+    def compact(self, json_file):
+        """
+        Fold successful results into json_file (streamed through in one pass)
+        and rewrite the journal with only the failures (see failures()).
+        """
+        save_links(json_file, self._applied(load_links(json_file)))
+
+        self.file.close()
+        failures = self.failures()
+        if failures:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for entry in failures:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            os.replace(tmp, self.path)
+        else:
+            os.remove(self.path)
+        self.entries = {e['url']: e for e in failures}
+        self.file = open(self.path, 'a', encoding='utf-8') if failures else None
+
+    def close(self):
+        """Close the journal file."""
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def record_outcome(journal, link, enriched_link, error):
+    """Journal the result of enrich_link for link (the unmodified original)."""
+    if error:
+        journal.record(link['url'], 'failed', reason=error)
+    else:
+        fields = {f: enriched_link[f] for f in ('label', 'description')
+                  if enriched_link.get(f) and enriched_link.get(f) != link.get(f)}
+        if fields:
+            journal.record(link['url'], 'ok', **fields)
+        else:
+            # Retried with backoff like a failure: the page may be down for maintenance or a placeholder
+            journal.record(link['url'], 'empty', reason='no label or description found')
 
-    # Find links that need enrichment
-    needs_work = [link for link in links if needs_enrichment(link)]
-    print(f"\nFound {len(needs_work)} links needing enrichment")
 
-    if not needs_work:
-        print("All links already have labels and descriptions!")
-        return
+def interleave_by_host(links):
+    """
+    Reorder links round-robin by host, so that consecutive jobs hit
+    different servers and workers rarely wait on the same host.
+    """
+    queues = {}
+    for link in links:
+        host = urlparse(link.get('url', '')).netloc.lower()
+        queues.setdefault(host, []).append(link)
+
+    ordered = []
+    queues = list(queues.values())
+    depth = 0
+    while queues:
+        queues = [q for q in queues if len(q) > depth]
+        ordered.extend(q[depth] for q in queues)
+        depth += 1
+    return ordered
+
+
+def enrich_sequential(jobs, journal, delay=1.0, cache=None, head_only=True, html_parser='html.parser'):
+    """
+    Enrich the links in jobs one at a time, journaling each outcome.
+    Returns the number of updated links.
+    """
+    # Throttle per host rather than sleeping after every link, so cache hits cost nothing
+    throttle = HostThrottle(delay)
+    updated_count = 0
+    for i, link in enumerate(jobs, 1):
+        print(f"\n[{i}/{len(jobs)}]", end=' ')
+        enriched_link, was_updated, error = enrich_link(dict(link), throttle=throttle, cache=cache,
+                                                        head_only=head_only, html_parser=html_parser)
+        record_outcome(journal, link, enriched_link, error)
+        if was_updated:
+            updated_count += 1
 
-    # Ask for confirmation
-    response = input(f"\nEnrich {len(needs_work)} links? This may take a while. (y/n): ")
-    if response.lower() != 'y':
-        print("Cancelled.")
-        return
+    return updated_count
+
+
+def enrich_concurrent(jobs, journal, workers=8, delay=1.0, cache=None, head_only=True,
+                      html_parser='html.parser'):
+    """
+    Enrich the links in jobs with a pool of worker threads, journaling each outcome.
+    `workers` bounds the total number of requests in flight, and `delay` is
+    applied per host, so different domains are fetched in parallel.
+    Returns the number of updated links.
+    """
+    throttle = HostThrottle(delay)
+    jobs = interleave_by_host(jobs)
+
+    def work(link):
+        # Buffer the output so lines from different links don't interleave
+        lines = []
+        result = enrich_link(dict(link), throttle=throttle, cache=cache, head_only=head_only,
+                             html_parser=html_parser, log=lines.append)
+        return result, lines
 
-    # Process each link
     updated_count = 0
-    for i, link in enumerate(links, 1):
-        if needs_enrichment(link):
-            print(f"\n[{i}/{len(links)}]", end=' ')
-            enriched_link, was_updated = enrich_link(link, delay=1.0)
-            links[i-1] = enriched_link
+    done = 0
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {pool.submit(work, link): link for link in jobs}
+        for future in as_completed(futures):
+            done += 1
+            (enriched_link, was_updated, error), lines = future.result()
+            print(f"\n[{done}/{len(jobs)}]" + '\n'.join(lines))
+            # Only the main thread writes to the journal
+            record_outcome(journal, futures[future], enriched_link, error)
             if was_updated:
                 updated_count += 1
+    finally:
+        # On Ctrl-C, drop queued jobs instead of waiting for all of them
+        pool.shutdown(wait=True, cancel_futures=True)
 
-            # Save periodically (every 10 links)
-            if updated_count > 0 and updated_count % 10 == 0:
-                save_links(json_file, links)
-                print(f"\n  💾 Progress saved ({updated_count} updated so far)")
+    return updated_count
 
-    # Final save
-    save_links(json_file, links)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Fetch and fill missing labels/descriptions in links.json'
+    )
+    parser.add_argument(
+        '--json-file',
+        default='data/links.json',
+        help='Path to JSON (.json array or .jsonl) file containing links (default: data/links.json)'
+    )
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=1,
+        help='Number of concurrent fetches; 1 fetches sequentially (default: 1)'
+    )
+    parser.add_argument(
+        '--delay',
+        type=float,
+        default=1.0,
+        help='Seconds to wait between requests to the same host (default: 1.0)'
+    )
+    parser.add_argument(
+        '--cache',
+        default='data/enrich_cache.db',
+        help='Path to the HTTP response cache (default: data/enrich_cache.db)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not use the HTTP response cache'
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=7.0,
+        help='Days before a cached page is revalidated with the server (default: 7)'
+    )
+    parser.add_argument(
+        '--cache-max-mb',
+        type=float,
+        default=256.0,
+        help='Maximum cache size in MB; least recently used pages are evicted (default: 256)'
+    )
+    parser.add_argument(
+        '--full-parse',
+        action='store_true',
+        help='Download whole pages and parse them with BeautifulSoup instead of stopping after <head>'
+    )
+    parser.add_argument(
+        '--parser',
+        choices=['html.parser', 'lxml'],
+        default='html.parser',
+        help='BeautifulSoup parser for full-page extraction; lxml is faster (default: html.parser)'
+    )
+    parser.add_argument(
+        '--journal',
+        help='Path to the enrichment journal (default: next to the JSON file, *.journal.jsonl)'
+    )
+    parser.add_argument(
+        '--retry-failed',
+        action='store_true',
+        help='Retry journaled failures now, ignoring their backoff and attempt limit'
+    )
+    parser.add_argument(
+        '--max-attempts',
+        type=int,
+        default=5,
+        help='Give up on a URL after this many failed attempts (default: 5)'
+    )
+    parser.add_argument(
+        '--yes', '-y',
+        action='store_true',
+        help='Do not ask for confirmation'
+    )
+    args = parser.parse_args()
+    json_file = args.json_file
+
+    if args.parser == 'lxml':
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            print("Error: lxml not installed. Install it with: pip install lxml")
+            sys.exit(1)
+
+    # Replay results of an interrupted run, and collect only the links that need work
+    journal = EnrichJournal(args.journal or os.path.splitext(json_file)[0] + '.journal.jsonl',
+                            max_attempts=args.max_attempts)
+    print("Scanning links...")
+    total = 0
+    resumed = 0
+    jobs = []
+    try:
+        for link in load_links(json_file):
+            total += 1
+            if journal.apply(link):
+                resumed += 1
+            if needs_enrichment(link) and journal.pending(link.get('url', ''), args.retry_failed):
+                jobs.append(link)
+    except json.JSONDecodeError as e:
+        print(f"Error reading {json_file}: {e}")
+        journal.close()
+        sys.exit(1)
+    print(f"Scanned {total} links")
+    if resumed:
+        print(f"Resumed {resumed} results from {journal.path}")
+
+    print(f"\nFound {len(jobs)} links needing enrichment")
+
+    if not jobs:
+        print("All links already have labels and descriptions!")
+        if resumed:
+            journal.compact(json_file)
+        journal.close()
+        return
+
+    # Ask for confirmation
+    if not args.yes:
+        response = input(f"\nEnrich {len(jobs)} links? This may take a while. (y/n): ")
+        if response.lower() != 'y':
+            print("Cancelled.")
+            journal.close()
+            return
+
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.cache, ttl=args.cache_ttl * 24 * 3600,
+                              max_bytes=int(args.cache_max_mb * 1024 * 1024))
+
+    # Process each link
+    start = time.monotonic()
+    try:
+        if args.workers > 1:
+            updated_count = enrich_concurrent(jobs, journal, workers=args.workers, delay=args.delay,
+                                              cache=cache, head_only=not args.full_parse,
+                                              html_parser=args.parser)
+        else:
+            updated_count = enrich_sequential(jobs, journal, delay=args.delay, cache=cache,
+                                              head_only=not args.full_parse, html_parser=args.parser)
+    except KeyboardInterrupt:
+        journal.close()
+        print(f"\n\nInterrupted. Progress is in {journal.path}; run again to resume.")
+        sys.exit(130)
+    finally:
+        if cache:
+            cache.close()
+    elapsed = time.monotonic() - start
+
+    # Fold the journal into the JSON file in one write
+    journal.compact(json_file)
+    failures = journal.failures()
+    failed = sum(1 for e in failures if e['status'] == 'failed')
+    journal.close()
 
     print(f"\n{'='*60}")
     print(f"Summary:")
-    print(f"  Total links: {len(links)}")
-    print(f"  Links processed: {len(needs_work)}")
+    print(f"  Total links: {total}")
+    print(f"  Links processed: {len(jobs)}")
     print(f"  Links updated: {updated_count}")
+    print(f"  Links failed (kept in journal for retry): {failed}")
+    print(f"  Links with nothing found (kept in journal for retry): {len(failures) - failed}")
+    print(f"  Elapsed: {elapsed:.1f}s ({len(jobs) / elapsed if elapsed else 0:.2f} links/sec)")
+    if cache:
+        print(f"  {cache.stats()}")
     print(f"{'='*60}")
     print("\nDone!")
 
-
 if __name__ == '__main__':
     main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+On-disk HTTP response cache used by enrich_links.py.
+
+Responses are stored in a SQLite file keyed by normalized URL, together with
+the status, ETag/Last-Modified validators and fetch time. Entries younger than
+the TTL are served without touching the network; older entries are revalidated
+with a conditional request. The cache is bounded in size and evicts the least
+recently used entries first.
+"""
+
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+
+def normalize_url(url):
+    """Normalize a URL for use as a cache key (lowercase scheme/host, no fragment)."""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', parts.query, ''))
+
+
+class ResponseCache:
+    """SQLite-backed response cache with TTL and size-bounded LRU eviction."""
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                complete INTEGER NOT NULL DEFAULT 1
+            );
+        """)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(responses);")]
+        if 'complete' not in columns:
+            self.conn.execute("ALTER TABLE responses ADD COLUMN complete INTEGER NOT NULL DEFAULT 1;")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses;").fetchone()[0]
+        self.counts = {'fresh': 0, 'revalidated': 0, 'fetched': 0}
+
+    def get(self, url):
+        """Return the cached entry for url as a dict, or None."""
+        key = normalize_url(url)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT status, etag, last_modified, body, fetched_at, complete FROM responses WHERE url = ?;",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?;", (time.time(), key))
+        return {
+            'status': row[0],
+            'etag': row[1],
+            'last_modified': row[2],
+            'body': row[3],
+            'fetched_at': row[4],
+            'complete': bool(row[5]),
+        }
+
+    def is_fresh(self, entry):
+        """Check if a cached entry is young enough to be used without revalidation."""
+        return time.time() - entry['fetched_at'] < self.ttl
+
+    def conditional_headers(self, entry):
+        """Build If-None-Match / If-Modified-Since headers for a cached entry."""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url, status, body, etag=None, last_modified=None, complete=True):
+        """
+        Store a response and evict old entries if the cache is over its size limit.
+        complete=False marks a body that was only read up to the end of <head>.
+        """
+        key = normalize_url(url)
+        size = len(body.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            old = self.conn.execute("SELECT size FROM responses WHERE url = ?;", (key,)).fetchone()
+            self.conn.execute("""
+                INSERT OR REPLACE INTO responses
+                    (url, status, etag, last_modified, body, size, fetched_at, accessed_at, complete)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+            """, (key, status, etag, last_modified, body, size, now, now, int(complete)))
+            self.total_bytes += size - (old[0] if old else 0)
+            self._evict()
+
+    def mark_revalidated(self, url):
+        """Record that the server confirmed a cached entry is unchanged (304)."""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?;",
+                (now, now, normalize_url(url))
+            )
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        if self.total_bytes <= self.max_bytes:
+            return
+        rows = self.conn.execute("SELECT url, size FROM responses ORDER BY accessed_at;")
+        doomed = []
+        for url, size in rows:
+            if self.total_bytes <= self.max_bytes:
+                break
+            doomed.append((url,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE url = ?;", doomed)
+
+    def record(self, kind):
+        """Count a lookup outcome: 'fresh', 'revalidated' or 'fetched'."""
+        with self._lock:
+            self.counts[kind] += 1
+
+    def stats(self):
+        """Return a one-line summary of cache usage for this run."""
+        c = self.counts
+        return (f"cache: {c['fresh']} fresh, {c['revalidated']} revalidated, {c['fetched']} fetched, "
+                f"{self.total_bytes / (1024 * 1024):.1f} MB on disk")
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
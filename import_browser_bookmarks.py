@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Script to import browser bookmarks into links.json, through the same merge and
+dedup step as parse_links_txt.py.
+
+Supported sources (the format is detected from the file):
+  - bookmarks.html   the Netscape bookmark file every browser exports
+  - places.sqlite    Firefox's profile database, opened read-only
+  - Bookmarks        Chrome's (and Chromium, Edge, Brave's) profile JSON file
+
+The folders a bookmark is in become its tags (the browser's own roots, such as
+the bookmarks toolbar, are left out), next to Firefox's own tags.
+
+usage:
+  python import_browser_bookmarks.py bookmarks.html
+  python import_browser_bookmarks.py ~/.mozilla/firefox/*.default*/places.sqlite --quiet
+  python import_browser_bookmarks.py ~/.config/chromium/Default/Bookmarks --no-folder-tags
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from html.parser import HTMLParser
+from urllib.parse import quote
+
+from bookmarktool.dupes import DupIndex
+from bookmarktool.urlnorm import canonical_url
+from parse_links_txt import gc_paused, load_existing_urls, merge_links, save_links
+
+# bookmarks that aren't web pages: firefox queries, bookmarklets, browser pages
+SKIP_SCHEMES = ('place:', 'javascript:', 'data:', 'about:', 'chrome:', 'chrome-extension:', 'edge:',
+                'moz-extension:', 'vivaldi:', 'brave:')
+FORMATS = ('html', 'firefox', 'chrome')
+READ_SIZE = 1 << 16
+FIREFOX_TAGS_ROOT = 'tags________'  # guid of the folder that holds firefox's tags
+WORD_RE = re.compile(r'\w+')
+
+
+def folder_tag(name):
+    """Turn a folder name into a tag: lowercase words joined by '_'."""
+    return '_'.join(WORD_RE.findall(name.lower()))
+
+
+def make_link(url, label, folders=(), tags=(), description=''):
+    """
+    Build a link dict from a bookmark, or return None for one that isn't a web page.
+    folders is the bookmark's folder path, outermost first.
+    """
+    url = (url or '').strip()
+    if not url or url.lower().startswith(SKIP_SCHEMES):
+        return None
+    url = canonical_url(url)
+    all_tags = []
+    for tag in [folder_tag(f) for f in folders if f] + [t.strip() for t in tags]:
+        if tag and tag not in all_tags:
+            all_tags.append(tag)
+    return {
+        'url': url,
+        'label': (label or '').strip() or url,
+        'tags': all_tags,
+        'description': (description or '').strip(),
+    }
+
+
+class NetscapeParser(HTMLParser):
+    """
+    Event parser for the Netscape bookmark file format:
+
+        <DT><H3 PERSONAL_TOOLBAR_FOLDER="true">Bookmarks bar</H3>
+        <DL><p>
+            <DT><A HREF="https://example.com/" ADD_DATE="..." TAGS="a,b">Example</A>
+            <DD>optional description
+        </DL><p>
+
+    Fed in chunks; the finished links pile up in self.links for the caller to take.
+    """
+
+    def __init__(self, folder_tags=True):
+        super().__init__(convert_charrefs=True)
+        self.folder_tags = folder_tags
+        self.folders = []     # names of the open <DL>s' folders; None for a browser root
+        self.next_folder = None
+        self.root = False     # whether the <H3> being read is a browser root
+        self.text = None      # text of the <H3> or <A> being read, or of a <DD>
+        self.in_tag = None
+        self.pending = None   # the last <A>, waiting for a possible <DD>
+        self.links = []
+        self.skipped = 0
+
+    def _flush(self):
+        if self.pending is not None:
+            url, label, tags, description = self.pending
+            folders = [f for f in self.folders if f] if self.folder_tags else ()
+            link = make_link(url, label, folders, tags, description)
+            if link is None:
+                self.skipped += 1
+            else:
+                self.links.append(link)
+            self.pending = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            self._flush()
+            attrs = dict(attrs)
+            tags = attrs.get('tags') or ''
+            self.pending = [attrs.get('href'), '', tags.split(',') if tags else [], '']
+            self.in_tag, self.text = 'a', []
+        elif tag == 'h3':
+            self._flush()
+            attrs = dict(attrs)
+            # the toolbar and "other bookmarks" roots are marked, and are not tags
+            self.root = 'personal_toolbar_folder' in attrs or 'unfiled_bookmarks_folder' in attrs
+            self.in_tag, self.text = 'h3', []
+        elif tag == 'dd' and self.pending is not None:
+            self.in_tag, self.text = 'dd', []
+        elif tag == 'dl':
+            self._flush()
+            self.folders.append(self.next_folder)
+            self.next_folder = None
+        elif tag == 'dt':
+            self._end_dd()
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self.in_tag == 'a':
+            self.pending[1] = ''.join(self.text)
+            self.in_tag = None
+        elif tag == 'h3' and self.in_tag == 'h3':
+            self.next_folder = None if self.root else ''.join(self.text).strip()
+            self.in_tag = None
+        elif tag == 'dl':
+            self._end_dd()
+            self._flush()
+            if self.folders:
+                self.folders.pop()
+
+    def _end_dd(self):
+        if self.in_tag == 'dd':
+            self.pending[3] = ''.join(self.text)
+            self.in_tag = None
+        self._flush()
+
+    def handle_data(self, data):
+        if self.in_tag:
+            self.text.append(data)
+
+    def close(self):
+        super().close()
+        self._end_dd()
+
+
+def iter_netscape_html(path, folder_tags=True, stats=None):
+    """
+    Yield the links of a Netscape bookmark file, reading it in READ_SIZE chunks.
+    stats (a dict), if given, gets the number of skipped bookmarks under 'skipped'.
+    """
+    parser = NetscapeParser(folder_tags)
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                parser.close()
+            else:
+                parser.feed(chunk)
+            yield from parser.links
+            parser.links.clear()
+            if not chunk:
+                break
+    if stats is not None:
+        stats['skipped'] = parser.skipped
+
+
+def open_places(path):
+    """
+    Open a Firefox places.sqlite read-only. If Firefox has it open and locked,
+    read the file as it is on disk (changes still in Firefox's WAL are not seen).
+    """
+    uri = 'file:' + quote(os.path.abspath(path))
+    conn = sqlite3.connect(uri + '?mode=ro', uri=True)
+    try:
+        conn.execute('SELECT 1 FROM moz_bookmarks LIMIT 1;')
+        return conn
+    except sqlite3.OperationalError as e:
+        conn.close()
+        if 'locked' not in str(e):
+            raise
+    return sqlite3.connect(uri + '?immutable=1', uri=True)
+
+
+def iter_firefox_places(path, folder_tags=True, stats=None):
+    """
+    Yield the links of a Firefox places.sqlite, one database row at a time.
+    Folder paths come from a recursive query over the folders, the tags from
+    Firefox's tag folders.
+    """
+    conn = open_places(path)
+    sep = '\x1f'
+    try:
+        rows = conn.execute(f'''
+            WITH RECURSIVE folders(id, depth, path) AS (
+                SELECT id, 0, '' FROM moz_bookmarks WHERE parent = 0
+                UNION ALL
+                SELECT b.id, folders.depth + 1,
+                       CASE WHEN folders.depth = 0 THEN '' ELSE folders.path || '{sep}' || COALESCE(b.title, '') END
+                FROM moz_bookmarks b JOIN folders ON b.parent = folders.id
+                WHERE b.type = 2 AND b.guid IS NOT '{FIREFOX_TAGS_ROOT}'
+            )
+            SELECT p.url, b.title, folders.path,
+                   (SELECT group_concat(t.title, '{sep}')
+                    FROM moz_bookmarks tb JOIN moz_bookmarks t ON tb.parent = t.id
+                    WHERE tb.fk = b.fk AND tb.type = 1
+                      AND t.parent = (SELECT id FROM moz_bookmarks WHERE guid = '{FIREFOX_TAGS_ROOT}'))
+            FROM moz_bookmarks b
+            JOIN folders ON b.parent = folders.id
+            JOIN moz_places p ON p.id = b.fk
+            WHERE b.type = 1
+            ORDER BY b.parent, b.position;
+        ''')
+        skipped = 0
+        for url, title, folder_path, tags in rows:
+            # the path leaves out the root and its children (menu, toolbar, unfiled, mobile)
+            folders = folder_path.split(sep) if folder_tags and folder_path else ()
+            link = make_link(url, title, folders, tags.split(sep) if tags else ())
+            if link is None:
+                skipped += 1
+            else:
+                yield link
+        if stats is not None:
+            stats['skipped'] = skipped
+    finally:
+        conn.close()
+
+
+def iter_chrome_bookmarks(path, folder_tags=True, stats=None):
+    """
+    Yield the links of a Chrome Bookmarks file. Chrome writes a folder's children
+    before its name, so the file is decoded whole, but each node is cut down to
+    what the import needs as it is decoded (dates, guids and meta_info are dropped).
+    """
+    def compact(node):
+        kind = node.get('type')
+        if kind == 'url':
+            return ('url', node.get('url'), node.get('name'))
+        if kind == 'folder':
+            return ('folder', node.get('name'), node.get('children', []))
+        return node
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f, object_hook=compact)
+    skipped = 0
+    # the roots (bookmark_bar, other, synced) are not tags; their subfolders are
+    stack = [(node[2], ()) for node in data.get('roots', {}).values() if isinstance(node, tuple) and node[0] == 'folder']
+    stack.reverse()
+    while stack:
+        children, folders = stack.pop()
+        subfolders = []
+        for node in children:
+            if node[0] == 'url':
+                link = make_link(node[1], node[2], folders)
+                if link is None:
+                    skipped += 1
+                else:
+                    yield link
+            elif node[0] == 'folder':
+                subfolders.append((node[2], folders + (node[1],) if folder_tags else ()))
+        stack.extend(reversed(subfolders))
+    if stats is not None:
+        stats['skipped'] = skipped
+
+
+READERS = {'html': iter_netscape_html, 'firefox': iter_firefox_places, 'chrome': iter_chrome_bookmarks}
+
+
+def detect_format(path):
+    """Tell html, firefox and chrome bookmark files apart by their first bytes."""
+    with open(path, 'rb') as f:
+        head = f.read(512)
+    if head.startswith(b'SQLite format 3\0'):
+        return 'firefox'
+    text = head.lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+    if text.startswith(b'{'):
+        return 'chrome'
+    if text.startswith((b'<!doctype netscape', b'<')):
+        return 'html'
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import browser bookmarks into links.json')
+    parser.add_argument('sources', nargs='+', help='bookmarks.html exports, places.sqlite or Chrome Bookmarks files')
+    parser.add_argument('--format', choices=FORMATS, help='Format of the sources (default: detected)')
+    parser.add_argument('--json-file', default='data/links.json', help='Links file to add to (default: data/links.json)')
+    parser.add_argument('--no-folder-tags', action='store_true', help="Don't tag bookmarks with their folders")
+    parser.add_argument('--quiet', '-q', action='store_true', help="Don't print every link added or skipped")
+    parser.add_argument('--near-dupes', action='store_true',
+                        help='Report new links that look like existing ones (indexes every link in memory)')
+    args = parser.parse_args()
+    json_file = args.json_file
+
+    print(f"Loading existing links from {json_file}...")
+    near = DupIndex() if args.near_dupes else None
+    existing = load_existing_urls(json_file, near)
+    if existing is None:
+        print(f"Not overwriting {json_file}; fix or remove it first.")
+        sys.exit(1)
+    existing_urls, existing_count = existing
+    print(f"Found {existing_count} existing links\n")
+
+    added_links = []
+    possible = []
+    rows = []
+    for path in args.sources:
+        try:
+            fmt = args.format or detect_format(path)
+        except OSError as e:
+            print(f"Error: {path}: {e}")
+            continue
+        if fmt is None:
+            print(f"Error: {path}: not a bookmarks.html, places.sqlite or Chrome Bookmarks file (use --format)")
+            continue
+        print(f"Importing {path} ({fmt})...")
+        stats = {}
+        read = [0]
+        failed = []
+
+        def counted(links):
+            # a read error ends the source instead of escaping merge_links, so the links
+            # it already took (and marked as existing) are kept and saved
+            try:
+                for link in links:
+                    read[0] += 1
+                    yield link
+            except (OSError, ValueError, sqlite3.Error) as e:
+                failed.append(e)
+
+        start = time.perf_counter()
+        with gc_paused():
+            added, maybe = merge_links(existing_urls, counted(READERS[fmt](path, not args.no_folder_tags, stats)),
+                                       near, args.quiet)
+        elapsed = time.perf_counter() - start
+        if failed:
+            print(f"Error reading {path}: {failed[0]} (keeping the {len(added)} new links read before it)")
+        added_links += added
+        possible += maybe
+        rows.append((path, fmt, read[0], stats.get('skipped', 0), len(added), len(maybe), elapsed))
+
+    if not rows:
+        sys.exit(1)
+    width = max([len(r[0]) for r in rows] + [6])
+    dupes_col = f"{'possible dupes':>16}" if near is not None else ''
+    print(f"\n{'source':<{width}}{'format':>9}{'bookmarks':>11}{'skipped':>9}{'new':>8}{dupes_col}{'per second':>12}")
+    for path, fmt, read, skipped, added, maybe, elapsed in rows:
+        dupes = f"{maybe:>16}" if near is not None else ''
+        print(f"{path:<{width}}{fmt:>9}{read:>11}{skipped:>9}{added:>8}{dupes}{read / max(elapsed, 1e-9):>12,.0f}")
+
+    print(f"\n{'='*60}")
+    print(f"Summary:")
+    print(f"  Bookmarks read: {sum(r[2] for r in rows)} (not web pages, skipped: {sum(r[3] for r in rows)})")
+    print(f"  Links already in {json_file}: {existing_count}")
+    print(f"  New links added: {len(added_links)}")
+    if near is not None:
+        print(f"  Possible duplicates among them: {len(possible)}")
+    print(f"  Total links now: {existing_count + len(added_links)}")
+    print(f"{'='*60}\n")
+
+    save_links(json_file, added_links)
+    print("Done!")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,36 +3,167 @@
 Script to import links from links.json into a PostgreSQL or SQLite database.
 """
 
+import csv
+import hashlib
+import io
 import json
 import sys
 import os
+import time
 import argparse
+from datetime import datetime
+from itertools import islice
+
+from bookmarktool.urlnorm import canonicalize_links
+from linkio import iter_links
+
+
+# Default PRAGMAs for bulk SQLite imports: WAL journaling, fewer fsyncs and a 64 MB page cache
+SQLITE_BULK_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': '-65536',
+    'temp_store': 'MEMORY',
+}
 
 
 def load_json_file(filename):
-    """Load and parse the JSON file."""
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        print(f"Loaded {len(data)} links from {filename}")
-        return data
-    except FileNotFoundError:
+    """
+    Open the links file (.json array or .jsonl) for streaming.
+    Returns an iterator of link dicts; invalid JSON is reported while importing.
+    """
+    if not os.path.isfile(filename):
         print(f"Error: File '{filename}' not found.")
         sys.exit(1)
-    except json.JSONDecodeError as e:
-        print(f"Error: Invalid JSON in file: {e}")
-        sys.exit(1)
+    print(f"Streaming links from {filename}")
+    return iter_links(filename)
+
+
+def content_hash(link):
+    """Hash of the fields that are stored in the database (url, label, tags, description)."""
+    key = json.dumps([link.get('url', ''), link.get('label', ''), link.get('tags', []),
+                      link.get('description', '')], ensure_ascii=False)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class ChangeSet:
+    """
+    Compares a stream of links against the content hashes in the database, one
+    batch of urls at a time, so memory doesn't grow with the table. Iterating it
+    yields only new or changed links; afterwards the counts are filled in. The
+    urls it saw are recorded in the database (handler.mark_seen), so that
+    handler.delete_unseen() can remove the rows missing from the stream.
+    """
+
+    _SEEN = object()
+
+    def __init__(self, links, handler, batch_size=50000):
+        self.links = links
+        self.handler = handler
+        self.batch_size = batch_size
+        self.inserted = 0
+        self.changed = 0
+        self.unchanged = 0
+
+    def __iter__(self):
+        for chunk in chunked(self.links, self.batch_size):
+            urls = [link.get('url', '') for link in chunk]
+            known = self.handler.get_hashes(urls)
+            for url in self.handler.mark_seen(urls):
+                known[url] = self._SEEN  # seen in an earlier batch
+            for link in chunk:
+                url = link.get('url', '')
+                old = known.get(url)
+                known[url] = self._SEEN
+                if old is self._SEEN:
+                    yield link  # repeated url in the input; the last one wins, as before
+                elif old is None:
+                    self.inserted += 1
+                    yield link
+                elif old != content_hash(link):
+                    self.changed += 1
+                    yield link
+                else:
+                    self.unchanged += 1
+
+
+def chunked(iterable, size):
+    """Yield lists of up to `size` items from iterable."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_pragmas(items):
+    """Turn ['journal_mode=WAL', ...] into a dict, on top of the bulk defaults."""
+    pragmas = dict(SQLITE_BULK_PRAGMAS)
+    for item in items or []:
+        name, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"PRAGMA must be given as name=value, got '{item}'")
+        pragmas[name.strip()] = value.strip()
+    return pragmas
+
+
+class LinkCopyStream:
+    """
+    Read-only file-like object that renders links as CSV rows on demand,
+    for psycopg2's copy_expert. Only one read() worth of rows is in memory.
+    """
+
+    def __init__(self, links):
+        self.links = iter(links)
+        self.count = 0
+        self._pending = ''
+        self._out = io.StringIO()
+        self._writer = csv.writer(self._out, quoting=csv.QUOTE_ALL, lineterminator='\n')
+
+    @staticmethod
+    def pg_array(values):
+        """Render a list of strings as a PostgreSQL array literal."""
+        items = ('"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"' for v in values or [])
+        return '{' + ','.join(items) + '}'
+
+    def read(self, size=-1):
+        # Rows left over from the last read count towards size, so they are
+        # at most one row long and never pile up across reads
+        if 0 <= size <= len(self._pending):
+            data, self._pending = self._pending[:size], self._pending[size:]
+            return data
+        buffered = len(self._pending)
+        for link in self.links:
+            # QUOTE_ALL keeps empty strings distinct from NULL in COPY's csv format
+            self._writer.writerow((link.get('url', ''),
+                                   link.get('label', ''),
+                                   self.pg_array(link.get('tags', [])),
+                                   link.get('description', ''),
+                                   content_hash(link)))
+            self.count += 1
+            if 0 <= size <= buffered + self._out.tell():
+                break
+        data = self._pending + self._out.getvalue()
+        self._out.seek(0)
+        self._out.truncate()
+        if size < 0:
+            size = len(data)
+        self._pending = data[size:]
+        return data[:size]
 
 
 class PostgreSQLHandler:
     """Handler for PostgreSQL database operations."""
 
-    def __init__(self, config):
+    def __init__(self, config, batch_size=50000, gin_index=False):
         import psycopg2
         from psycopg2.extras import execute_values
         self.psycopg2 = psycopg2
         self.execute_values = execute_values
         self.config = config
+        self.batch_size = batch_size
+        self.gin_index = gin_index
         self.conn = None
         self.cursor = None
 
@@ -52,32 +183,228 @@ class PostgreSQLHandler:
                 tags TEXT[],
                 description TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                content_hash TEXT,
                 UNIQUE(url)
             );
         """)
+        # Tables created before content hashing was added
+        self.cursor.execute("ALTER TABLE links ADD COLUMN IF NOT EXISTS content_hash TEXT;")
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS import_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        if self.gin_index:
+            # Serves tag filters on links.tags directly, e.g. WHERE tags @> ARRAY['python']
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS links_tags_gin ON links USING GIN (tags);")
+        self.create_tag_tables()
         print("Table 'links' created or already exists.")
 
+    def create_tag_tables(self):
+        """
+        Create the tags table and the link_tags pivot table (docs/datacluster.md).
+        When they are new, they are filled in from the tags of the existing rows.
+        """
+        self.cursor.execute("SELECT to_regclass('tags') IS NULL;")
+        backfill = self.cursor.fetchone()[0]
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tags (
+                id SERIAL PRIMARY KEY,
+                label TEXT NOT NULL UNIQUE,
+                description TEXT,
+                refs INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                modified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        # The primary key serves tag -> links lookups, link_tags_link the reverse
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS link_tags (
+                tag_id INTEGER NOT NULL REFERENCES tags (id) ON DELETE CASCADE,
+                link_id INTEGER NOT NULL REFERENCES links (id) ON DELETE CASCADE,
+                PRIMARY KEY (tag_id, link_id)
+            );
+        """)
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS link_tags_link ON link_tags (link_id);")
+        # Per-session work tables for keeping link_tags and refs in step with links
+        self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS sync_urls (url TEXT PRIMARY KEY);")
+        self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS touched_tags (tag_id INTEGER PRIMARY KEY);")
+        self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS seen_urls (url TEXT PRIMARY KEY);")
+        if backfill:
+            self.cursor.execute("INSERT INTO sync_urls SELECT url FROM links;")
+            self._sync_tags()
+            self.update_tag_refs()
+
+    def _unlink_tags(self):
+        """Remove the link_tags rows of the urls in sync_urls, noting the tags they pointed to."""
+        link_ids = "SELECT id FROM links WHERE url IN (SELECT url FROM sync_urls)"
+        self.cursor.execute(f"""
+            INSERT INTO touched_tags SELECT DISTINCT tag_id FROM link_tags WHERE link_id IN ({link_ids})
+            ON CONFLICT DO NOTHING;
+        """)
+        self.cursor.execute(f"DELETE FROM link_tags WHERE link_id IN ({link_ids});")
+
+    def _sync_tags(self):
+        """Rebuild the link_tags rows of the urls in sync_urls from links.tags, then empty sync_urls."""
+        self._unlink_tags()
+        self.cursor.execute("""
+            INSERT INTO tags (label)
+            SELECT DISTINCT t.label
+            FROM links l JOIN sync_urls s ON s.url = l.url
+            CROSS JOIN LATERAL unnest(l.tags) AS t(label)
+            WHERE t.label IS NOT NULL
+            ON CONFLICT (label) DO NOTHING;
+        """)
+        self.cursor.execute("""
+            INSERT INTO link_tags (tag_id, link_id)
+            SELECT tags.id, l.id
+            FROM links l JOIN sync_urls s ON s.url = l.url
+            CROSS JOIN LATERAL unnest(l.tags) AS t(label)
+            JOIN tags ON tags.label = t.label
+            ON CONFLICT DO NOTHING;
+        """)
+        self.cursor.execute("""
+            INSERT INTO touched_tags
+            SELECT DISTINCT tag_id FROM link_tags
+            WHERE link_id IN (SELECT id FROM links WHERE url IN (SELECT url FROM sync_urls))
+            ON CONFLICT DO NOTHING;
+        """)
+        self.cursor.execute("TRUNCATE sync_urls;")
+
+    def update_tag_refs(self):
+        """Recount refs for every tag whose links changed since the last call."""
+        self.cursor.execute("""
+            UPDATE tags SET
+                refs = (SELECT COUNT(*) FROM link_tags WHERE tag_id = tags.id),
+                modified_at = CURRENT_TIMESTAMP
+            WHERE id IN (SELECT tag_id FROM touched_tags);
+        """)
+        updated = self.cursor.rowcount
+        self.cursor.execute("TRUNCATE touched_tags;")
+        return updated
+
     def insert_links(self, links):
-        """Insert links into the database."""
-        data = [
+        """Insert links into the database, one execute_values statement per batch."""
+        data = (
             (link.get('url', ''),
              link.get('label', ''),
              link.get('tags', []),
-             link.get('description', ''))
+             link.get('description', ''),
+             content_hash(link))
             for link in links
-        ]
+        )
 
+        # Rows whose hash is unchanged are left alone, so they aren't rewritten
         query = """
-            INSERT INTO links (url, label, tags, description)
+            INSERT INTO links (url, label, tags, description, content_hash)
             VALUES %s
             ON CONFLICT (url) DO UPDATE SET
                 label = EXCLUDED.label,
                 tags = EXCLUDED.tags,
-                description = EXCLUDED.description;
+                description = EXCLUDED.description,
+                content_hash = EXCLUDED.content_hash
+            WHERE links.content_hash IS DISTINCT FROM EXCLUDED.content_hash;
         """
 
-        self.execute_values(self.cursor, query, data)
-        print(f"Successfully inserted/updated {len(links)} links.")
+        count = 0
+        for chunk in chunked(data, self.batch_size):
+            count += len(chunk)
+            # One INSERT ... ON CONFLICT cannot update the same row twice, so a url
+            # repeated within the chunk (e.g. http/https variants that canonicalize
+            # to one url) keeps only its last occurrence, as the row-by-row SQLite path does
+            chunk = list({row[0]: row for row in chunk}.values())
+            self.execute_values(self.cursor, query, chunk, page_size=len(chunk))
+            self.execute_values(self.cursor, "INSERT INTO sync_urls (url) VALUES %s ON CONFLICT DO NOTHING;",
+                                [(row[0],) for row in chunk], page_size=len(chunk))
+            self._sync_tags()
+        print(f"Successfully inserted/updated {count} links.")
+
+    def copy_links(self, links):
+        """
+        Stream links into a temporary staging table with COPY FROM STDIN, then
+        merge them into links with a single INSERT ... ON CONFLICT.
+        links can be any iterable (e.g. linkio.iter_links), so memory stays constant.
+        """
+        start = time.monotonic()
+        self.cursor.execute("""
+            CREATE TEMP TABLE links_staging (
+                seq BIGSERIAL,
+                url TEXT,
+                label TEXT,
+                tags TEXT[],
+                description TEXT,
+                content_hash TEXT
+            ) ON COMMIT DROP;
+        """)
+        stream = LinkCopyStream(links)
+        self.cursor.copy_expert(
+            "COPY links_staging (url, label, tags, description, content_hash) FROM STDIN WITH (FORMAT csv);",
+            stream
+        )
+        # DISTINCT ON keeps the last occurrence of a url, since one
+        # INSERT ... ON CONFLICT cannot update the same row twice.
+        # The urls of rows actually written are queued for the tag sync.
+        self.cursor.execute("""
+            WITH merged AS (
+                INSERT INTO links (url, label, tags, description, content_hash)
+                SELECT DISTINCT ON (url) url, label, tags, description, content_hash
+                FROM links_staging
+                ORDER BY url, seq DESC
+                ON CONFLICT (url) DO UPDATE SET
+                    label = EXCLUDED.label,
+                    tags = EXCLUDED.tags,
+                    description = EXCLUDED.description,
+                    content_hash = EXCLUDED.content_hash
+                WHERE links.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                RETURNING url
+            )
+            INSERT INTO sync_urls (url) SELECT url FROM merged;
+        """)
+        merged = self.cursor.rowcount
+        self._sync_tags()
+        elapsed = time.monotonic() - start
+
+        rate = stream.count / elapsed if elapsed else 0
+        print(f"Successfully copied {stream.count} links, merged {merged} "
+              f"({rate:.0f} rows/sec).")
+
+    def get_hashes(self, urls):
+        """Return {url: content_hash} for the rows with the given urls."""
+        self.cursor.execute("SELECT url, content_hash FROM links WHERE url = ANY(%s);", (urls,))
+        return {url: h or '' for url, h in self.cursor.fetchall()}
+
+    def mark_seen(self, urls):
+        """Record urls as present in the source; return those that already were."""
+        self.cursor.execute("SELECT url FROM seen_urls WHERE url = ANY(%s);", (urls,))
+        repeated = [url for (url,) in self.cursor.fetchall()]
+        self.cursor.execute("INSERT INTO seen_urls SELECT unnest(%s::text[]) ON CONFLICT DO NOTHING;", (urls,))
+        return repeated
+
+    def delete_unseen(self):
+        """Delete the rows whose url was not marked seen in this import; return how many."""
+        self.cursor.execute("""
+            INSERT INTO sync_urls
+            SELECT url FROM links l WHERE NOT EXISTS (SELECT 1 FROM seen_urls s WHERE s.url = l.url);
+        """)
+        self._unlink_tags()
+        self.cursor.execute("DELETE FROM links WHERE url IN (SELECT url FROM sync_urls);")
+        deleted = self.cursor.rowcount
+        self.cursor.execute("TRUNCATE sync_urls, seen_urls;")
+        return deleted
+
+    def get_state(self, key):
+        """Read a value from the import_state table."""
+        self.cursor.execute("SELECT value FROM import_state WHERE key = %s;", (key,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key, value):
+        """Write a value to the import_state table."""
+        self.cursor.execute("""
+            INSERT INTO import_state (key, value) VALUES (%s, %s)
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value;
+        """, (key, value))
 
     def get_count(self):
         """Get total count of links."""
@@ -99,18 +426,22 @@ class PostgreSQLHandler:
 class SQLiteHandler:
     """Handler for SQLite database operations."""
 
-    def __init__(self, db_path):
+    def __init__(self, db_path, batch_size=50000, pragmas=None):
         import sqlite3
         self.sqlite3 = sqlite3
         self.db_path = db_path
+        self.batch_size = batch_size
+        self.pragmas = SQLITE_BULK_PRAGMAS if pragmas is None else pragmas
         self.conn = None
         self.cursor = None
 
     def connect(self):
-        """Connect to SQLite database."""
+        """Connect to SQLite database and apply the configured PRAGMAs."""
         print(f"Connecting to SQLite database '{self.db_path}'...")
         self.conn = self.sqlite3.connect(self.db_path)
         self.cursor = self.conn.cursor()
+        for name, value in self.pragmas.items():
+            self.cursor.execute(f"PRAGMA {name}={value};")
 
     def create_table(self):
         """Create the links table if it doesn't exist."""
@@ -121,29 +452,182 @@ class SQLiteHandler:
                 label TEXT NOT NULL,
                 tags TEXT,
                 description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                content_hash TEXT
             );
         """)
+        # Tables created before content hashing was added
+        columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(links);")]
+        if 'content_hash' not in columns:
+            self.cursor.execute("ALTER TABLE links ADD COLUMN content_hash TEXT;")
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS import_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self.create_tag_tables()
         print("Table 'links' created or already exists.")
 
-    def insert_links(self, links):
-        """Insert links into the database."""
-        for link in links:
-            url = link.get('url', '')
-            label = link.get('label', '')
-            tags = json.dumps(link.get('tags', []))  # Store tags as JSON string
-            description = link.get('description', '')
+    def create_tag_tables(self):
+        """
+        Create the tags table and the link_tags pivot table (docs/datacluster.md).
+        When they are new, they are filled in from the tags of the existing rows.
+        """
+        backfill = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tags';"
+        ).fetchone() is None
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tags (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                label TEXT NOT NULL UNIQUE,
+                description TEXT,
+                refs INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                modified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        # The primary key serves tag -> links lookups, link_tags_link the reverse
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS link_tags (
+                tag_id INTEGER NOT NULL REFERENCES tags (id) ON DELETE CASCADE,
+                link_id INTEGER NOT NULL REFERENCES links (id) ON DELETE CASCADE,
+                PRIMARY KEY (tag_id, link_id)
+            ) WITHOUT ROWID;
+        """)
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS link_tags_link ON link_tags (link_id);")
+        # Per-connection work tables for keeping link_tags and refs in step with links
+        self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS sync_urls (url TEXT PRIMARY KEY);")
+        self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS touched_tags (tag_id INTEGER PRIMARY KEY);")
+        self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS seen_urls (url TEXT PRIMARY KEY);")
+        if backfill:
+            with self.conn:
+                self.cursor.execute("INSERT INTO sync_urls SELECT url FROM links;")
+                self._sync_tags()
+                self.update_tag_refs()
+
+    def _unlink_tags(self):
+        """Remove the link_tags rows of the urls in sync_urls, noting the tags they pointed to."""
+        link_ids = "SELECT id FROM links WHERE url IN (SELECT url FROM sync_urls)"
+        self.cursor.execute(f"INSERT OR IGNORE INTO touched_tags SELECT tag_id FROM link_tags WHERE link_id IN ({link_ids});")
+        self.cursor.execute(f"DELETE FROM link_tags WHERE link_id IN ({link_ids});")
+
+    def _sync_tags(self):
+        """Rebuild the link_tags rows of the urls in sync_urls from links.tags, then empty sync_urls."""
+        self._unlink_tags()
+        self.cursor.execute("""
+            INSERT OR IGNORE INTO tags (label)
+            SELECT DISTINCT j.value
+            FROM links l JOIN sync_urls s ON s.url = l.url
+            CROSS JOIN json_each(l.tags) AS j
+            WHERE j.value IS NOT NULL;
+        """)
+        self.cursor.execute("""
+            INSERT OR IGNORE INTO link_tags (tag_id, link_id)
+            SELECT t.id, l.id
+            FROM links l JOIN sync_urls s ON s.url = l.url
+            CROSS JOIN json_each(l.tags) AS j
+            JOIN tags t ON t.label = j.value;
+        """)
+        self.cursor.execute("""
+            INSERT OR IGNORE INTO touched_tags
+            SELECT tag_id FROM link_tags
+            WHERE link_id IN (SELECT id FROM links WHERE url IN (SELECT url FROM sync_urls));
+        """)
+        self.cursor.execute("DELETE FROM sync_urls;")
 
-            self.cursor.execute("""
-                INSERT INTO links (url, label, tags, description)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(url) DO UPDATE SET
-                    label = excluded.label,
-                    tags = excluded.tags,
-                    description = excluded.description;
-            """, (url, label, tags, description))
+    def update_tag_refs(self):
+        """Recount refs for every tag whose links changed since the last call."""
+        self.cursor.execute("""
+            UPDATE tags SET
+                refs = (SELECT COUNT(*) FROM link_tags WHERE tag_id = tags.id),
+                modified_at = CURRENT_TIMESTAMP
+            WHERE id IN (SELECT tag_id FROM touched_tags);
+        """)
+        updated = self.cursor.rowcount
+        self.cursor.execute("DELETE FROM touched_tags;")
+        return updated
 
-        print(f"Successfully inserted/updated {len(links)} links.")
+    def insert_links(self, links):
+        """
+        Insert links into the database.
+        Rows are sent with executemany in chunks of batch_size, one transaction per chunk.
+        """
+        # Rows whose hash is unchanged are left alone, so they aren't rewritten
+        query = """
+            INSERT INTO links (url, label, tags, description, content_hash)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                label = excluded.label,
+                tags = excluded.tags,
+                description = excluded.description,
+                content_hash = excluded.content_hash
+            WHERE links.content_hash IS NOT excluded.content_hash;
+        """
+        rows = (
+            (link.get('url', ''),
+             link.get('label', ''),
+             json.dumps(link.get('tags', [])),  # Store tags as JSON string
+             link.get('description', ''),
+             content_hash(link))
+            for link in links
+        )
+
+        count = 0
+        start = time.monotonic()
+        for chunk in chunked(rows, self.batch_size):
+            with self.conn:  # commits the chunk, or rolls it back on error
+                self.cursor.executemany(query, chunk)
+                self.cursor.executemany("INSERT OR IGNORE INTO sync_urls (url) VALUES (?);",
+                                        [(row[0],) for row in chunk])
+                self._sync_tags()
+            count += len(chunk)
+        elapsed = time.monotonic() - start
+
+        rate = count / elapsed if elapsed else 0
+        print(f"Successfully inserted/updated {count} links ({rate:.0f} rows/sec).")
+
+    def get_hashes(self, urls):
+        """Return {url: content_hash} for the rows with the given urls."""
+        # One json parameter rather than one per url, which would hit SQLite's variable limit
+        rows = self.conn.execute("SELECT url, content_hash FROM links WHERE url IN (SELECT value FROM json_each(?));",
+                                 (json.dumps(urls),))
+        return {url: h or '' for url, h in rows}
+
+    def mark_seen(self, urls):
+        """Record urls as present in the source; return those that already were."""
+        urls = json.dumps(urls)
+        with self.conn:
+            repeated = [url for (url,) in self.conn.execute(
+                "SELECT value FROM json_each(?) WHERE value IN (SELECT url FROM seen_urls);", (urls,))]
+            self.cursor.execute("INSERT OR IGNORE INTO seen_urls SELECT value FROM json_each(?);", (urls,))
+        return repeated
+
+    def delete_unseen(self):
+        """Delete the rows whose url was not marked seen in this import; return how many."""
+        with self.conn:
+            self.cursor.execute("""
+                INSERT OR IGNORE INTO sync_urls
+                SELECT url FROM links l WHERE NOT EXISTS (SELECT 1 FROM seen_urls s WHERE s.url = l.url);
+            """)
+            self._unlink_tags()
+            self.cursor.execute("DELETE FROM links WHERE url IN (SELECT url FROM sync_urls);")
+            deleted = self.cursor.rowcount
+            self.cursor.execute("DELETE FROM sync_urls;")
+            self.cursor.execute("DELETE FROM seen_urls;")
+        return deleted
+
+    def get_state(self, key):
+        """Read a value from the import_state table."""
+        row = self.cursor.execute("SELECT value FROM import_state WHERE key = ?;", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key, value):
+        """Write a value to the import_state table."""
+        self.cursor.execute("""
+            INSERT INTO import_state (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value;
+        """, (key, value))
 
     def get_count(self):
         """Get total count of links."""
@@ -177,18 +661,70 @@ def main():
         default=os.getenv('SQLITE_PATH', 'links.db'),
         help='Path to SQLite database file (default: links.db, can also set SQLITE_PATH env var)'
     )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=50000,
+        help='Rows per batch (SQLite: per executemany and transaction; PostgreSQL: per execute_values) '
+             '(default: 50000)'
+    )
+    parser.add_argument(
+        '--sqlite-pragma',
+        action='append',
+        metavar='NAME=VALUE',
+        help='SQLite PRAGMA to set on connect, may be repeated '
+             '(defaults: journal_mode=WAL, synchronous=NORMAL, cache_size=-65536, temp_store=MEMORY)'
+    )
+    parser.add_argument(
+        '--pg-copy',
+        action='store_true',
+        help='PostgreSQL only: stream the JSON file through COPY into a staging table '
+             'and merge it in one statement (constant memory)'
+    )
+    parser.add_argument(
+        '--pg-gin',
+        action='store_true',
+        help='PostgreSQL only: create a GIN index on links.tags for array tag filters (tags @> ARRAY[...])'
+    )
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Send every link to the database instead of only new and changed ones'
+    )
+    parser.add_argument(
+        '--keep-missing',
+        action='store_true',
+        help='Do not delete rows whose url is no longer in the JSON file'
+    )
+    parser.add_argument(
+        '--since',
+        metavar='last|TIMESTAMP',
+        help="Skip the import if the JSON file hasn't been modified since the last import "
+             "('last') or since an ISO timestamp"
+    )
+    parser.add_argument(
+        '--raw-urls',
+        action='store_true',
+        help='Store urls exactly as they are in the JSON file instead of in canonical form '
+             '(see bookmarktool/urlnorm.py)'
+    )
     parser.add_argument(
         '--json-file',
         default='data/links.json',
-        help='Path to JSON file containing links (default: data/links.json)'
+        help='Path to JSON (.json array or .jsonl) file containing links (default: data/links.json)'
     )
 
     args = parser.parse_args()
 
     try:
-        # Load JSON data
+        # Open the JSON data for streaming
         links = load_json_file(args.json_file)
 
+        # The canonical url is the UNIQUE key, so http/https, trailing slash and
+        # utm_* variants of a link become one row
+        if not args.raw_urls:
+            links = canonicalize_links(links)
+
         # Initialize database handler based on type
         if args.db_type == 'postgres':
             # PostgreSQL configuration
@@ -199,10 +735,11 @@ def main():
                 'host': os.getenv('DB_HOST', 'localhost'),
                 'port': os.getenv('DB_PORT', '5432')
             }
-            handler = PostgreSQLHandler(db_config)
+            handler = PostgreSQLHandler(db_config, batch_size=args.batch_size, gin_index=args.pg_gin)
         else:
             # SQLite configuration
-            handler = SQLiteHandler(args.sqlite_path)
+            handler = SQLiteHandler(args.sqlite_path, batch_size=args.batch_size,
+                                    pragmas=parse_pragmas(args.sqlite_pragma))
 
         # Connect to database
         handler.connect()
@@ -210,12 +747,46 @@ def main():
         # Create table
         handler.create_table()
 
+        # Skip the whole import if the source hasn't changed
+        state_key = f'source_mtime:{os.path.abspath(args.json_file)}'
+        mtime = os.path.getmtime(args.json_file)
+        if args.since:
+            since = handler.get_state(state_key) if args.since == 'last' \
+                else datetime.fromisoformat(args.since).timestamp()
+            if since is not None and mtime <= float(since):
+                print(f"{args.json_file} has not changed since "
+                      f"{datetime.fromtimestamp(float(since)).isoformat(' ', 'seconds')}; nothing to import.")
+                print(f"\nTotal links in database: {handler.get_count()}")
+                return
+
+        # Only new and changed links are sent, unless --full
+        changes = None
+        if not args.full:
+            changes = ChangeSet(links, handler, args.batch_size)
+            links = changes
+
         # Insert links
-        handler.insert_links(links)
+        if args.pg_copy and args.db_type == 'postgres':
+            handler.copy_links(links)
+        else:
+            handler.insert_links(links)
+
+        # Delete rows that are gone from the JSON file
+        if changes and not args.keep_missing:
+            deleted = handler.delete_unseen()
+
+        # Recount refs of the tags whose links were added, changed or removed
+        tags_updated = handler.update_tag_refs()
 
         # Commit changes
+        handler.set_state(state_key, str(mtime))
         handler.commit()
 
+        if changes:
+            print(f"\nInserted: {changes.inserted}, changed: {changes.changed}, unchanged: {changes.unchanged}, "
+                  f"deleted: {0 if args.keep_missing else deleted}")
+        print(f"Tag refs updated: {tags_updated}")
+
         # Verify insertion
         count = handler.get_count()
         print(f"\nTotal links in database: {count}")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Streaming reader/writer for link files, shared by the importer, enricher and merger.
+
+Two formats are supported, picked by file extension:
+  - .json           a top-level JSON array (the format of data/links.json)
+  - .jsonl/.ndjson  JSON Lines, one link object per line
+
+Reading yields one link dict at a time and writing consumes any iterable, so
+tools run in bounded memory on multi-GB link dumps.
+
+usage:
+  python linkio.py data/links.json data/links.jsonl   # convert JSON -> JSON Lines
+  python linkio.py data/links.jsonl data/links.json   # convert JSON Lines -> JSON
+"""
+
+import argparse
+import json
+import os
+import sys
+
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+
+def is_jsonl(filename):
+    """Check if filename uses the JSON Lines format."""
+    return filename.lower().endswith(JSONL_EXTENSIONS)
+
+
+def iter_json_array(filename, chunk_size=1 << 16):
+    """
+    Yield the items of a top-level JSON array one at a time.
+    The file is read in chunks, so memory use depends on the largest item
+    rather than on the size of the file.
+    """
+    decoder = json.JSONDecoder()
+    with open(filename, 'r', encoding='utf-8') as f:
+        buf = ''
+        pos = 0
+        eof = False
+
+        def fill():
+            nonlocal buf, pos, eof
+            more = f.read(chunk_size)
+            if not more:
+                eof = True
+            buf = buf[pos:] + more
+            pos = 0
+
+        def skip_ws():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n':
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                fill()
+
+        skip_ws()
+        if buf[pos:pos + 1] != '[':
+            raise json.JSONDecodeError("Expecting '['", buf, pos)
+        pos += 1
+        skip_ws()
+        if buf[pos:pos + 1] == ']':
+            return
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                # A value that ends exactly at the buffer edge (e.g. a number) may be cut short
+                if end == len(buf) and not eof:
+                    raise json.JSONDecodeError("Item reaches end of buffer", buf, end)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            pos = end
+            yield item
+            skip_ws()
+            if buf[pos:pos + 1] == ',':
+                pos += 1
+                skip_ws()
+            elif buf[pos:pos + 1] == ']':
+                return
+            else:
+                raise json.JSONDecodeError("Expecting ',' or ']'", buf, pos)
+
+
+def iter_jsonl(filename):
+    """Yield one object per non-empty line of a JSON Lines file."""
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_links(filename):
+    """Yield link dicts from a .json array or a .jsonl file."""
+    if is_jsonl(filename):
+        return iter_jsonl(filename)
+    return iter_json_array(filename)
+
+
+def write_links(filename, links):
+    """
+    Write links to filename, streaming from any iterable, and return the count.
+    .json output is byte-for-byte what json.dump(links, f, indent=2, ensure_ascii=False)
+    would write. The data goes to a temp file that replaces filename at the end,
+    so filename may also be the file `links` is being read from.
+    """
+    tmp = filename + '.tmp'
+    count = 0
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            if is_jsonl(filename):
+                for link in links:
+                    f.write(json.dumps(link, ensure_ascii=False) + '\n')
+                    count += 1
+            else:
+                for link in links:
+                    item = json.dumps(link, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+                    f.write(('[\n  ' if count == 0 else ',\n  ') + item)
+                    count += 1
+                f.write('\n]' if count else '[]')
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return count
+
+
+def convert(src, dst):
+    """Convert between .json and .jsonl link files. Returns the number of links."""
+    return write_links(dst, iter_links(src))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert link files between JSON array (.json) and JSON Lines (.jsonl)'
+    )
+    parser.add_argument('src', help='Input file (.json or .jsonl)')
+    parser.add_argument('dst', help='Output file (.json or .jsonl)')
+    args = parser.parse_args()
+
+    if os.path.abspath(args.src) == os.path.abspath(args.dst):
+        print("Error: source and destination are the same file.")
+        sys.exit(1)
+    try:
+        count = convert(args.src, args.dst)
+    except FileNotFoundError:
+        print(f"Error: {args.src} not found.")
+        sys.exit(1)
+    except json.JSONDecodeError as e:
+        print(f"Error reading {args.src}: {e}")
+        sys.exit(1)
+    print(f"Wrote {count} links to {args.dst}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,33 @@
 #!/usr/bin/env python3
 """
-Script to parse links.txt and add new links to links.json.
-Only adds links that don't already exist in the JSON file.
+Script to parse text files of links (links.txt, notes, exports) and add the
+new links to links.json. Only adds links that don't already exist in the JSON file.
+
+Files are split into line ranges that a process pool parses in parallel; the
+links then go through one dedup stage, in file and line order.
+
+usage:
+  python parse_links_txt.py                                    # data/links.txt -> data/links.json
+  python parse_links_txt.py data/ 'exports/**/*.txt' --quiet   # directories and globs
+  python parse_links_txt.py dump.txt --json-file other.json --workers 4
 """
 
+import argparse
+import gc
+import glob
 import json
+import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import chain
 from urllib.parse import urlparse
 
+from bookmarktool.dupes import DupIndex
+from bookmarktool.urlnorm import canonical_url, strip_trailing_punct, url_key
+from linkio import iter_links, write_links
+
 
 def is_valid_url(text):
     """Check if text is a valid URL."""
@@ -18,17 +38,38 @@ def is_valid_url(text):
         return False
 
 
+URL_RE = re.compile(r'https?://\S+')
+# one pass over a line finds its urls and its :tags; a tag starts the line or follows a space or comma,
+# so the colon of "label: url" or of "10:30" is not one
+TOKEN_RE = re.compile(r'(https?://\S+)|(?<![^\s,]):(\w+)')
+SPACE_RE = re.compile(r'\s')
+LABEL_JUNK = ' \t,'
+
+DEFAULT_CHUNK_MB = 8
+# left out when searching a directory, along with hidden and binary files
+SKIP_EXTENSIONS = ('.json', '.jsonl', '.ndjson', '.db', '.sqlite', '.sqlite3', '.gz', '.zip', '.pdf',
+                   '.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+
 def extract_url_from_line(line):
-    """Extract URL from a line of text."""
-    # Try to find URLs in the line
-    url_pattern = r'https?://[^\s]+'
-    matches = re.findall(url_pattern, line)
-    return matches[0] if matches else None
+    """Extract the first URL from a line of text."""
+    match = URL_RE.search(line)
+    return strip_trailing_punct(match.group()) if match else None
+
+
+def _label(parts, url):
+    # "label: url", "label (url)": drop the colon or paren that led up to the url
+    words = []
+    for part in parts:
+        part = part.strip(LABEL_JUNK).rstrip(':(').rstrip()
+        if part:
+            words.append(part)
+    return ' '.join(words) or url
 
 
 def parse_line(line):
     """
-    Parse a line and extract URL, label, and tags.
+    Parse a line and extract every URL in it, each with its label and tags.
 
     Formats supported:
     - https://example.com
@@ -36,125 +77,327 @@ def parse_line(line):
     - label text: https://example.com
     - label text: https://example.com :tag1, :tag2
     - label text https://example.com
-    """
-    line = line.strip()
+    - several of the above on one line
 
+    The text before a URL (since the previous one) is its label, the tags after
+    it (up to the next one) are its tags. Tags before the first URL go to it, and
+    text after the last URL is added to its label. A URL without label text gets
+    the URL as label.
+    Returns a list of link dicts, empty for lines without a URL.
+    """
     # Skip empty lines and section headers
-    if not line or not 'http' in line:
-        return None
-
-    # Extract URL
-    url = extract_url_from_line(line)
-    if not url:
-        return None
-
-    # Remove URL from line to work with remaining text
-    remaining = line.replace(url, '').strip()
-
-    # Extract tags (anything after the URL that starts with :)
-    tags = []
-    tag_pattern = r':(\w+)'
-    tag_matches = re.findall(tag_pattern, remaining)
-    if tag_matches:
-        tags = tag_matches
-        # Remove tags from remaining text
-        remaining = re.sub(r':[\w,\s]+$', '', remaining).strip()
-
-    # What's left is the label (remove trailing colons)
-    label = remaining.rstrip(':').strip()
-
-    # If no label, use the URL as label
-    if not label:
-        label = url
+    if 'http' not in line:
+        return []
+    line = line.strip()
+    if line.startswith(('http://', 'https://')) and not SPACE_RE.search(line):
+        # a bare url, the most common line
+        url = canonical_url(strip_trailing_punct(line))
+        return [{'url': url, 'label': url, 'tags': [], 'description': ''}]
 
-    return {
-        'url': url,
-        'label': label,
-        'tags': tags,
-        'description': ''
-    }
+    links = []
+    parts = []   # label text since the previous url
+    tags = []    # tags since the previous url
+    pos = 0
+    for m in TOKEN_RE.finditer(line):
+        parts.append(line[pos:m.start()])
+        pos = m.end()
+        url, tag = m.groups()
+        if tag:
+            tags.append(tag)
+            continue
+        url = strip_trailing_punct(url)
+        if links:
+            # the tags after the previous url are its own; the text goes to this url
+            links[-1]['tags'] = tags
+            tags = []
+        links.append({'url': canonical_url(url), 'label': parts, 'tags': tags, 'description': ''})
+        parts = []
+    if not links:
+        return []
+    links[-1]['tags'] = tags
+    links[-1]['label'] += parts
+    links[-1]['label'].append(line[pos:])
+    for link in links:
+        link['label'] = _label(link['label'], link['url'])
+    return links
 
 
-def load_existing_links(json_file):
-    """Load existing links from JSON file."""
+def load_existing_urls(json_file, near=None):
+    """
+    Stream the existing JSON file and collect the set of URL keys (see
+    bookmarktool/urlnorm.py) it contains. If near (a DupIndex) is given, the links are also added to it.
+    Returns (keys, count), or None if the file is not valid JSON.
+    """
+    urls = set()
+    count = 0
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        for link in iter_links(json_file):
+            urls.add(url_key(link['url']))
+            if near is not None:
+                near.add(link)
+            count += 1
     except FileNotFoundError:
         print(f"Warning: {json_file} not found. Will create new file.")
-        return []
     except json.JSONDecodeError as e:
         print(f"Error reading {json_file}: {e}")
-        return []
+        return None
+    return urls, count
 
 
-def parse_links_txt(txt_file):
-    """Parse links.txt and extract all links."""
-    links = []
+def parse_links(lines, quiet=False):
+    """
+    Yield the links found in an iterable of lines (e.g. an open file), in order.
+    Unless quiet, print each one with its line number.
+    """
+    for line_num, line in enumerate(lines, 1):
+        if 'http' not in line:
+            continue
+        for link in parse_line(line):
+            if not quiet:
+                print(f"Line {line_num}: Found {link['url']} (tags: {link['tags']})")
+            yield link
+
 
+def parse_links_txt(txt_file, quiet=False):
+    """Parse links.txt and extract all links."""
     try:
         with open(txt_file, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                parsed = parse_line(line)
-                if parsed:
-                    links.append(parsed)
-                    print(f"Line {line_num}: Found {parsed['url']} (tags: {parsed['tags']})")
+            return list(parse_links(f, quiet))
     except FileNotFoundError:
         print(f"Error: {txt_file} not found.")
         return []
 
-    return links
 
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector. Parsing creates millions of link dicts
+    that live on, which makes it run full collections over and over; the dicts
+    hold no reference cycles, so it has nothing to find.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def is_binary(path):
+    """Check if a file looks binary (has a NUL byte near the start)."""
+    try:
+        with open(path, 'rb') as f:
+            return b'\0' in f.read(8192)
+    except OSError:
+        return True
 
-def merge_links(existing_links, new_links):
-    """Merge new links into existing links, avoiding duplicates."""
-    # Create a set of existing URLs for quick lookup
-    existing_urls = {link['url'] for link in existing_links}
 
-    added_count = 0
+def expand_sources(patterns):
+    """
+    Expand files, directories (searched recursively) and glob patterns into a
+    list of files, in order and without repeats. In directories, hidden files,
+    binary files and files with one of SKIP_EXTENSIONS are left out.
+    """
+    files = []
+    seen = set()
+
+    def take(path):
+        real = os.path.realpath(path)
+        if real not in seen:
+            seen.add(real)
+            files.append(path)
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, names in os.walk(pattern):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                for name in sorted(names):
+                    path = os.path.join(root, name)
+                    if not name.startswith('.') and not name.lower().endswith(SKIP_EXTENSIONS) and not is_binary(path):
+                        take(path)
+            continue
+        paths = sorted(glob.glob(pattern, recursive=True)) if any(c in pattern for c in '*?[') else [pattern]
+        paths = [path for path in paths if os.path.isfile(path)]
+        if not paths:
+            print(f"Warning: {pattern} not found.")
+        for path in paths:
+            take(path)
+    return files
+
+
+def chunk_ranges(path, chunk_size):
+    """Split a file into (path, start, end) byte ranges of about chunk_size bytes."""
+    size = os.path.getsize(path)
+    return [(path, start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)] or [(path, 0, 0)]
+
+
+def parse_chunk(task):
+    """
+    Parse the lines of a file that start in the byte range [start, end); the
+    unit of work of parse_files.
+    Returns (number of lines, [(line number within the range, link), ...]).
+    """
+    path, start, end = task
+    found = []
+    lines = 0
+    with gc_paused(), open(path, 'rb') as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()  # the line under way at start belongs to the previous range
+        pos = f.tell()
+        while pos < end:
+            raw = f.readline()
+            if not raw:
+                break
+            pos += len(raw)
+            lines += 1
+            if b'http' in raw:
+                for link in parse_line(raw.decode('utf-8', 'replace')):
+                    found.append((lines, link))
+    return lines, found
+
+
+def parse_files(files, workers=None, chunk_size=DEFAULT_CHUNK_MB << 20):
+    """
+    Parse text files in a pool of worker processes, each file split into line
+    ranges of about chunk_size bytes. With one worker, or one range in all, the
+    files are parsed in this process.
+    Yields (path, lines, [(line number, link), ...]) per file, in the order of
+    files, so the links come out in the same order as from a serial parse.
+    """
+    tasks = []
+    for path in files:
+        try:
+            tasks += chunk_ranges(path, chunk_size)
+        except OSError as e:
+            print(f"Warning: skipping {path}: {e}")
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        results = pool.map(parse_chunk, tasks) if pool else map(parse_chunk, tasks)
+        current = None
+        for (path, _, _), (lines, found) in zip(tasks, results):
+            if path != current:
+                if current is not None:
+                    yield current, total, links
+                current, total, links = path, 0, []
+            links += [(total + n, link) for n, link in found]
+            total += lines
+        if current is not None:
+            yield current, total, links
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+
+def merge_links(existing_urls, new_links, near=None, quiet=False):
+    """
+    Pick the new links whose URL key is not in existing_urls, avoiding duplicates.
+    If near (a DupIndex of the existing links) is given, added links that look
+    like an existing one are reported as possible duplicates.
+    Unless quiet, every link is printed as added or skipped.
+    existing_urls is updated in place; returns (links to append,
+    [(link, [(similarity, existing link)])] for the possible duplicates).
+    """
+    added = []
+    possible = []
     for link in new_links:
-        if link['url'] not in existing_urls:
-            existing_links.append(link)
-            existing_urls.add(link['url'])
-            added_count += 1
-            print(f"Added: {link['url']}")
-        else:
+        key = url_key(link['url'])
+        if key not in existing_urls:
+            added.append(link)
+            existing_urls.add(key)
+            if not quiet:
+                print(f"Added: {link['url']}")
+            if near is not None:
+                matches = near.matches(link, limit=3)
+                if not quiet:
+                    for sim, match in matches:
+                        print(f"  possible duplicate ({sim:.0%}): {match['url']}")
+                if matches:
+                    possible.append((link, matches))
+                near.add(link)
+        elif not quiet:
             print(f"Skipped (already exists): {link['url']}")
 
-    return existing_links, added_count
+    return added, possible
 
 
-def save_links(json_file, links):
-    """Save links to JSON file."""
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(links, f, indent=2, ensure_ascii=False)
-    print(f"\nSaved {len(links)} total links to {json_file}")
+def save_links(json_file, added_links):
+    """
+    Append links to the JSON file. The existing links are streamed from the
+    old file into the new one, so the file is never fully loaded in memory.
+    """
+    existing = iter_links(json_file) if os.path.isfile(json_file) else []
+    count = write_links(json_file, chain(existing, added_links))
+    print(f"\nSaved {count} total links to {json_file}")
 
 
 def main():
-    txt_file = 'data/links.txt'
-    json_file = 'data/links.json'
-
-    print(f"Parsing {txt_file}...")
-    new_links = parse_links_txt(txt_file)
-    print(f"\nFound {len(new_links)} links in {txt_file}\n")
+    parser = argparse.ArgumentParser(description='Parse text files of links and add the new ones to links.json')
+    parser.add_argument('sources', nargs='*', default=['data/links.txt'],
+                        help='Text files, directories (searched recursively) or glob patterns (default: data/links.txt)')
+    parser.add_argument('--json-file', default='data/links.json', help='Links file to add to (default: data/links.json)')
+    parser.add_argument('--workers', '-j', type=int, default=os.cpu_count() or 1,
+                        help='Parser processes (default: number of CPUs)')
+    parser.add_argument('--chunk-mb', type=float, default=DEFAULT_CHUNK_MB,
+                        help=f'Size of the line ranges files are split into, in MB (default: {DEFAULT_CHUNK_MB})')
+    parser.add_argument('--quiet', '-q', action='store_true', help="Don't print every link found, added or skipped")
+    parser.add_argument('--near-dupes', action='store_true',
+                        help='Report new links that look like existing ones (indexes every link in memory)')
+    args = parser.parse_args()
+    json_file = args.json_file
+
+    files = expand_sources(args.sources)
+    if not files:
+        print("No files to parse.")
+        return
 
     print(f"Loading existing links from {json_file}...")
-    existing_links = load_existing_links(json_file)
-    print(f"Found {len(existing_links)} existing links\n")
-
-    print("Merging links...")
-    merged_links, added_count = merge_links(existing_links, new_links)
+    near = DupIndex() if args.near_dupes else None
+    existing = load_existing_urls(json_file, near)
+    if existing is None:
+        print(f"Not overwriting {json_file}; fix or remove it first.")
+        return
+    existing_urls, existing_count = existing
+    print(f"Found {existing_count} existing links\n")
+
+    print(f"Parsing and merging {len(files)} file(s)...")
+    added_links = []
+    possible = []
+    stats = []
+    start = time.perf_counter()
+    with gc_paused():
+        for path, lines, found in parse_files(files, args.workers, int(args.chunk_mb * (1 << 20))):
+            if not args.quiet:
+                for line_num, link in found:
+                    print(f"{path}:{line_num}: Found {link['url']} (tags: {link['tags']})")
+            added, maybe = merge_links(existing_urls, (link for _, link in found), near, args.quiet)
+            added_links += added
+            possible += maybe
+            stats.append((path, lines, len(found), len(added), len(maybe)))
+    elapsed = time.perf_counter() - start
+    total_lines = sum(s[1] for s in stats)
+
+    width = max([len(s[0]) for s in stats] + [4])
+    dupes_col = f"{'possible dupes':>16}" if near is not None else ''
+    print(f"\n{'file':<{width}}{'lines':>10}{'links':>9}{'new':>8}{dupes_col}")
+    for path, lines, links, added, maybe in stats:
+        print(f"{path:<{width}}{lines:>10}{links:>9}{added:>8}" + (f"{maybe:>16}" if near is not None else ''))
 
     print(f"\n{'='*60}")
     print(f"Summary:")
-    print(f"  Links in {txt_file}: {len(new_links)}")
-    print(f"  Links already in {json_file}: {len(existing_links)}")
-    print(f"  New links added: {added_count}")
-    print(f"  Total links now: {len(merged_links)}")
+    print(f"  Files parsed: {len(stats)}")
+    print(f"  Lines: {total_lines} in {elapsed:.2f}s ({total_lines / max(elapsed, 1e-9):,.0f} lines/s)")
+    print(f"  Links found: {sum(s[2] for s in stats)}")
+    print(f"  Links already in {json_file}: {existing_count}")
+    print(f"  New links added: {len(added_links)}")
+    if near is not None:
+        print(f"  Possible duplicates among them: {len(possible)}")
+    print(f"  Total links now: {existing_count + len(added_links)}")
     print(f"{'='*60}\n")
 
-    save_links(json_file, merged_links)
+    save_links(json_file, added_links)
     print("Done!")
 
 
@@ -2,13 +2,106 @@
 """
 YouTube Playlist and Channel to RSS Feed Converter
 Converts YouTube playlist URLs and channel URLs to RSS feed URLs that can be used in RSS readers.
+
+In batch mode (--batch FILE, or --from-links) many URLs are converted at once
+into an OPML subscription list. Channel handles are resolved by a pool of
+threads, and the handle -> channel ID mappings are cached on disk, so URLs
+seen in an earlier run don't need the network.
+
+--verify and --info fetch each feed once, parsing it as it downloads and
+stopping after the feed's own elements and its latest --entries entries;
+in batch mode the feeds are fetched concurrently.
 """
 
 import re
+import os
 import sys
+import json
+import time
 import argparse
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
 from urllib.parse import urlparse, parse_qs
+from xml.etree.ElementTree import ParseError, XMLPullParser
+from xml.sax.saxutils import escape, quoteattr
+
+YOUTUBE_HOSTS = ['www.youtube.com', 'youtube.com', 'm.youtube.com']
+
+# A channel page names its own channel in <head>, before any other channel it links to
+CANONICAL_RE = re.compile(r'<link rel="canonical" href="https://www\.youtube\.com/channel/(UC[A-Za-z0-9_-]{22})"')
+CHANNEL_ID_PATTERNS = [
+    re.compile(r'"channelId":"(UC[A-Za-z0-9_-]{22})"'),
+    re.compile(r'channel_id=(UC[A-Za-z0-9_-]{22})'),
+    re.compile(r'/channel/(UC[A-Za-z0-9_-]{22})'),
+]
+
+FEED_TAGS = ('feed', 'rss', 'RDF')  # Atom, RSS 2.0, RSS 1.0
+ENTRY_TAGS = ('entry', 'item')
+DATE_TAGS = ('updated', 'published', 'lastBuildDate', 'pubDate')
+DEFAULT_ENTRIES = 15  # YouTube feeds list the latest 15 videos
+
+_local = threading.local()
+
+def get_session():
+    """Return a requests session for the current thread (keeps connections alive)."""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+class ChannelCache:
+    """
+    On-disk cache of channel handle -> channel ID (a JSON file).
+    Entries older than the TTL are resolved again.
+    """
+
+    def __init__(self, path, ttl=30 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}
+        self.dirty = False
+        self.counts = {'cached': 0, 'fetched': 0}
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            print(f"Warning: {path} is not valid JSON; starting with an empty cache", file=sys.stderr)
+
+    def get(self, key):
+        """Return the cached channel ID for a handle key, or None if unknown or expired."""
+        entry = self.entries.get(key)
+        if entry and time.time() - entry['resolved_at'] < self.ttl:
+            self.record('cached')
+            return entry['channel_id']
+        return None
+
+    def put(self, key, channel_id):
+        with self._lock:
+            self.entries[key] = {'channel_id': channel_id, 'resolved_at': time.time()}
+            self.dirty = True
+
+    def record(self, kind):
+        """Count a lookup outcome: 'cached' or 'fetched'."""
+        with self._lock:
+            self.counts[kind] += 1
+
+    def save(self):
+        """Write the cache back if anything was added (temp file + rename)."""
+        with self._lock:
+            if not self.dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+            self.dirty = False
 
 def extract_playlist_id(url):
     """
@@ -26,15 +119,15 @@ def extract_playlist_id(url):
     # Parse URL
     parsed = urlparse(url)
     
-    # Extract from query parameters
-    if parsed.query:
+    # Extract from query parameters (other sites use ?list= for other things)
+    if parsed.netloc in YOUTUBE_HOSTS and parsed.query:
         query_params = parse_qs(parsed.query)
         if 'list' in query_params:
             return query_params['list'][0]
     
     return None
 
-def extract_channel_id(url):
+def extract_channel_id(url, cache=None):
     """
     Extract channel ID from various YouTube channel URL formats.
     
@@ -44,6 +137,8 @@ def extract_channel_id(url):
     - https://www.youtube.com/@username
     - https://www.youtube.com/user/username
     - UCxxxxxx (direct channel ID)
+
+    Handles and /c/, /user/ names are looked up in cache (a ChannelCache) first.
     """
     # Direct channel ID (starts with UC and is 24 characters)
     if re.match(r'^UC[A-Za-z0-9_-]{22}$', url):
@@ -52,49 +147,226 @@ def extract_channel_id(url):
     # Parse URL
     parsed = urlparse(url)
     
-    if parsed.netloc in ['www.youtube.com', 'youtube.com', 'm.youtube.com']:
+    if parsed.netloc in YOUTUBE_HOSTS:
         path_parts = parsed.path.strip('/').split('/')
         
-        if len(path_parts) >= 2:
-            if path_parts[0] == 'channel':
-                # https://www.youtube.com/channel/UCxxxxxx
-                return path_parts[1]
-            elif path_parts[0] in ['c', 'user']:
-                # https://www.youtube.com/c/channelname or /user/username
-                # These need to be resolved to channel ID via API or web scraping
-                return resolve_channel_handle(url)
-        elif len(path_parts) >= 1 and path_parts[0].startswith('@'):
-            # https://www.youtube.com/@username
-            return resolve_channel_handle(url)
+        if path_parts[0] == 'channel' and len(path_parts) >= 2:
+            # https://www.youtube.com/channel/UCxxxxxx
+            return path_parts[1]
+        elif handle_key(url):
+            # https://www.youtube.com/@username, /c/channelname or /user/username (and their /videos etc. tabs)
+            # These need to be resolved to channel ID via API or web scraping
+            return resolve_channel_handle(url, cache)
     
     return None
 
-def resolve_channel_handle(url):
+def handle_key(url):
+    """
+    Return the cache key of a channel handle URL ('@name', 'c/name' or 'user/name', lowercase),
+    or None if url is not one.
+    """
+    parsed = urlparse(url)
+    if parsed.netloc not in YOUTUBE_HOSTS:
+        return None
+    path_parts = parsed.path.strip('/').split('/')
+    if path_parts[0].startswith('@') and len(path_parts[0]) > 1:
+        return path_parts[0].lower()
+    if path_parts[0] in ['c', 'user'] and len(path_parts) >= 2 and path_parts[1]:
+        return f"{path_parts[0]}/{path_parts[1].lower()}"
+    return None
+
+def resolve_channel_handle(url, cache=None):
     """
-    Resolve channel handle/username to channel ID by scraping the page.
+    Resolve channel handle/username to channel ID, from cache (a ChannelCache) if it has it,
+    otherwise by scraping the page.
     This is a fallback method when we can't extract the ID directly.
     """
+    key = handle_key(url)
+    if cache is not None and key:
+        channel_id = cache.get(key)
+        if channel_id:
+            return channel_id
+    channel_id = fetch_channel_id(url)
+    if cache is not None and key:
+        cache.record('fetched')
+        if channel_id:
+            cache.put(key, channel_id)
+    return channel_id
+
+def fetch_channel_id(url):
+    """
+    Find the channel ID in a channel page. The page is streamed and the download
+    stops at the canonical link in <head>; only a page without one is searched
+    for other mentions of a channel ID.
+    """
+    chunks = []
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            # Look for channel ID in the page source
-            content = response.text
-            # Try to find channel ID in various places in the HTML
-            patterns = [
-                r'"channelId":"(UC[A-Za-z0-9_-]{22})"',
-                r'channel_id=([UC][A-Za-z0-9_-]{22})',
-                r'/channel/(UC[A-Za-z0-9_-]{22})',
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, content)
+        with get_session().get(url, timeout=10, stream=True) as response:
+            if response.status_code != 200:
+                return None
+            response.encoding = response.encoding or 'utf-8'
+            tail = ''
+            for chunk in response.iter_content(chunk_size=1 << 14, decode_unicode=True):
+                match = CANONICAL_RE.search(tail + chunk)
                 if match:
                     return match.group(1)
+                chunks.append(chunk)
+                tail = chunk[-200:]
     except requests.RequestException:
-        pass
-    
+        return None
+
+    content = ''.join(chunks)
+    for pattern in CHANNEL_ID_PATTERNS:
+        match = pattern.search(content)
+        if match:
+            return match.group(1)
     return None
 
+def to_feed(url, cache=None):
+    """
+    Work out the feed of a YouTube URL or ID.
+    Returns (feed type, playlist or channel ID, RSS URL), or None.
+    """
+    playlist_id = extract_playlist_id(url)
+    if playlist_id:
+        return "playlist", playlist_id, get_playlist_rss_url(playlist_id)
+    channel_id = extract_channel_id(url, cache)
+    if channel_id:
+        return "channel", channel_id, get_channel_rss_url(channel_id)
+    return None
+
+def is_feed_url(url):
+    """Check, without the network, if url is a YouTube playlist or channel URL (not e.g. a single video)."""
+    parsed = urlparse(url)
+    if parsed.netloc not in YOUTUBE_HOSTS:
+        return False
+    if extract_playlist_id(url):
+        return True
+    path_parts = parsed.path.strip('/').split('/')
+    return (path_parts[0] == 'channel' and len(path_parts) >= 2) or handle_key(url) is not None
+
+def read_batch(lines):
+    """
+    Yield (url, title) from lines of "URL [title]"; blank lines and # comments are skipped.
+    The title defaults to the URL.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        url, _, title = line.partition(' ')
+        yield url, title.strip() or url
+
+def read_links_json(json_file):
+    """Yield (url, label) for the YouTube playlist and channel links in a links.json / .jsonl file."""
+    from linkio import iter_links
+    for link in iter_links(json_file):
+        url = link.get('url', '')
+        if is_feed_url(url):
+            yield url, link.get('label') or url
+
+def resolve_batch(entries, cache=None, workers=8):
+    """
+    Turn (url, title) entries into feeds. URLs are resolved by a pool of `workers`
+    threads, and each channel handle is resolved once however many URLs name it.
+    Returns (feeds, failed): feeds as dicts with url, title, type, id and rss_url, in
+    input order without duplicates; failed as the URLs that could not be resolved.
+    """
+    jobs = {}
+    for url, _ in entries:
+        jobs.setdefault(handle_key(url) or url, url)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = dict(zip(jobs, pool.map(lambda url: to_feed(url, cache), jobs.values())))
+
+    feeds, failed, seen = [], [], set()
+    for url, title in entries:
+        result = results[handle_key(url) or url]
+        if result is None:
+            failed.append(url)
+        elif result[2] not in seen:
+            seen.add(result[2])
+            feeds.append({'url': url, 'title': title, 'type': result[0], 'id': result[1], 'rss_url': result[2]})
+    return feeds, failed
+
+def write_opml(out, feeds, title="YouTube feeds"):
+    """Write feeds (as returned by resolve_batch) to a file object as an OPML 2.0 subscription list."""
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n<opml version="2.0">\n  <head>\n')
+    out.write(f'    <title>{escape(title)}</title>\n    <dateCreated>{formatdate(usegmt=True)}</dateCreated>\n')
+    out.write('  </head>\n  <body>\n')
+    for feed in feeds:
+        if feed['type'] == 'playlist':
+            html_url = f"https://www.youtube.com/playlist?list={feed['id']}"
+        else:
+            html_url = f"https://www.youtube.com/channel/{feed['id']}"
+        out.write(f'    <outline type="rss" text={quoteattr(feed["title"])} title={quoteattr(feed["title"])} '
+                  f'xmlUrl={quoteattr(feed["rss_url"])} htmlUrl={quoteattr(html_url)}/>\n')
+    out.write('  </body>\n</opml>\n')
+
+def run_batch(args, cache):
+    """Convert the URLs of --batch / --from-links and write them as OPML."""
+    if args.batch == '-':
+        entries = list(read_batch(sys.stdin))
+    elif args.batch:
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            entries = list(read_batch(f))
+    else:
+        entries = []
+    if args.from_links:
+        entries += read_links_json(args.from_links)
+
+    start = time.monotonic()
+    feeds, failed = resolve_batch(entries, cache, workers=args.workers)
+    elapsed = time.monotonic() - start
+
+    unreachable = []
+    if args.verify or args.info:
+        start = time.monotonic()
+        infos = fetch_feeds_info([feed['rss_url'] for feed in feeds], args.entries, workers=args.workers)
+        fetch_elapsed = time.monotonic() - start
+        for feed, info in zip(feeds, infos):
+            feed['info'] = info
+            if info['ok'] and info['title'] and args.info and feed['title'] in (feed['url'], feed['id']):
+                feed['title'] = info['title']
+        print_health(infos, file=sys.stderr)
+        print(f"{len(infos)} feeds fetched in {fetch_elapsed:.2f}s", file=sys.stderr)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(infos, f, indent=2, ensure_ascii=False)
+        if args.verify:
+            unreachable = [feed for feed in feeds if not feed['info']['ok']]
+            feeds = [feed for feed in feeds if feed['info']['ok']]
+
+    if args.opml == '-':
+        write_opml(sys.stdout, feeds)
+    else:
+        tmp = args.opml + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            write_opml(f, feeds)
+        os.replace(tmp, args.opml)
+
+    for url in failed:
+        print(f"✗ Could not resolve {url}", file=sys.stderr)
+    for feed in unreachable:
+        print(f"✗ Left out {feed['url']}: {feed['info']['error']}", file=sys.stderr)
+    left_out = f", {len(unreachable)} unreachable" if args.verify else ""
+    print(f"{len(entries)} URLs -> {len(feeds)} feeds, {len(failed)} failed{left_out}, resolved in {elapsed:.2f}s",
+          file=sys.stderr)
+    if cache is not None:
+        c = cache.counts
+        print(f"channel cache: {c['cached']} cached, {c['fetched']} fetched", file=sys.stderr)
+    if args.opml != '-':
+        print(f"Wrote {args.opml}", file=sys.stderr)
+    return 1 if (failed or unreachable) and not feeds else 0
+
+def print_health(infos, file=sys.stdout):
+    """Print one line per feed: status, entries, last update and title."""
+    for info in infos:
+        if info['ok']:
+            entries = f"{info['entries']}{'+' if info['more'] else ''}"
+            print(f"✓ {entries:>4} {info['updated'] or 'unknown':<26} {info['title']}", file=file)
+        else:
+            print(f"✗ {info['url']}: {info['error']}", file=file)
+
 def get_playlist_rss_url(playlist_id):
     """Generate RSS feed URL for a YouTube playlist."""
     return f"https://www.youtube.com/feeds/videos.xml?playlist_id={playlist_id}"
@@ -103,28 +375,112 @@ def get_channel_rss_url(channel_id):
     """Generate RSS feed URL for a YouTube channel."""
     return f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
 
+def parse_feed_date(text):
+    """Parse an Atom (ISO 8601) or RSS (RFC 822) date; returns an aware datetime, or None."""
+    text = (text or '').strip()
+    if not text:
+        return None
+    try:
+        date = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            date = parsedate_to_datetime(text)
+        except (TypeError, ValueError):
+            return None
+    return date if date.tzinfo else date.astimezone()
+
+def fetch_feed_info(rss_url, max_entries=DEFAULT_ENTRIES, timeout=10):
+    """
+    Fetch a feed once and read what --verify and --info report, with an incremental
+    XML parser fed as the body downloads. The download stops after the feed-level
+    elements and the first max_entries entries (feeds list the newest first).
+
+    Returns a dict: ok, status, title, entries (entries read, at most max_entries),
+    more (whether the feed has further entries), updated (ISO time of the newest
+    entry or of the feed, or None), latest (title, link and date of the entries
+    read), error and seconds.
+    """
+    info = {'url': rss_url, 'ok': False, 'status': None, 'title': None, 'entries': 0, 'more': False,
+            'updated': None, 'latest': [], 'error': None}
+    start = time.monotonic()
+    parser = XMLPullParser(events=('start', 'end'))
+    newest = None
+    depth = 0       # of the element being read
+    in_entry = False
+    entry = {}
+    try:
+        with get_session().get(rss_url, timeout=timeout, stream=True) as response:
+            info['status'] = response.status_code
+            if response.status_code != 200:
+                info['error'] = f"HTTP {response.status_code}"
+                return info
+            done = False
+            for chunk in response.iter_content(chunk_size=1 << 14):
+                parser.feed(chunk)
+                for event, elem in parser.read_events():
+                    tag = elem.tag.rpartition('}')[2]
+                    if event == 'start':
+                        depth += 1
+                        if depth == 1 and tag not in FEED_TAGS:
+                            raise ParseError(f"<{tag}> is not a feed's root element")
+                        if tag in ENTRY_TAGS:
+                            if info['entries'] == max_entries:
+                                info['more'] = done = True
+                                break
+                            in_entry, entry = True, {}
+                        continue
+                    depth -= 1
+                    if tag in ENTRY_TAGS:
+                        info['entries'] += 1
+                        info['latest'].append(entry)
+                        in_entry = False
+                        elem.clear()
+                    elif in_entry:
+                        # the first title and link are the entry's own (YouTube repeats the title in media:group)
+                        if tag == 'title':
+                            entry.setdefault('title', (elem.text or '').strip())
+                        elif tag == 'link':
+                            entry.setdefault('link', elem.get('href') or (elem.text or '').strip())
+                        elif tag in DATE_TAGS:
+                            date = parse_feed_date(elem.text)
+                            if date and (newest is None or date > newest):
+                                newest = date
+                            entry.setdefault('date', date.isoformat() if date else None)
+                    elif tag == 'title' and info['title'] is None and depth <= 2:
+                        # <feed><title> (Atom) or <rss><channel><title> (RSS)
+                        info['title'] = (elem.text or '').strip()
+                    elif tag in ('updated', 'lastBuildDate') and depth <= 2:
+                        date = parse_feed_date(elem.text)
+                        if date and (newest is None or date > newest):
+                            newest = date
+                if done:
+                    break
+            if not done:
+                parser.close()
+    except requests.RequestException as e:
+        info['error'] = str(e)
+        return info
+    except ParseError as e:
+        info['error'] = f"not a feed: {e}"
+        return info
+    finally:
+        info['seconds'] = time.monotonic() - start
+    info['ok'] = True
+    info['updated'] = newest.isoformat() if newest else None
+    return info
+
+def fetch_feeds_info(rss_urls, max_entries=DEFAULT_ENTRIES, workers=8):
+    """Fetch the info of many feeds (see fetch_feed_info) with a pool of `workers` threads, in input order."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda url: fetch_feed_info(url, max_entries), rss_urls))
+
 def verify_rss_exists(rss_url):
     """Verify that the RSS feed exists and is accessible."""
-    try:
-        response = requests.head(rss_url, timeout=10)
-        return response.status_code == 200
-    except requests.RequestException:
-        return False
+    return fetch_feed_info(rss_url, max_entries=0)['ok']
 
 def get_rss_info(rss_url):
     """Get basic information from the RSS feed."""
-    try:
-        response = requests.get(rss_url, timeout=10)
-        if response.status_code == 200:
-            # Basic XML parsing to extract title
-            content = response.text
-            title_match = re.search(r'<title>(.+?)</title>', content)
-            if title_match:
-                return title_match.group(1)
-    except requests.RequestException:
-        pass
-    
-    return None
+    return fetch_feed_info(rss_url, max_entries=0)['title']
 
 def main():
     parser = argparse.ArgumentParser(
@@ -147,14 +503,67 @@ Examples:
   # With options
   %(prog)s --verify "https://www.youtube.com/channel/UCxxxxxx"
   %(prog)s --info "https://www.youtube.com/@username"
+
+  # Batch mode: many URLs (one "URL [title]" per line) to an OPML file
+  %(prog)s --batch channels.txt --opml youtube.opml
+  cat channels.txt | %(prog)s --batch - > youtube.opml
+  %(prog)s --from-links data/links.json --opml youtube.opml
+  %(prog)s --batch channels.txt --verify --info --report health.json > youtube.opml
         """
     )
     
     parser.add_argument(
         'url', 
+        nargs='?',
         help='YouTube playlist URL, channel URL, or ID'
     )
     
+    parser.add_argument(
+        '--batch', '-b',
+        metavar='FILE',
+        help='Convert the URLs in FILE (one "URL [title]" per line; - for stdin) to an OPML file'
+    )
+    
+    parser.add_argument(
+        '--from-links',
+        nargs='?',
+        const='data/links.json',
+        metavar='JSON',
+        help='Convert the YouTube playlist and channel links in a links file (default: data/links.json) to an OPML file'
+    )
+    
+    parser.add_argument(
+        '--opml', '-o',
+        default='-',
+        help='OPML file to write in batch mode (default: stdout)'
+    )
+    
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=8,
+        help='Channel pages and feeds fetched at a time in batch mode (default: 8)'
+    )
+    
+    parser.add_argument(
+        '--cache',
+        default='data/yt_channels.json',
+        help='File caching resolved channel handles (default: data/yt_channels.json)'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not use the channel handle cache'
+    )
+    
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=30.0,
+        help='Days before a cached channel handle is resolved again (default: 30)'
+    )
+    
     parser.add_argument(
         '--verify', 
         action='store_true',
@@ -167,6 +576,19 @@ Examples:
         help='Show feed information (title, etc.)'
     )
     
+    parser.add_argument(
+        '--entries',
+        type=int,
+        default=DEFAULT_ENTRIES,
+        help=f'Entries to read from each feed for --info (default: {DEFAULT_ENTRIES})'
+    )
+    
+    parser.add_argument(
+        '--report',
+        metavar='JSON',
+        help='In batch mode with --verify / --info, write each feed\'s status, title, entry count and last update to JSON'
+    )
+    
     parser.add_argument(
         '--quiet', '-q',
         action='store_true',
@@ -178,24 +600,34 @@ Examples:
         sys.exit(1)
     
     args = parser.parse_args()
+    batch = args.batch or args.from_links
+    if batch and args.url:
+        parser.error("give either a url or --batch / --from-links")
+    if not batch and not args.url:
+        parser.error("a url, --batch or --from-links is required")
+    if args.report and not (batch and (args.verify or args.info)):
+        parser.error("--report needs batch mode and --verify or --info")
     
-    # Try to extract playlist ID first
-    playlist_id = extract_playlist_id(args.url)
-    channel_id = None
-    feed_type = None
-    rss_url = None
+    cache = None
+    if not args.no_cache:
+        cache = ChannelCache(args.cache, ttl=args.cache_ttl * 24 * 3600)
     
-    if playlist_id:
-        feed_type = "playlist"
-        rss_url = get_playlist_rss_url(playlist_id)
-    else:
-        # Try to extract channel ID
-        channel_id = extract_channel_id(args.url)
-        if channel_id:
-            feed_type = "channel"
-            rss_url = get_channel_rss_url(channel_id)
+    if batch:
+        try:
+            status = run_batch(args, cache)
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if cache:
+                cache.save()
+        sys.exit(status)
+    
+    feed = to_feed(args.url, cache)
+    if cache:
+        cache.save()
     
-    if not rss_url:
+    if not feed:
         print("Error: Could not extract playlist or channel ID from URL", file=sys.stderr)
         print("Supported formats:", file=sys.stderr)
         print("  Playlists:", file=sys.stderr)
@@ -210,35 +642,45 @@ Examples:
         print("    - UCxxxxxx (direct channel ID)", file=sys.stderr)
         sys.exit(1)
     
+    feed_type, feed_id, rss_url = feed
+    
     if args.quiet:
         print(rss_url)
         return
     
     if feed_type == "playlist":
-        print(f"Playlist ID: {playlist_id}")
+        print(f"Playlist ID: {feed_id}")
     else:
-        print(f"Channel ID: {channel_id}")
+        print(f"Channel ID: {feed_id}")
     
     print(f"Feed Type: {feed_type.title()}")
     print(f"RSS Feed URL: {rss_url}")
     
+    if not (args.verify or args.info):
+        return
+    
+    # One fetch serves both --verify and --info
+    print(f"\nFetching {feed_type} feed...")
+    info = fetch_feed_info(rss_url, args.entries)
+    
     # Verify RSS feed exists if requested
     if args.verify:
-        print(f"\nVerifying {feed_type}...")
-        if verify_rss_exists(rss_url):
+        if info['ok']:
             print("✓ RSS feed exists and is accessible")
         else:
-            print("✗ RSS feed not found or not accessible")
+            print(f"✗ RSS feed not found or not accessible ({info['error']})")
             sys.exit(1)
     
-    # Get RSS feed info if requested
+    # Show RSS feed info if requested
     if args.info:
-        print(f"\nFetching {feed_type} information...")
-        title = get_rss_info(rss_url)
-        if title:
-            print(f"Title: {title}")
+        if info['ok']:
+            print(f"Title: {info['title']}")
+            print(f"Entries: {info['entries']}{'+' if info['more'] else ''}")
+            print(f"Last updated: {info['updated'] or 'unknown'}")
+            for entry in info['latest'][:5]:
+                print(f"  {entry.get('date') or '':<26} {entry.get('title', '')}")
         else:
-            print("Could not fetch feed information")
+            print(f"Could not fetch feed information ({info['error']})")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file